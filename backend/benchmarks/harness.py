@@ -0,0 +1,159 @@
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Linear-interpolated percentile (q in 0..100) of unsorted samples."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples: List[float]) -> Dict:
+    """Latency statistics in milliseconds of per-call samples in seconds."""
+    ms = [s * 1000 for s in samples]
+    return {
+        "runs": len(ms),
+        "median_ms": round(statistics.median(ms), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "min_ms": round(min(ms), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, warmup: int = 1, min_seconds: float = 0.0) -> Dict:
+    """
+    Times `fn` `repeat` times after `warmup` untimed calls; keeps calling until
+    `min_seconds` have passed so sub-millisecond cases still get stable medians.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    deadline = time.perf_counter() + min_seconds
+    while len(samples) < repeat or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+@contextmanager
+def isolated_workdir():
+    """
+    Runs the block in a temporary directory: src.database opens attendance.db
+    relative to the working directory, so benchmarks get their own database.
+    DATABASE_PATH is reset for the block so it cannot point them elsewhere.
+    """
+    workdir = tempfile.mkdtemp(prefix="attendance-bench-")
+    cwd = os.getcwd()
+    database_path = os.environ.pop("DATABASE_PATH", None)
+    os.chdir(workdir)
+    try:
+        yield workdir
+    finally:
+        os.chdir(cwd)
+        if database_path is not None:
+            os.environ["DATABASE_PATH"] = database_path
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict:
+    """What a result depends on besides the code; baselines are only comparable on the same machine."""
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save(report: Dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.25, min_delta_ms: float = 1.0) -> List[Dict]:
+    """
+    Case-by-case median comparison. A case regresses when its median is more
+    than `threshold` (a fraction) slower than the baseline and by at least
+    `min_delta_ms`, so jitter on sub-millisecond cases is not reported.
+    """
+    rows = []
+    for name, result in sorted(current["results"].items()):
+        before = baseline["results"].get(name)
+        if before is None:
+            rows.append({"case": name, "status": "new", "median_ms": result["median_ms"]})
+            continue
+        delta = result["median_ms"] - before["median_ms"]
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        if ratio > 1 + threshold and delta >= min_delta_ms:
+            status = "regressed"
+        elif ratio < 1 - threshold and -delta >= min_delta_ms:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({
+            "case": name,
+            "status": status,
+            "median_ms": result["median_ms"],
+            "baseline_ms": before["median_ms"],
+            "change": round(ratio - 1, 3),
+        })
+    for name in sorted(set(baseline["results"]) - set(current["results"])):
+        rows.append({"case": name, "status": "missing", "baseline_ms": baseline["results"][name]["median_ms"]})
+    return rows
+
+
+def environment_differences(current: Dict, baseline: Dict) -> List[str]:
+    keys = ("python", "machine", "processor", "cpu_count")
+    return [
+        f"{key}: {baseline['environment'].get(key)} -> {current['environment'].get(key)}"
+        for key in keys if baseline["environment"].get(key) != current["environment"].get(key)
+    ]
+
+
+def format_table(rows: List[Dict]) -> str:
+    lines = [f"{'case':<44} {'median ms':>11} {'baseline':>11} {'change':>8}  status"]
+    for row in rows:
+        median = f"{row['median_ms']:.2f}" if "median_ms" in row else "-"
+        baseline = f"{row['baseline_ms']:.2f}" if "baseline_ms" in row else "-"
+        change = f"{row['change']:+.0%}" if "change" in row else "-"
+        lines.append(f"{row['case']:<44} {median:>11} {baseline:>11} {change:>8}  {row['status']}")
+    return "\n".join(lines)
@@ -0,0 +1,454 @@
+"""
+Load test: a fleet of kiosks, dashboards and video uploads against one server.
+
+    cd backend
+    python -m benchmarks.load_test                                   # local server, 4 kiosks, 2 dashboards, 60 s
+    python -m benchmarks.load_test --kiosks 16 --dashboards 8 --gallery 10000 --duration 300
+    python -m benchmarks.load_test --url http://10.0.0.5:8000 --kiosks 8   # a server that is already running
+
+Without --url a server is started with uvicorn in a temporary directory with
+its own database: the default admin, an active session and, with --gallery,
+that many synthetic identities (generate_synthetic_gallery.py --store) next to
+the enrolled students. The clients then run for --duration seconds:
+
+- kiosk: the camera view of RecognitionPanel, posting a low-quality frame to
+  /detect-faces every --detect-interval and a capture to /recognize/image
+  every --recognize-interval;
+- dashboard: the teacher screens reloading what api.js fetches (active
+  session, attendance, absentees, unknowns, evidence, history) every
+  --poll-interval;
+- video: an upload to /recognize/video every --video-interval.
+
+Every client loop is a thread with its own keep-alive connection that waits
+for each response before sending the next request, as the browser does. The
+report has throughput and p50/p95/p99 latency per endpoint, errors, 429/503
+rejections (admission control and rate limits) and the server's CPU use,
+read from process_cpu_seconds_total on /metrics. Only the Python standard
+library, OpenCV and numpy are needed on the client side. The exit status is 1
+when the error rate is above --max-error-rate, so the run can gate CI.
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.join(BACKEND_DIR, "benchmarks")
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import harness  # noqa: E402
+from benchmarks.run import compose_frame  # noqa: E402
+from benchmarks.video_corpus import enrolled_faces  # noqa: E402
+
+DEFAULT_DATASET = os.getenv("DATASET_PATH") or os.path.join(os.path.dirname(BACKEND_DIR), "dataset")
+DEFAULT_VIDEO = os.path.join(BACKEND_DIR, "test_einstein.mp4")
+FRAMES_PER_KIOSK = 4
+# Admission control and rate limits answer with these; they are counted apart from errors
+REJECTED = (429, 503)
+
+
+class Stats:
+    """Latencies and status codes per endpoint, for requests started inside the measured window."""
+
+    def __init__(self):
+        self.window_start = float("inf")
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict] = {}
+
+    def record(self, endpoint: str, started: float, seconds: float, status: int):
+        if started < self.window_start:
+            return
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, {"latencies": [], "statuses": {}})
+            entry["statuses"][status] = entry["statuses"].get(status, 0) + 1
+            if 200 <= status < 300:
+                entry["latencies"].append(seconds * 1000)
+
+    def report(self, elapsed: float) -> Dict:
+        with self._lock:
+            endpoints = {name: (list(e["latencies"]), dict(e["statuses"])) for name, e in self._endpoints.items()}
+        rows = {name: _summarize(latencies, statuses, elapsed) for name, (latencies, statuses) in sorted(endpoints.items())}
+        all_latencies = [ms for latencies, _ in endpoints.values() for ms in latencies]
+        all_statuses: Dict[int, int] = {}
+        for _, statuses in endpoints.values():
+            for status, count in statuses.items():
+                all_statuses[status] = all_statuses.get(status, 0) + count
+        return {"endpoints": rows, "total": _summarize(all_latencies, all_statuses, elapsed)}
+
+
+def _summarize(latencies: List[float], statuses: Dict[int, int], elapsed: float) -> Dict:
+    requests = sum(statuses.values())
+    ok = sum(count for status, count in statuses.items() if 200 <= status < 300)
+    rejected = {str(status): statuses.get(status, 0) for status in REJECTED}
+    errors = requests - ok - sum(rejected.values())
+    return {
+        "requests": requests,
+        "ok": ok,
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else None,
+        "p50_ms": round(harness.percentile(latencies, 50), 1) if latencies else None,
+        "p95_ms": round(harness.percentile(latencies, 95), 1) if latencies else None,
+        "p99_ms": round(harness.percentile(latencies, 99), 1) if latencies else None,
+        "rejected": rejected,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        # 0 is a connection error or timeout
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+class Client:
+    """One keep-alive HTTP connection, reopened after a failure."""
+
+    def __init__(self, url: str, token: Optional[str] = None, timeout: float = 120):
+        parsed = urllib.parse.urlsplit(url)
+        self.https = parsed.scheme == "https"
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if self.https else 80)
+        self.token = token
+        self.timeout = timeout
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None, headers: Optional[Dict] = None) -> Tuple[int, bytes]:
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        reused = self._connection is not None
+        if not reused:
+            connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._connection = connection_class(self.host, self.port, timeout=self.timeout)
+        try:
+            self._connection.request(method, path, body=body, headers=headers)
+            response = self._connection.getresponse()
+            return response.status, response.read()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            self.close()
+            if not reused:
+                raise
+            # The server closed the idle keep-alive connection; browsers retry these too
+            return self.request(method, path, body, headers)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def multipart(filename: str, content_type: str, data: bytes) -> Tuple[bytes, Dict]:
+    """A form with one `file` field, as the frontend's FormData uploads."""
+    boundary = uuid.uuid4().hex
+    head = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    return head + data + f"\r\n--{boundary}--\r\n".encode(), {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def timed(stats: Stats, client: Client, endpoint: str, method: str, path: str,
+          body: Optional[bytes] = None, headers: Optional[Dict] = None) -> Tuple[int, bytes]:
+    started = time.monotonic()
+    try:
+        status, content = client.request(method, path, body, headers)
+    except (OSError, http.client.HTTPException):
+        status, content = 0, b""
+    stats.record(endpoint, started, time.monotonic() - started, status)
+    return status, content
+
+
+def paced(stop: threading.Event, interval: float, rng: np.random.Generator) -> Iterator[None]:
+    """
+    Yields once per interval until `stop` is set. Clients start at random
+    offsets so they do not fire in lockstep, and a client that falls behind
+    skips the ticks it missed instead of bursting to catch up.
+    """
+    next_at = time.monotonic() + rng.uniform(0, interval)
+    while not stop.wait(max(0.0, next_at - time.monotonic())):
+        yield
+        next_at = max(next_at + interval, time.monotonic())
+
+
+def kiosk_frames(faces: List[np.ndarray], size: Tuple[int, int], rng: np.random.Generator) -> List[np.ndarray]:
+    """A few camera frames with one or two enrolled students in front of the kiosk."""
+    frames = []
+    for _ in range(FRAMES_PER_KIOSK):
+        picked = [faces[i] for i in rng.choice(len(faces), min(2, len(faces)), replace=False)]
+        frames.append(compose_frame(picked, int(rng.integers(1, 3)), size[0], size[1]))
+    return frames
+
+
+def encode_jpeg(frame: np.ndarray, quality: int) -> bytes:
+    ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return data.tobytes()
+
+
+def detect_loop(client: Client, stats: Stats, stop: threading.Event, interval: float,
+                frames: List[bytes], rng: np.random.Generator):
+    # RecognitionPanel polls with canvas.toBlob(..., 'image/jpeg', 0.5)
+    for n, _ in enumerate(paced(stop, interval, rng)):
+        body, headers = multipart("frame.jpg", "image/jpeg", frames[n % len(frames)])
+        timed(stats, client, "POST /detect-faces", "POST", "/detect-faces", body, headers)
+
+
+def recognize_loop(client: Client, stats: Stats, stop: threading.Event, interval: float,
+                   frames: List[bytes], rng: np.random.Generator):
+    for n, _ in enumerate(paced(stop, interval, rng)):
+        body, headers = multipart("camera_capture.jpg", "image/jpeg", frames[n % len(frames)])
+        timed(stats, client, "POST /recognize/image", "POST", "/recognize/image", body, headers)
+
+
+def dashboard_loop(client: Client, stats: Stats, stop: threading.Event, interval: float, rng: np.random.Generator):
+    for _ in paced(stop, interval, rng):
+        status, content = timed(stats, client, "GET /sessions/active", "GET", "/sessions/active")
+        session = json.loads(content) if status == 200 and content else None
+        for path in ("/attendance", "/attendance/absent", "/sessions/active/unknowns", "/sessions"):
+            timed(stats, client, f"GET {path}", "GET", path)
+        if session:
+            timed(stats, client, "GET /sessions/{id}/evidence", "GET", f"/sessions/{session['id']}/evidence")
+
+
+def video_loop(client: Client, stats: Stats, stop: threading.Event, interval: float,
+               video: Tuple[str, bytes], rng: np.random.Generator):
+    filename, data = video
+    for _ in paced(stop, interval, rng):
+        body, headers = multipart(filename, "video/mp4", data)
+        timed(stats, client, "POST /recognize/video", "POST", "/recognize/video", body, headers)
+
+
+def login(url: str, username: str, password: str) -> str:
+    # /token is rate limited per address: every simulated client shares this one token
+    client = Client(url)
+    body = urllib.parse.urlencode({"username": username, "password": password}).encode()
+    status, content = client.request("POST", "/token", body, {"Content-Type": "application/x-www-form-urlencoded"})
+    client.close()
+    if status != 200:
+        raise SystemExit(f"Login as {username} failed ({status}): {content[:200]!r}")
+    return json.loads(content)["access_token"]
+
+
+def server_cpu_seconds(url: str, metrics_token: Optional[str]) -> Optional[float]:
+    client = Client(url, metrics_token, timeout=30)
+    try:
+        status, content = client.request("GET", "/metrics")
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        client.close()
+    if status != 200:
+        return None
+    for line in content.decode().splitlines():
+        if line.startswith("process_cpu_seconds_total "):
+            return float(line.split()[1])
+    return None
+
+
+def wait_until_ready(url: str, server: subprocess.Popen, timeout: float):
+    # /ready answers 503 until the gallery has loaded in the background
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with status {server.returncode}")
+        client = Client(url, timeout=5)
+        try:
+            if client.request("GET", "/ready")[0] == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            client.close()
+        time.sleep(1)
+    raise RuntimeError(f"Server not ready after {timeout:.0f}s")
+
+
+@contextmanager
+def local_server(port: int, gallery: int, dataset_dir: str, startup_timeout: float) -> Iterator[str]:
+    """A uvicorn server with a fresh database in a temporary directory, seeded with `gallery` synthetic identities."""
+    with harness.isolated_workdir() as workdir:
+        env = dict(os.environ, DATASET_PATH=dataset_dir, SYNTHETIC_GALLERY="1")
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (BACKEND_DIR, os.environ.get("PYTHONPATH")) if p)
+        if gallery:
+            print(f"Seeding {gallery} synthetic identities...", flush=True)
+            subprocess.run(
+                [sys.executable, os.path.join(BACKEND_DIR, "generate_synthetic_gallery.py"),
+                 "--identities", str(gallery), "--store"],
+                cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL
+            )
+        log_path = os.path.join(workdir, "server.log")
+        url = f"http://127.0.0.1:{port}"
+        with open(log_path, "w") as log:
+            print(f"Starting server on {url}...", flush=True)
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(port)],
+                cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+            try:
+                wait_until_ready(url, server, startup_timeout)
+                yield url
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited during the run with status {server.returncode}")
+            except Exception:
+                with open(log_path) as f:
+                    print("".join(f.readlines()[-40:]), file=sys.stderr)
+                raise
+            finally:
+                # SIGINT lets the writers flush, as on a normal shutdown
+                server.send_signal(signal.SIGINT)
+                try:
+                    server.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+                    server.wait()
+
+
+def ensure_session(url: str, token: str):
+    """Recognitions only mark attendance (and dashboards only have data) during a session."""
+    client = Client(url, token)
+    try:
+        status, content = client.request("GET", "/sessions/active")
+        if status == 200 and json.loads(content or b"null"):
+            return
+        status, content = client.request("POST", "/sessions?name=load-test")
+        if status != 200:
+            raise SystemExit(f"Could not start a session ({status}): {content[:200]!r}")
+    finally:
+        client.close()
+
+
+def run_load(url: str, token: str, args) -> Dict:
+    rng = np.random.default_rng(args.seed)
+    faces = list(enrolled_faces(args.dataset).values())
+    if not faces:
+        raise SystemExit(f"No enrollment images found under {args.dataset}")
+    width, height = (int(v) for v in args.frame_size.lower().split("x"))
+    with open(args.video, "rb") as f:
+        video = (os.path.basename(args.video), f.read())
+
+    stats = Stats()
+    stop = threading.Event()
+    loops: List[Tuple[Callable, tuple]] = []
+    for _ in range(args.kiosks):
+        frames = kiosk_frames(faces, (width, height), rng)
+        loops.append((detect_loop, (args.detect_interval, [encode_jpeg(f, 50) for f in frames])))
+        loops.append((recognize_loop, (args.recognize_interval, [encode_jpeg(f, 95) for f in frames])))
+    loops += [(dashboard_loop, (args.poll_interval,))] * args.dashboards
+    loops += [(video_loop, (args.video_interval, video))] * args.videos
+
+    clients = []
+    threads = []
+    for loop, loop_args in loops:
+        client = Client(url, token, args.timeout)
+        clients.append(client)
+        thread_rng = np.random.default_rng(rng.integers(1 << 32))
+        threads.append(threading.Thread(target=loop, args=(client, stats, stop) + loop_args + (thread_rng,), daemon=True))
+
+    print(f"{args.kiosks} kiosks, {args.dashboards} dashboards, {args.videos} video uploaders: "
+          f"{args.ramp_up:.0f}s ramp-up, then {args.duration:.0f}s measured", flush=True)
+    for thread in threads:
+        thread.start()
+    stop.wait(args.ramp_up)
+    cpu_before = server_cpu_seconds(url, args.metrics_token)
+    stats.window_start = time.monotonic()
+    stop.wait(args.duration)
+    elapsed = time.monotonic() - stats.window_start
+    cpu_after = server_cpu_seconds(url, args.metrics_token)
+    stop.set()
+    for thread in threads:
+        thread.join(args.timeout)
+    for client in clients:
+        client.close()
+
+    report = stats.report(elapsed)
+    cpu = cpu_after - cpu_before if None not in (cpu_before, cpu_after) else None
+    report["server"] = {
+        "cpu_seconds": round(cpu, 2) if cpu is not None else None,
+        # 1.0 is one core fully busy
+        "cpu_cores_used": round(cpu / elapsed, 2) if cpu is not None else None,
+    }
+    report["seconds"] = round(elapsed, 1)
+    return report
+
+
+def format_table(report: Dict) -> str:
+    lines = [f"{'endpoint':<32} {'requests':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'429':>5} {'503':>5} {'errors':>6}"]
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for name, row in rows:
+        latencies = [f"{row[key]:.1f}" if row[key] is not None else "-" for key in ("p50_ms", "p95_ms", "p99_ms")]
+        lines.append(
+            f"{name:<32} {row['requests']:>8} {row['throughput_rps']:>7} {latencies[0]:>8} {latencies[1]:>8} {latencies[2]:>8} "
+            f"{row['rejected']['429']:>5} {row['rejected']['503']:>5} {row['errors']:>6}"
+        )
+    server = report["server"]
+    if server["cpu_seconds"] is not None:
+        lines.append(f"\nServer CPU: {server['cpu_seconds']}s over {report['seconds']}s ({server['cpu_cores_used']} cores)")
+    else:
+        lines.append("\nServer CPU: unavailable (no process_cpu_seconds_total on /metrics; set --metrics-token?)")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test with simulated kiosks, dashboards and video uploads.")
+    parser.add_argument("--url", help="Server to test (default: start a seeded local server)")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="robocop")
+    parser.add_argument("--metrics-token", default=os.getenv("METRICS_TOKEN"), help="Bearer token for /metrics")
+    parser.add_argument("--port", type=int, default=8765, help="Port of the local server")
+    parser.add_argument("--gallery", type=int, default=0, help="Synthetic identities to seed the local server with")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="Enrollment images the kiosk frames are made of")
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--kiosks", type=int, default=4)
+    parser.add_argument("--dashboards", type=int, default=2)
+    parser.add_argument("--videos", type=int, default=1, help="Clients uploading videos")
+    parser.add_argument("--detect-interval", type=float, default=0.3, help="Seconds between /detect-faces polls per kiosk")
+    parser.add_argument("--recognize-interval", type=float, default=5.0, help="Seconds between captures per kiosk")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="Seconds between dashboard reloads")
+    parser.add_argument("--video-interval", type=float, default=60.0, help="Seconds between uploads per video client")
+    parser.add_argument("--video", default=DEFAULT_VIDEO)
+    parser.add_argument("--frame-size", default="640x480", help="WIDTHxHEIGHT of kiosk frames")
+    parser.add_argument("--duration", type=float, default=60, help="Measured seconds")
+    parser.add_argument("--ramp-up", type=float, default=10, help="Seconds of load before measuring")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="Fail when more than this share of requests errors (429/503 are not errors)")
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "results", "load_latest.json"))
+    args = parser.parse_args()
+    args.dataset = os.path.abspath(args.dataset)
+    args.video = os.path.abspath(args.video)
+    output = os.path.abspath(args.output)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("password", "metrics_token", "output")}
+    if args.url:
+        url = args.url.rstrip("/")
+        report = run_load(url, login(url, args.username, args.password), args)
+    else:
+        with local_server(args.port, args.gallery, args.dataset, args.startup_timeout) as url:
+            token = login(url, args.username, args.password)
+            ensure_session(url, token)
+            report = run_load(url, token, args)
+    report = {"environment": harness.environment(), "config": config, **report}
+
+    harness.save(report, output)
+    print(format_table(report))
+    print(f"Results written to {output}")
+    if report["total"]["error_rate"] > args.max_error_rate:
+        print(f"\nError rate {report['total']['error_rate']:.2%} is above {args.max_error_rate:.2%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
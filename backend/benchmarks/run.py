@@ -0,0 +1,239 @@
+"""
+Benchmarks for the recognition and video pipelines.
+
+    cd backend
+    python -m benchmarks.run                      # run everything, compare with benchmarks/baseline.json
+    python -m benchmarks.run --only detect match  # a subset of groups
+    python -m benchmarks.run --save-baseline      # accept the current numbers as the new baseline
+
+Results are written as JSON (benchmarks/results/latest.json by default). The
+exit status is 1 if any case regressed against the baseline, so the run can
+gate a deploy. Baselines are only meaningful on the machine that recorded
+them; a differing environment is reported with the comparison.
+
+The benchmarks run in a temporary working directory with their own SQLite
+database, so they never touch attendance.db.
+"""
+import argparse
+import os
+import sys
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.join(BACKEND_DIR, "benchmarks")
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import harness  # noqa: E402
+
+GROUPS = ["gallery", "detect", "recognize", "match", "video"]
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+FACE_COUNTS = [1, 2, 4, 8]
+GALLERY_SIZES = [1_000, 10_000, 100_000]
+VIDEOS = ["test_einstein.mp4", "test_combined.mp4"]
+
+# (case name, function to time, keyword arguments for harness.measure, extra fields)
+Case = Tuple[str, Callable[[], object], Dict, Dict]
+
+
+def dataset_faces(limit: int = 8) -> List[np.ndarray]:
+    """One RGB enrollment image per student, as recognition sees them."""
+    from src.embedding_loader import DATASET_DIR
+    faces = []
+    for student in sorted(os.listdir(DATASET_DIR)):
+        student_dir = os.path.join(DATASET_DIR, student)
+        if not os.path.isdir(student_dir):
+            continue
+        for name in sorted(os.listdir(student_dir)):
+            if name.lower().endswith((".png", ".jpg", ".jpeg")):
+                image = cv2.imread(os.path.join(student_dir, name), cv2.IMREAD_COLOR)
+                if image is not None:
+                    faces.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+                break
+        if len(faces) == limit:
+            break
+    if not faces:
+        raise SystemExit(f"No enrollment images found under {DATASET_DIR}")
+    return faces
+
+
+def compose_frame(faces: List[np.ndarray], count: int, width: int, height: int) -> np.ndarray:
+    """A width x height frame with `count` faces (cycling through `faces`) laid out on a grid."""
+    columns = int(np.ceil(np.sqrt(count * width / height)))
+    rows = int(np.ceil(count / columns))
+    cell_w, cell_h = width // columns, height // rows
+    frame = np.full((height, width, 3), 128, dtype=np.uint8)
+    for i in range(count):
+        face = faces[i % len(faces)]
+        scale = min(cell_w / face.shape[1], cell_h / face.shape[0])
+        resized = cv2.resize(face, (max(1, int(face.shape[1] * scale)), max(1, int(face.shape[0] * scale))),
+                             interpolation=cv2.INTER_AREA)
+        top = (i // columns) * cell_h + (cell_h - resized.shape[0]) // 2
+        left = (i % columns) * cell_w + (cell_w - resized.shape[1]) // 2
+        frame[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return frame
+
+
+def frame_cases(faces: List[np.ndarray]) -> Iterator[Tuple[str, np.ndarray]]:
+    """Single face at each resolution, then increasing face counts at 720p."""
+    for width, height in RESOLUTIONS:
+        yield f"{width}x{height}/faces=1", compose_frame(faces, 1, width, height)
+    for count in FACE_COUNTS[1:]:
+        yield f"1280x720/faces={count}", compose_frame(faces, count, 1280, 720)
+
+
+def gallery_cases(repeat: int) -> Iterator[Case]:
+    from sqlalchemy import delete
+    from sqlmodel import Session
+    from src.database import engine
+    from src.embedding_loader import EmbeddingLoader
+    from src.models import GalleryEmbedding
+
+    loader = EmbeddingLoader()
+
+    def cold():
+        # Every enrollment image is encoded again, as on a first start or after a model switch
+        with Session(engine) as session:
+            session.exec(delete(GalleryEmbedding))
+            session.commit()
+        loader.build_gallery(loader.model)
+
+    images = sum(len(paths) for paths in loader.list_dataset_images().values())
+    extra = {"images": images}
+    yield "gallery/build_cold", cold, {"repeat": max(1, repeat // 2), "warmup": 0}, extra
+    yield "gallery/build_cached", lambda: loader.build_gallery(loader.model), {"repeat": repeat}, extra
+
+
+def pipeline_cases(group: str, repeat: int, recognition) -> Iterator[Case]:
+    faces = dataset_faces()
+    for name, frame in frame_cases(faces):
+        found = len(recognition.detect_only(frame))
+        if group == "detect":
+            fn = lambda frame=frame: recognition.detect_only(frame)
+        else:
+            fn = lambda frame=frame: recognition.recognize_image(frame)
+        yield f"{group}/{name}", fn, {"repeat": repeat}, {"faces_found": found}
+
+
+def match_cases(repeat: int) -> Iterator[Case]:
+    from src import synthetic_gallery
+    from src.embedding_models import active_model_version
+    from src.recognition import match_face
+
+    seeds = synthetic_gallery.seed_encodings(active_model_version())
+    for size in GALLERY_SIZES:
+        gallery = synthetic_gallery.generate(size, genuine_probes=50, impostor_probes=50, seeds=seeds)
+        accuracy = synthetic_gallery.evaluate(gallery)
+        extra = {key: accuracy[key] for key in (
+            "identities", "true_accept_rate", "misidentification_rate", "false_accept_rate"
+        )}
+        known = list(gallery.encodings)
+        names = [gallery.names[label] for label in gallery.labels]
+        probe = gallery.genuine_probes[0]
+        fn = lambda known=known, names=names, probe=probe: match_face(known, names, probe)
+        yield f"match/gallery={size}", fn, {"repeat": repeat, "min_seconds": 0.2}, extra
+
+
+def video_cases(repeat: int, recognition) -> Iterator[Case]:
+    from src.video_processor import VideoProcessor
+
+    processor = VideoProcessor(recognition)
+    for name in VIDEOS:
+        path = os.path.join(BACKEND_DIR, name)
+        if not os.path.exists(path):
+            print(f"Skipping video/{name}: {path} not found")
+            continue
+        capture = cv2.VideoCapture(path)
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        capture.release()
+        extra = {"frames": frames, "duration_seconds": round(frames / fps, 2) if fps else None}
+        yield f"video/{name}", lambda path=path: processor.process_video(path), \
+            {"repeat": max(1, repeat // 2), "warmup": 0}, extra
+
+
+def run(groups: List[str], repeat: int) -> Dict:
+    from src.database import create_db_and_tables
+    from src.migrations import run_migrations
+
+    create_db_and_tables()
+    run_migrations()
+
+    recognition = None
+    if {"detect", "recognize", "video"} & set(groups):
+        from src.embedding_loader import EmbeddingLoader
+        from src.recognition import RecognitionService
+        recognition = RecognitionService(EmbeddingLoader())
+
+    sources = {
+        "gallery": lambda: gallery_cases(repeat),
+        "detect": lambda: pipeline_cases("detect", repeat, recognition),
+        "recognize": lambda: pipeline_cases("recognize", repeat, recognition),
+        "match": lambda: match_cases(repeat),
+        "video": lambda: video_cases(repeat, recognition),
+    }
+    results = {}
+    for group in groups:
+        for name, fn, options, extra in sources[group]():
+            print(f"Running {name}...", flush=True)
+            result = harness.measure(fn, **options)
+            result.update(extra)
+            if "frames" in extra:
+                result["frames_per_second"] = round(extra["frames"] / (result["median_ms"] / 1000), 1)
+            results[name] = result
+    return {"environment": harness.environment(), "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recognition and video pipelines.")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS, help="Groups to run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (halved for slow cases)")
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "results", "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(BENCHMARK_DIR, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--gate", action="store_true",
+                        help="Deploy/CI gate: a missing baseline fails the run instead of skipping the comparison")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Slowdown fraction that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore changes smaller than this")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline)
+    with harness.isolated_workdir():
+        report = run(args.only, args.repeat)
+
+    harness.save(report, output)
+    print(f"\nResults written to {output}")
+
+    if args.save_baseline:
+        harness.save(report, baseline_path)
+        print(f"Baseline written to {baseline_path}")
+        return
+
+    baseline = harness.load(baseline_path)
+    if baseline is None:
+        if args.gate:
+            print(f"No baseline at {baseline_path}: nothing to gate against. "
+                  "Record one on the deploy hardware with --save-baseline.", file=sys.stderr)
+            sys.exit(2)
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one.")
+        return
+    # Cases of groups that were not run are not missing
+    baseline["results"] = {
+        name: result for name, result in baseline["results"].items() if name.split("/", 1)[0] in args.only
+    }
+    rows = harness.compare(report, baseline, args.threshold, args.min_delta_ms)
+    print(harness.format_table(rows))
+    differences = harness.environment_differences(report, baseline)
+    if differences:
+        print("Warning: baseline was recorded on a different environment (" + "; ".join(differences) + ")")
+    regressed = [row["case"] for row in rows if row["status"] == "regressed"]
+    if regressed:
+        print(f"\n{len(regressed)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
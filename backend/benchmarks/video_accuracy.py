@@ -0,0 +1,201 @@
+"""
+Scores VideoProcessor against the ground truth of a generated corpus.
+
+    cd backend
+    python -m benchmarks.video_corpus                      # once
+    python -m benchmarks.video_accuracy                    # compare with benchmarks/video_baseline.json
+    python -m benchmarks.video_accuracy --save-baseline
+
+For every video it reports throughput (video frames and sampled frames per
+wall-clock second), the students found against those expected, students
+reported that were never on screen, and the time from each student's
+scripted entry to their first recognition. A run regresses when recall drops,
+unexpected identities appear, time to first detection grows by more than one
+sampling interval or throughput drops by more than --threshold: speed work
+has to keep the accuracy numbers.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.join(BACKEND_DIR, "benchmarks")
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import harness  # noqa: E402
+from benchmarks.video_corpus import DEFAULT_OUTPUT, MANIFEST  # noqa: E402
+
+
+def score_video(processor, path: str, entry: Dict, interval: int) -> Dict:
+    first_seen: Dict[str, float] = {}
+    sampled = [0]
+
+    def on_frame(timestamp: float, results: List[Dict]):
+        sampled[0] += 1
+        for result in results:
+            if result["name"] != "Unknown":
+                first_seen.setdefault(result["name"], timestamp)
+
+    started = time.perf_counter()
+    result = processor.process_video(path, interval=interval, on_frame=on_frame)
+    elapsed = time.perf_counter() - started
+
+    expected = set(entry["expected"])
+    found = set(result["identities"]) - {"Unknown"}
+    entered: Dict[str, float] = {}
+    for appearance in entry["appearances"]:
+        entered[appearance["student"]] = min(appearance["enter"], entered.get(appearance["student"], float("inf")))
+    delays = {
+        student: round(max(0.0, first_seen[student] - entered[student]), 2)
+        for student in sorted(expected & found) if student in first_seen
+    }
+    return {
+        "style": entry["style"],
+        "seconds": round(elapsed, 3),
+        "frames_per_second": round(entry["frames"] / elapsed, 1),
+        "sampled_frames_per_second": round(sampled[0] / elapsed, 2),
+        "expected": len(expected),
+        "found": len(expected & found),
+        "missed": sorted(expected - found),
+        "unexpected": sorted(found - expected),
+        "recall": round(len(expected & found) / len(expected), 4) if expected else None,
+        "time_to_first_detection": delays,
+        "mean_time_to_first_detection": round(statistics.fmean(delays.values()), 2) if delays else None,
+    }
+
+
+def summarize(videos: Dict[str, Dict]) -> Dict:
+    expected = sum(v["expected"] for v in videos.values())
+    found = sum(v["found"] for v in videos.values())
+    delays = [d for v in videos.values() for d in v["time_to_first_detection"].values()]
+    seconds = sum(v["seconds"] for v in videos.values())
+    frames = sum(v["frames_per_second"] * v["seconds"] for v in videos.values())
+    return {
+        "expected": expected,
+        "found": found,
+        "recall": round(found / expected, 4) if expected else None,
+        "unexpected": sum(len(v["unexpected"]) for v in videos.values()),
+        "mean_time_to_first_detection": round(statistics.fmean(delays), 2) if delays else None,
+        "p95_time_to_first_detection": round(harness.percentile(delays, 95), 2) if delays else None,
+        "frames_per_second": round(frames / seconds, 1) if seconds else None,
+    }
+
+
+def run(corpus_dir: str, interval: int) -> Dict:
+    from src.database import create_db_and_tables
+    from src.migrations import run_migrations
+    from src.embedding_loader import EmbeddingLoader
+    from src.recognition import RecognitionService
+    from src.video_processor import VideoProcessor
+
+    with open(os.path.join(corpus_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+
+    create_db_and_tables()
+    run_migrations()
+    loader = EmbeddingLoader()
+    processor = VideoProcessor(RecognitionService(loader))
+    enrolled = set(loader.student_embeddings)
+
+    videos = {}
+    for entry in manifest["videos"]:
+        not_enrolled = set(entry["expected"]) - enrolled
+        if not_enrolled:
+            print(f"Warning: {entry['file']} expects students without gallery embeddings: {sorted(not_enrolled)}")
+        print(f"Processing {entry['file']}...", flush=True)
+        videos[entry["file"]] = score_video(processor, os.path.join(corpus_dir, entry["file"]), entry, interval)
+    return {
+        "environment": harness.environment(),
+        "corpus": {"generated_at": manifest["generated_at"], "seed": manifest["seed"]},
+        "interval": interval,
+        "summary": summarize(videos),
+        "videos": videos,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.25) -> List[Dict]:
+    """Per-video and overall checks; any 'regressed' row fails the run."""
+    rows = []
+    pairs = [("overall", current["summary"], baseline["summary"])] + [
+        (name, result, baseline["videos"][name])
+        for name, result in sorted(current["videos"].items()) if name in baseline["videos"]
+    ]
+    slack = current["interval"]
+    for name, now, before in pairs:
+        unexpected_now = now["unexpected"] if isinstance(now["unexpected"], int) else len(now["unexpected"])
+        unexpected_before = before["unexpected"] if isinstance(before["unexpected"], int) else len(before["unexpected"])
+        checks = [
+            ("recall", now["recall"], before["recall"], (now["recall"] or 0) < (before["recall"] or 0)),
+            ("unexpected", unexpected_now, unexpected_before, unexpected_now > unexpected_before),
+            ("mean_time_to_first_detection", now["mean_time_to_first_detection"],
+             before["mean_time_to_first_detection"],
+             None not in (now["mean_time_to_first_detection"], before["mean_time_to_first_detection"])
+             and now["mean_time_to_first_detection"] > before["mean_time_to_first_detection"] + slack),
+            ("frames_per_second", now["frames_per_second"], before["frames_per_second"],
+             bool(before["frames_per_second"]) and now["frames_per_second"] < before["frames_per_second"] * (1 - threshold)),
+        ]
+        for metric, value, previous, regressed in checks:
+            rows.append({"video": name, "metric": metric, "value": value, "baseline": previous,
+                         "status": "regressed" if regressed else "ok"})
+    return rows
+
+
+def format_table(rows: List[Dict]) -> str:
+    lines = [f"{'video':<22} {'metric':<30} {'value':>10} {'baseline':>10}  status"]
+    for row in rows:
+        lines.append(f"{row['video']:<22} {row['metric']:<30} {str(row['value']):>10} {str(row['baseline']):>10}  {row['status']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score VideoProcessor speed and accuracy on a ground-truth corpus.")
+    parser.add_argument("--corpus", default=DEFAULT_OUTPUT, help="Directory with manifest.json (benchmarks.video_corpus)")
+    parser.add_argument("--interval", type=int, default=1, help="Seconds between processed frames, as the server uses")
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "results", "video_latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(BENCHMARK_DIR, "video_baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--gate", action="store_true",
+                        help="Deploy/CI gate: a missing baseline fails the run instead of skipping the comparison")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Throughput drop that counts as a regression")
+    args = parser.parse_args()
+
+    corpus_dir = os.path.abspath(args.corpus)
+    if not os.path.exists(os.path.join(corpus_dir, MANIFEST)):
+        raise SystemExit(f"No {MANIFEST} in {corpus_dir}; generate one with python -m benchmarks.video_corpus")
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline)
+    with harness.isolated_workdir():
+        report = run(corpus_dir, args.interval)
+
+    harness.save(report, output)
+    print(json.dumps(report["summary"], indent=2))
+    print(f"Results written to {output}")
+
+    if args.save_baseline:
+        harness.save(report, baseline_path)
+        print(f"Baseline written to {baseline_path}")
+        return
+    baseline = harness.load(baseline_path)
+    if baseline is None:
+        if args.gate:
+            print(f"No baseline at {baseline_path}: nothing to gate against. "
+                  "Record one on the deploy hardware with --save-baseline.", file=sys.stderr)
+            sys.exit(2)
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one.")
+        return
+    if baseline["corpus"] != report["corpus"] or baseline["interval"] != report["interval"]:
+        raise SystemExit("Baseline was recorded on a different corpus or interval; record a new one.")
+    rows = compare(report, baseline, args.threshold)
+    print(format_table(rows))
+    regressed = [f"{row['video']} {row['metric']}" for row in rows if row["status"] == "regressed"]
+    if regressed:
+        print(f"\n{len(regressed)} check(s) regressed: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Ground-truth video corpus for throughput and accuracy regression tests.
+
+    cd backend
+    python -m benchmarks.video_corpus                          # 1 classroom + 1 doorway video, 2 min each
+    python -m benchmarks.video_corpus --videos 3 --duration 600 --styles classroom
+
+Videos are composed from the enrollment images in dataset/ with scripted
+entry and exit times, face scale, blur and occlusion. Every video is listed in
+manifest.json with its script, which is the ground truth that
+benchmarks.video_accuracy scores VideoProcessor against.
+
+- classroom: students sit in seats, arrive during the first part of the
+  video and some leave early; faces are small and static.
+- doorway: students walk towards the camera one after another, growing from
+  small to large while they pass.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+STYLES = ["classroom", "doorway"]
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, "benchmarks", "corpus")
+MANIFEST = "manifest.json"
+
+
+@dataclass
+class Appearance:
+    """One student on screen from `enter` to `exit` (seconds), moving and scaling linearly in between."""
+    student: str
+    enter: float
+    exit: float
+    x0: float  # centre as fractions of the frame, at entry and at exit
+    y0: float
+    x1: float
+    y1: float
+    scale0: float  # enrollment image height as a fraction of the frame height
+    scale1: float
+    blur: float  # Gaussian sigma in pixels, 0 = sharp
+    occlusion: float  # fraction of the image covered from below (scarf, hand, the person in front)
+
+
+def enrolled_faces(dataset_dir: str) -> Dict[str, np.ndarray]:
+    """
+    First enrollment image (BGR) per dataset folder. Folders whose image is a
+    byte-for-byte copy of an earlier one (generate_mock_students.py clones)
+    are skipped: the ground truth could not tell them apart.
+    """
+    faces, seen = {}, set()
+    # Originals before the clones made from them
+    for student in sorted(os.listdir(dataset_dir), key=lambda name: ("_mock_user_" in name, name)):
+        student_dir = os.path.join(dataset_dir, student)
+        if not os.path.isdir(student_dir):
+            continue
+        images = sorted(f for f in os.listdir(student_dir) if f.lower().endswith((".png", ".jpg", ".jpeg")))
+        if not images:
+            continue
+        with open(os.path.join(student_dir, images[0]), "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in seen:
+            print(f"Skipping {student}: same image as another student")
+            continue
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        seen.add(digest)
+        faces[student] = image
+    return faces
+
+
+def _impairments(rng: np.random.Generator) -> Tuple[float, float]:
+    blur = float(rng.choice([0.0, 0.0, rng.uniform(0.5, 1.5), rng.uniform(1.5, 3.0)]))
+    occlusion = float(rng.uniform(0.1, 0.35)) if rng.random() < 0.25 else 0.0
+    return round(blur, 2), round(occlusion, 2)
+
+
+def script_classroom(students: List[str], duration: float, rng: np.random.Generator) -> List[Appearance]:
+    columns = int(np.ceil(np.sqrt(len(students) * 16 / 9)))
+    rows = int(np.ceil(len(students) / columns))
+    appearances = []
+    for seat, student in enumerate(rng.permutation(students)):
+        x = (seat % columns + 0.5) / columns
+        y = (seat // columns + 0.5) / rows
+        enter = rng.uniform(0, duration * 0.4)
+        # A third leave before the end of the video
+        exit = rng.uniform(enter + duration * 0.2, duration) if rng.random() < 0.33 else duration
+        scale = min(0.9 / rows, rng.uniform(0.22, 0.32))
+        blur, occlusion = _impairments(rng)
+        appearances.append(Appearance(
+            student=str(student), enter=round(enter, 2), exit=round(exit, 2),
+            x0=x, y0=y, x1=x + rng.uniform(-0.01, 0.01), y1=y, scale0=scale, scale1=scale,
+            blur=blur, occlusion=occlusion
+        ))
+    return appearances
+
+
+def script_doorway(students: List[str], duration: float, rng: np.random.Generator) -> List[Appearance]:
+    order = list(rng.permutation(students))
+    slot = duration / len(order)
+    appearances = []
+    for i, student in enumerate(order):
+        passing = min(slot * 0.9, rng.uniform(3.0, 6.0))
+        enter = i * slot + rng.uniform(0, slot - passing)
+        blur, occlusion = _impairments(rng)
+        x = rng.uniform(0.35, 0.65)
+        appearances.append(Appearance(
+            student=str(student), enter=round(enter, 2), exit=round(enter + passing, 2),
+            x0=x, y0=0.45, x1=x + rng.uniform(-0.1, 0.1), y1=0.55,
+            scale0=rng.uniform(0.15, 0.25), scale1=rng.uniform(0.55, 0.8),
+            blur=blur, occlusion=occlusion
+        ))
+    return appearances
+
+
+SCRIPTS = {"classroom": script_classroom, "doorway": script_doorway}
+
+
+def background(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    """A wall, a floor and a few desk-like blocks, so the detector sees more than a flat colour."""
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    wall = np.linspace(170, 120, height, dtype=np.float32)[:, None]
+    frame[:] = np.stack([wall * 0.9, wall * 0.95, wall], axis=2).astype(np.uint8)
+    frame[int(height * 0.75):] = (60, 75, 90)
+    for _ in range(6):
+        x, y = int(rng.uniform(0, width * 0.9)), int(rng.uniform(height * 0.6, height * 0.85))
+        w, h = int(rng.uniform(width * 0.08, width * 0.2)), int(rng.uniform(height * 0.05, height * 0.12))
+        color = tuple(int(c) for c in rng.integers(40, 110, 3))
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, -1)
+    return frame
+
+
+def _face_image(face: np.ndarray, appearance: Appearance, height: int) -> np.ndarray:
+    image = cv2.resize(face, (max(1, round(face.shape[1] * height / face.shape[0])), max(1, height)),
+                       interpolation=cv2.INTER_AREA)
+    if appearance.blur:
+        image = cv2.GaussianBlur(image, (0, 0), appearance.blur)
+    if appearance.occlusion:
+        image = image.copy()
+        image[int(image.shape[0] * (1 - appearance.occlusion)):] = (45, 50, 60)
+    return image
+
+
+def render(
+    path: str,
+    appearances: List[Appearance],
+    faces: Dict[str, np.ndarray],
+    duration: float,
+    fps: int,
+    size: Tuple[int, int],
+    rng: np.random.Generator
+) -> int:
+    """Writes the video and returns its frame count."""
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"OpenCV cannot write {path} (no mp4v encoder?)")
+    scene = background(width, height, rng)
+    cache: Dict[int, Tuple[int, np.ndarray]] = {}
+    frames = int(duration * fps)
+    try:
+        for index in range(frames):
+            t = index / fps
+            frame = scene.copy()
+            # Later entries are drawn on top, like people in front
+            for i, a in enumerate(appearances):
+                if not a.enter <= t < a.exit:
+                    continue
+                p = (t - a.enter) / max(a.exit - a.enter, 1e-6)
+                face_height = int(height * (a.scale0 + (a.scale1 - a.scale0) * p))
+                if cache.get(i, (None,))[0] != face_height:
+                    cache[i] = (face_height, _face_image(faces[a.student], a, face_height))
+                image = cache[i][1]
+                cx = int(width * (a.x0 + (a.x1 - a.x0) * p))
+                cy = int(height * (a.y0 + (a.y1 - a.y0) * p))
+                left, top = cx - image.shape[1] // 2, cy - image.shape[0] // 2
+                x0, y0 = max(0, left), max(0, top)
+                x1, y1 = min(width, left + image.shape[1]), min(height, top + image.shape[0])
+                if x1 > x0 and y1 > y0:
+                    frame[y0:y1, x0:x1] = image[y0 - top:y1 - top, x0 - left:x1 - left]
+            # Mild sensor noise, so frames are not identical between appearances
+            noise = rng.integers(-3, 4, frame.shape, dtype=np.int16)
+            writer.write(np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    finally:
+        writer.release()
+    return frames
+
+
+def generate_corpus(
+    output_dir: str,
+    styles: List[str],
+    videos: int = 1,
+    duration: float = 120,
+    fps: int = 15,
+    size: Tuple[int, int] = (1280, 720),
+    students: int = 0,
+    seed: int = 0
+) -> Dict:
+    from src.embedding_loader import DATASET_DIR
+
+    faces = enrolled_faces(DATASET_DIR)
+    if not faces:
+        raise SystemExit(f"No enrollment images found under {DATASET_DIR}")
+    rng = np.random.default_rng(seed)
+    names = sorted(faces)
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "seed": seed, "fps": fps, "width": size[0], "height": size[1],
+        "videos": [],
+    }
+    for style in styles:
+        for n in range(1, videos + 1):
+            cast = list(rng.choice(names, min(students, len(names)), replace=False)) if students else names
+            appearances = SCRIPTS[style](cast, duration, rng)
+            file_name = f"{style}_{n:02d}.mp4"
+            print(f"Rendering {file_name} ({len(appearances)} students, {duration:.0f}s)...", flush=True)
+            frames = render(os.path.join(output_dir, file_name), appearances, faces, duration, fps, size, rng)
+            manifest["videos"].append({
+                "file": file_name,
+                "style": style,
+                "duration_seconds": duration,
+                "frames": frames,
+                "expected": sorted({a.student for a in appearances}),
+                "appearances": [asdict(a) for a in appearances],
+            })
+
+    with open(os.path.join(output_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    print(f"Corpus written to {output_dir}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a ground-truth video corpus from dataset/ faces.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Directory for the videos and manifest.json")
+    parser.add_argument("--styles", nargs="+", choices=STYLES, default=STYLES)
+    parser.add_argument("--videos", type=int, default=1, help="Videos per style")
+    parser.add_argument("--duration", type=float, default=120, help="Seconds per video")
+    parser.add_argument("--fps", type=int, default=15)
+    parser.add_argument("--size", default="1280x720", help="WIDTHxHEIGHT")
+    parser.add_argument("--students", type=int, default=0, help="Students per video (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    generate_corpus(args.output, args.styles, args.videos, args.duration, args.fps, (width, height),
+                    args.students, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import json
+import sys
+import time
+
+from src.database import create_db_and_tables
+from src.migrations import run_migrations
+from src.embedding_models import active_model_version, get_model
+from src import synthetic_gallery
+
+# Run from the backend directory, next to attendance.db (same as the server);
+# DATABASE_PATH points both at a scratch database for scale tests
+
+def generate_synthetic_gallery(args):
+    """
+    Generates synthetic identities around the enrolled faces. --evaluate
+    matches genuine and impostor probes against them in memory; --store
+    writes them into the gallery cache so the server recognizes against them.
+    """
+    create_db_and_tables()
+    run_migrations()
+    model_version = args.model_version or active_model_version()
+    get_model(model_version)
+
+    if args.clear:
+        print(f"Removed {synthetic_gallery.clear()} synthetic gallery embeddings.")
+        return
+
+    seeds = synthetic_gallery.seed_encodings(model_version)
+    if len(seeds) == 0:
+        print(f"No stored {model_version} encodings of enrolled faces (start the server once to build them); "
+              "using a random base instead.")
+    started = time.perf_counter()
+    gallery = synthetic_gallery.generate(
+        args.identities,
+        per_identity=args.per_identity,
+        genuine_probes=args.probes,
+        impostor_probes=args.impostors,
+        seeds=seeds,
+        inter_distance=args.inter_distance,
+        intra_distance=args.intra_distance,
+        impostor_distance=args.impostor_distance,
+        variability=args.variability,
+        random_seed=args.seed
+    )
+    print(f"Generated {args.identities} identities ({len(gallery.encodings)} embeddings) around "
+          f"{len(seeds)} enrolled encodings in {time.perf_counter() - started:.2f}s")
+
+    if args.store:
+        started = time.perf_counter()
+        stored = synthetic_gallery.store(gallery, model_version)
+        print(f"Stored {stored} {model_version} embeddings in {time.perf_counter() - started:.2f}s. "
+              "Restart the server with SYNTHETIC_GALLERY=1 to load them; --clear removes them.")
+
+    if args.evaluate:
+        print(json.dumps(synthetic_gallery.evaluate(gallery, args.tolerance), indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic gallery for scale testing.")
+    parser.add_argument("--identities", type=int, default=1000, help="Synthetic identities to generate")
+    parser.add_argument("--per-identity", type=int, default=1, help="Embeddings per identity (enrollment photos)")
+    parser.add_argument("--probes", type=int, default=100, help="Genuine probes (new photos of enrolled identities)")
+    parser.add_argument("--impostors", type=int, default=100, help="Impostor probes (identities not enrolled)")
+    parser.add_argument("--inter-distance", type=float, default=synthetic_gallery.INTER_DISTANCE,
+                        help="Typical distance between two identities")
+    parser.add_argument("--intra-distance", type=float, default=synthetic_gallery.INTRA_DISTANCE,
+                        help="Typical distance between two photos of one identity")
+    parser.add_argument("--impostor-distance", type=float, default=None,
+                        help="Spread of impostors around enrolled faces (smaller = look-alikes)")
+    parser.add_argument("--variability", type=float, default=0.25,
+                        help="Log-normal sigma of per-identity spreads (0 = uniform)")
+    parser.add_argument("--tolerance", type=float, default=0.6, help="Match tolerance for --evaluate")
+    parser.add_argument("--model-version", default=None, help="Embedding model version (default: active)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--store", action="store_true", help="Write the identities into the gallery cache")
+    parser.add_argument("--evaluate", action="store_true", help="Report match latency and accuracy")
+    parser.add_argument("--clear", action="store_true", help="Remove all stored synthetic identities and exit")
+    args = parser.parse_args()
+
+    if not (args.store or args.evaluate or args.clear):
+        parser.error("nothing to do: pass --evaluate, --store or --clear")
+    try:
+        generate_synthetic_gallery(args)
+    except ValueError as e:
+        print(f"An error occurred: {e}")
+        sys.exit(2)
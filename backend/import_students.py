@@ -0,0 +1,57 @@
+import argparse
+import sys
+
+from src.database import create_db_and_tables
+from src.migrations import run_migrations
+from src.student_import import StudentImporter, IMPORT_COLUMNS, format_report_csv
+
+# Run from the backend directory, next to attendance.db (same as the server)
+
+def import_students(csv_path, report_path=None, workers=None, batch_size=500, dry_run=False):
+    """
+    Imports accounts from 'csv_path' and writes a per-row report. Generated
+    passwords only appear in the report, so keep it somewhere safe.
+    """
+    with open(csv_path, encoding="utf-8-sig") as f:
+        text = f.read()
+
+    create_db_and_tables()
+    run_migrations()
+
+    importer = StudentImporter(workers=workers, batch_size=batch_size)
+    result = importer.import_csv(text, dry_run=dry_run)
+
+    linked = sum(1 for r in result.created if r.link == "auto")
+    missing = [r.username for r in result.created if r.link == "missing"]
+    verb = "Would create" if dry_run else "Created"
+    print(f"{verb} {len(result.created)} accounts ({linked} auto-linked to dataset folders), {len(result.errors)} errors")
+    if missing:
+        print(f"  face_identity without a dataset folder: {', '.join(missing)}")
+    for error in result.errors:
+        print(f"  Row {error['row']} ({error['username']}): {error['error']}")
+
+    report = format_report_csv(result)
+    if report_path:
+        with open(report_path, "w", newline="") as f:
+            f.write(report)
+        print(f"Report written to {report_path}")
+    elif not dry_run and any(r.generated_password for r in result.created):
+        print("Generated passwords (use --report to write them to a file instead):")
+        sys.stdout.write(report)
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import student accounts from CSV.")
+    parser.add_argument("csv", help=f"CSV file with columns: {', '.join(IMPORT_COLUMNS)} (only username is required)")
+    parser.add_argument("--report", help="Write the per-row report (incl. generated passwords) to this CSV file")
+    parser.add_argument("--workers", type=int, default=None, help="Password hashing processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Users inserted per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and link only, create nothing")
+    args = parser.parse_args()
+
+    try:
+        result = import_students(args.csv, args.report, args.workers, args.batch_size, args.dry_run)
+        sys.exit(1 if result.errors else 0)
+    except (OSError, ValueError) as e:
+        print(f"An error occurred: {e}")
+        sys.exit(2)
@@ -1,9 +1,10 @@
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 import json
 from sqlmodel import Session, select
 from .models import AuditLog, User
 from .database import engine
+from .pagination import PageRequest, keyset_page
 
 class AdminService:
     def log_action(self, actor_username: str, action: str, target_id: Optional[str] = None, details: Optional[Dict] = None) -> AuditLog:
@@ -19,6 +20,13 @@ class AdminService:
             session.refresh(log)
             return log
 
-    def get_audit_logs(self, limit: int = 100) -> List[AuditLog]:
+    def get_audit_logs(
+        self,
+        page: Optional[PageRequest] = None,
+        action: Optional[str] = None
+    ) -> Tuple[List[AuditLog], Optional[str]]:
+        statement = select(AuditLog)
+        if action:
+            statement = statement.where(AuditLog.action == action)
         with Session(engine) as session:
-            return session.exec(select(AuditLog).order_by(AuditLog.timestamp.desc()).limit(limit)).all()
+            return keyset_page(session, statement, page or PageRequest(), id_col=AuditLog.id, ts_col=AuditLog.timestamp)
@@ -0,0 +1,260 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from .models import User, UserRole
+from . import metrics
+
+SLOT_WAIT = metrics.histogram(
+    "admission_slot_wait_seconds", "Time admitted work waited for a worker slot.", ["work_class"]
+)
+
+# How often admit() drops token buckets that have refilled to their burst
+BUCKET_SWEEP_SECONDS = 60.0
+
+# Priority classes: interactive work (kiosk/teacher snapshots) is latency
+# sensitive, batch work (uploaded videos) is shed first under load. Detection
+# for the live camera overlay is cheap but polled several times a second; a
+# stale overlay frame is worthless, so it gets its own short queue and also
+# yields to interactive recognition.
+INTERACTIVE = "interactive"
+BATCH = "batch"
+DETECT = "detect"
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised instead of queueing work that cannot start soon. `status_code` is
+    503 for server load and 429 for a caller over its own budget.
+    """
+
+    def __init__(self, reason: str, retry_after: float, status_code: int = 503):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`. Not thread-safe; the controller locks."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> float:
+        """Takes `cost` tokens; returns 0 on success, else the seconds until they are available."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        """A full bucket behaves exactly like a new one, so it can be dropped."""
+        self._refill(now)
+        return self.tokens >= self.burst
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+@dataclass
+class WorkClass:
+    name: str
+    workers: int  # concurrent executions; the rest wait in line
+    max_wait_seconds: float  # reject when the estimated wait exceeds this
+    initial_cost_seconds: float  # cost estimate until the first measurement
+    # Batch work only starts while interactive load is below this share of its limit
+    yield_to_interactive: Optional[float] = None
+
+
+# (rate per second, burst) per class and role; kiosks get the largest budget
+DEFAULT_BUCKETS: Dict[Tuple[str, UserRole], Tuple[float, float]] = {
+    (INTERACTIVE, UserRole.KIOSK): (2.0, 10),
+    (INTERACTIVE, UserRole.TEACHER): (1.0, 5),
+    (INTERACTIVE, UserRole.ADMIN): (1.0, 5),
+    (BATCH, UserRole.KIOSK): (1 / 60, 2),
+    (BATCH, UserRole.TEACHER): (1 / 60, 2),
+    (BATCH, UserRole.ADMIN): (1 / 60, 2),
+    # The camera overlay polls every 300 ms
+    (DETECT, UserRole.KIOSK): (5.0, 10),
+    (DETECT, UserRole.TEACHER): (4.0, 8),
+    (DETECT, UserRole.ADMIN): (4.0, 8),
+    (DETECT, UserRole.STUDENT): (4.0, 8),
+}
+
+
+def default_classes() -> Dict[str, WorkClass]:
+    return {
+        INTERACTIVE: WorkClass(
+            name=INTERACTIVE,
+            workers=int(os.getenv("RECOGNITION_WORKERS", "1")),
+            max_wait_seconds=float(os.getenv("RECOGNITION_MAX_WAIT_SECONDS", "3")),
+            initial_cost_seconds=0.5,
+        ),
+        BATCH: WorkClass(
+            name=BATCH,
+            workers=int(os.getenv("VIDEO_WORKERS", "1")),
+            max_wait_seconds=float(os.getenv("VIDEO_MAX_WAIT_SECONDS", "300")),
+            initial_cost_seconds=60.0,
+            yield_to_interactive=0.5,
+        ),
+        DETECT: WorkClass(
+            name=DETECT,
+            workers=int(os.getenv("DETECT_WORKERS", "1")),
+            max_wait_seconds=float(os.getenv("DETECT_MAX_WAIT_SECONDS", "0.5")),
+            initial_cost_seconds=0.05,
+            yield_to_interactive=0.5,
+        ),
+    }
+
+
+class _ClassState:
+    def __init__(self, work_class: WorkClass):
+        self.work_class = work_class
+        self.slots = threading.Semaphore(work_class.workers)
+        self.in_flight = 0  # admitted and not finished, running or waiting for a slot
+        self.cost = work_class.initial_cost_seconds  # EWMA of measured service time
+        self.admitted = 0
+        self.rejected = 0
+
+
+class AdmissionController:
+    """
+    Admits recognition work based on measured capacity instead of fixed
+    request counts. Each class has its own worker slots; the expected wait of
+    a new request is (work ahead of it) x (EWMA service time) / workers, and a
+    request whose wait would exceed the class limit is rejected up front.
+    Per-principal token buckets keep one kiosk or teacher from taking the
+    whole capacity. Buckets exist only for principals seen recently: those
+    that refilled completely are swept out every BUCKET_SWEEP_SECONDS.
+
+        ticket = admission.admit(INTERACTIVE, user)   # may raise AdmissionRejected
+        with ticket:                                  # releases the admission
+            with admission.slot(ticket):              # waits for a worker, measures cost
+                ...
+    """
+
+    def __init__(
+        self,
+        classes: Optional[Dict[str, WorkClass]] = None,
+        buckets: Optional[Dict[Tuple[str, UserRole], Tuple[float, float]]] = None,
+        smoothing: float = 0.2
+    ):
+        self._lock = threading.Lock()
+        self._classes = {name: _ClassState(c) for name, c in (classes or default_classes()).items()}
+        self._bucket_rates = buckets if buckets is not None else DEFAULT_BUCKETS
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._swept_at = time.monotonic()
+        self.smoothing = smoothing
+
+    def _estimated_wait(self, state: _ClassState) -> float:
+        # Work already admitted must finish (or start) before a new request runs
+        queued = max(0, state.in_flight - state.work_class.workers + 1)
+        return queued * state.cost / state.work_class.workers
+
+    def admit(self, work_class: str, user: User) -> "Ticket":
+        with self._lock:
+            state = self._classes[work_class]
+            policy = state.work_class
+
+            wait = self._estimated_wait(state)
+            if wait > policy.max_wait_seconds:
+                state.rejected += 1
+                raise AdmissionRejected(f"{work_class} recognition is at capacity", wait - policy.max_wait_seconds)
+
+            if policy.yield_to_interactive is not None:
+                interactive = self._classes[INTERACTIVE]
+                load = self._estimated_wait(interactive) / interactive.work_class.max_wait_seconds
+                if load > policy.yield_to_interactive:
+                    state.rejected += 1
+                    raise AdmissionRejected(
+                        f"{work_class} work deferred while interactive load is high", interactive.cost * 2
+                    )
+
+            self._sweep_buckets()
+            rate = self._bucket_rates.get((work_class, user.role))
+            if rate:
+                key = (work_class, user.username)
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = TokenBucket(*rate)
+                retry_after = bucket.take()
+                if retry_after:
+                    state.rejected += 1
+                    raise AdmissionRejected(f"Too many {work_class} requests from {user.username}", retry_after, 429)
+
+            state.in_flight += 1
+            state.admitted += 1
+        return Ticket(self, work_class)
+
+    def _sweep_buckets(self):
+        """Drops idle, refilled buckets so departed principals do not accumulate. Lock held."""
+        now = time.monotonic()
+        if now - self._swept_at < BUCKET_SWEEP_SECONDS:
+            return
+        self._swept_at = now
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_full(now)]:
+            del self._buckets[key]
+
+    def _release(self, work_class: str):
+        with self._lock:
+            self._classes[work_class].in_flight -= 1
+
+    @contextmanager
+    def slot(self, ticket: "Ticket"):
+        """Waits for a worker slot of the ticket's class and records the service time."""
+        state = self._classes[ticket.work_class]
+        queued_at = time.perf_counter()
+        with state.slots:
+            started = time.perf_counter()
+            SLOT_WAIT.observe(started - queued_at, work_class=ticket.work_class)
+            try:
+                yield
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    state.cost += self.smoothing * (elapsed - state.cost)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                name: {
+                    "workers": s.work_class.workers,
+                    "in_flight": s.in_flight,
+                    "cost_seconds": round(s.cost, 3),
+                    "estimated_wait_seconds": round(self._estimated_wait(s), 3),
+                    "max_wait_seconds": s.work_class.max_wait_seconds,
+                    "admitted": s.admitted,
+                    "rejected": s.rejected,
+                }
+                for name, s in self._classes.items()
+            }
+
+
+class Ticket:
+    """An admitted request; must be released exactly once (use it as a context manager)."""
+
+    def __init__(self, controller: AdmissionController, work_class: str):
+        self.controller = controller
+        self.work_class = work_class
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self.work_class)
+
+    def __enter__(self) -> "Ticket":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
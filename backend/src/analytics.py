@@ -0,0 +1,216 @@
+import threading
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlmodel import Session, select
+from .models import AttendanceRecord, AttendanceSession
+from .database import engine
+from . import events
+
+
+@dataclass
+class PresenceMatrix:
+    """Student x session presence, built in one SQL pass. Rows follow `students`, columns `session_ids`."""
+    session_ids: List[int]
+    session_names: List[str]
+    session_starts: List[datetime]
+    students: List[str]
+    present: np.ndarray  # bool, shape (students, sessions)
+    arrival_minutes: np.ndarray  # float, minutes after session start, NaN where absent
+
+
+def current_streaks(present: np.ndarray) -> np.ndarray:
+    """Number of consecutive sessions attended, counting back from the latest, per row."""
+    if present.shape[1] == 0:
+        return np.zeros(present.shape[0], dtype=int)
+    missed = ~present[:, ::-1]
+    streak = missed.argmax(axis=1)
+    # argmax is 0 when no session was missed at all
+    streak[~missed.any(axis=1)] = present.shape[1]
+    return streak
+
+
+def longest_absence_streaks(present: np.ndarray) -> np.ndarray:
+    """Longest run of consecutive missed sessions per row."""
+    rows, cols = present.shape
+    longest = np.zeros(rows, dtype=int)
+    if cols == 0:
+        return longest
+    padded = np.zeros((rows, cols + 2), dtype=np.int8)
+    padded[:, 1:-1] = ~present
+    edges = np.diff(padded, axis=1)
+    # Row-major nonzero keeps starts and ends of the same run aligned
+    start_rows, start_cols = np.nonzero(edges == 1)
+    _, end_cols = np.nonzero(edges == -1)
+    np.maximum.at(longest, start_rows, end_cols - start_cols)
+    return longest
+
+
+class AnalyticsService:
+    """
+    Attendance analytics over a set of sessions, computed with NumPy on a
+    presence matrix. Results are cached per (session set, roster, parameters)
+    and dropped whenever attendance or sessions change (see `on_event`).
+    """
+
+    def __init__(self, max_cached: int = 32):
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+
+    def on_event(self, event: Dict):
+        if event["type"] in (events.ATTENDANCE_MARKED, events.SESSION_STARTED, events.SESSION_ENDED):
+            self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _select_sessions(
+        self,
+        session: Session,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        session_ids: Optional[List[int]]
+    ) -> List[AttendanceSession]:
+        statement = select(AttendanceSession).where(AttendanceSession.is_active == False)
+        if since:
+            statement = statement.where(AttendanceSession.created_at >= since)
+        if until:
+            statement = statement.where(AttendanceSession.created_at < until)
+        if session_ids:
+            statement = statement.where(AttendanceSession.id.in_(session_ids))
+        return session.exec(statement.order_by(AttendanceSession.created_at, AttendanceSession.id)).all()
+
+    def build_matrix(self, sessions: List[AttendanceSession], roster: List[str]) -> PresenceMatrix:
+        session_ids = [s.id for s in sessions]
+        column = {sid: i for i, sid in enumerate(session_ids)}
+
+        with Session(engine) as session:
+            rows = session.exec(select(
+                AttendanceRecord.session_id, AttendanceRecord.student_name, AttendanceRecord.timestamp
+            ).where(AttendanceRecord.session_id.in_(session_ids))).all() if session_ids else []
+
+        # Students seen in records but no longer enrolled still get a row
+        students = sorted(set(roster) | {name for _, name, _ in rows})
+        row_of = {name: i for i, name in enumerate(students)}
+
+        present = np.zeros((len(students), len(session_ids)), dtype=bool)
+        arrival = np.full((len(students), len(session_ids)), np.nan)
+        if rows:
+            r = np.fromiter((row_of[name] for _, name, _ in rows), dtype=np.intp, count=len(rows))
+            c = np.fromiter((column[sid] for sid, _, _ in rows), dtype=np.intp, count=len(rows))
+            marked_at = np.array([ts for _, _, ts in rows], dtype="datetime64[us]")
+            starts = np.array([s.created_at for s in sessions], dtype="datetime64[us]")
+            present[r, c] = True
+            arrival[r, c] = (marked_at - starts[c]) / np.timedelta64(1, "m")
+
+        return PresenceMatrix(
+            session_ids=session_ids,
+            session_names=[s.name for s in sessions],
+            session_starts=[s.created_at for s in sessions],
+            students=students,
+            present=present,
+            arrival_minutes=arrival
+        )
+
+    def attendance_report(
+        self,
+        roster: List[str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        session_ids: Optional[List[int]] = None,
+        chronic_threshold: float = 0.8,
+        late_after_minutes: float = 10.0
+    ) -> Dict:
+        """
+        Per-student rates and streaks, chronic absentees (rate below
+        `chronic_threshold`) and per-session punctuality over finished sessions.
+        """
+        with Session(engine) as session:
+            sessions = self._select_sessions(session, since, until, session_ids)
+
+        key = (tuple(s.id for s in sessions), tuple(sorted(roster)), chronic_threshold, late_after_minutes)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        report = self._compute(self.build_matrix(sessions, roster), chronic_threshold, late_after_minutes)
+
+        with self._lock:
+            self._cache[key] = report
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return report
+
+    def _compute(self, matrix: PresenceMatrix, chronic_threshold: float, late_after_minutes: float) -> Dict:
+        present = matrix.present
+        n_sessions = present.shape[1]
+
+        attended = present.sum(axis=1)
+        rates = attended / n_sessions if n_sessions else np.zeros(len(matrix.students))
+        streaks = current_streaks(present)
+        absences = longest_absence_streaks(present)
+
+        with warnings.catch_warnings():
+            # Sessions nobody attended have all-NaN columns
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            median_arrival = np.nanmedian(matrix.arrival_minutes, axis=0) if matrix.students else np.full(n_sessions, np.nan)
+            mean_arrival = np.nanmean(matrix.arrival_minutes, axis=0) if matrix.students else np.full(n_sessions, np.nan)
+        late_counts = (matrix.arrival_minutes > late_after_minutes).sum(axis=0)
+        present_counts = present.sum(axis=0)
+
+        def _minutes(value: float) -> Optional[float]:
+            return None if np.isnan(value) else round(float(value), 2)
+
+        students = [
+            {
+                "student_name": name,
+                "attended": int(attended[i]),
+                "rate": round(float(rates[i]), 4),
+                "current_streak": int(streaks[i]),
+                "longest_absence_streak": int(absences[i]),
+            }
+            for i, name in enumerate(matrix.students)
+        ]
+        chronic = [s["student_name"] for s in students if n_sessions and s["rate"] < chronic_threshold]
+
+        punctuality = [
+            {
+                "session_id": sid,
+                "session_name": matrix.session_names[j],
+                "started_at": matrix.session_starts[j],
+                "present": int(present_counts[j]),
+                "present_rate": round(float(present_counts[j] / len(matrix.students)), 4) if matrix.students else 0.0,
+                "late": int(late_counts[j]),
+                "median_arrival_minutes": _minutes(median_arrival[j]),
+                "mean_arrival_minutes": _minutes(mean_arrival[j]),
+            }
+            for j, sid in enumerate(matrix.session_ids)
+        ]
+
+        return {
+            "session_count": n_sessions,
+            "students": students,
+            "chronic_absentees": chronic,
+            "sessions": punctuality,
+        }
+
+    def student_summary(self, report: Dict, names: List[str]) -> Dict:
+        """Picks one student's stats out of a report; with several aliases the most attended wins."""
+        matches = [s for s in report["students"] if s["student_name"] in names]
+        if matches:
+            best = max(matches, key=lambda s: s["attended"])
+            return {"session_count": report["session_count"], **best}
+        return {
+            "session_count": report["session_count"],
+            "student_name": names[0] if names else None,
+            "attended": 0,
+            "rate": 0.0,
+            "current_streak": 0,
+            "longest_absence_streak": report["session_count"],
+        }
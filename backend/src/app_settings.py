@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import Session
+from .models import AppSetting
+from .database import engine
+
+
+def get_setting(key: str, default: Optional[str] = None) -> Optional[str]:
+    with Session(engine) as session:
+        setting = session.get(AppSetting, key)
+        return setting.value if setting else default
+
+
+def set_setting(key: str, value: str):
+    with Session(engine) as session:
+        setting = session.get(AppSetting, key) or AppSetting(key=key, value=value)
+        setting.value = value
+        setting.updated_at = datetime.utcnow()
+        session.add(setting)
+        session.commit()
@@ -1,13 +1,22 @@
 from datetime import datetime, timedelta
+from concurrent.futures import Future
 import json
-from typing import List, Optional, Set, Dict
+from typing import List, Optional, Set, Dict, Tuple
+from sqlalchemy import update
 from sqlmodel import Session, select, func
-from .models import AttendanceRecord, AttendanceSession, UnknownFace
+from .models import AttendanceRecord, AttendanceSession, UnknownFace, AttendanceSource, FaceDetection, SessionSummary, SessionHistoryEntry
 from .database import engine
+from .attendance_writer import AttendanceWriter, upsert_attendance
+from .session_state import SessionStateCache
+from .session_summary import bump_summary, finalize_summary, refinalize_if_final
+from .pagination import PageRequest, keyset_page
+from . import events
+from .events import event_bus
 
 class AttendanceService:
-    def __init__(self):
-        pass
+    def __init__(self, writer: Optional[AttendanceWriter] = None):
+        self.writer = writer or AttendanceWriter()
+        self.state = SessionStateCache()
 
     def create_session(self, name: str) -> AttendanceSession:
         with Session(engine) as session:
@@ -22,84 +31,121 @@ class AttendanceService:
             session.add(new_session)
             session.commit()
             session.refresh(new_session)
+            self.state.set_active(new_session)
+            event_bus.publish(events.SESSION_STARTED, new_session)
             return new_session
 
-    def end_active_session(self) -> Optional[AttendanceSession]:
+    def end_active_session(self, all_students: Optional[List[str]] = None) -> Optional[AttendanceSession]:
+        """
+        Ends the active session and finalizes its summary. Passing the roster
+        snapshots the absentee list so later reports don't diff against it.
+        """
         with Session(engine) as session:
             active = session.exec(select(AttendanceSession).where(AttendanceSession.is_active == True)).first()
             if active:
                 active.is_active = False
                 active.end_time = datetime.utcnow()
                 session.add(active)
+                finalize_summary(session, active.id, all_students)
                 session.commit()
                 session.refresh(active)
+            self.state.set_active(None)
+            if active:
+                event_bus.publish(events.SESSION_ENDED, active)
             return active
 
     def get_active_session(self) -> Optional[AttendanceSession]:
-        with Session(engine) as session:
-             return session.exec(select(AttendanceSession).where(AttendanceSession.is_active == True)).first()
+        # Served from the in-process session state; see SessionStateCache
+        return self.state.get_active()
 
-    def get_session_history(self) -> List[AttendanceSession]:
+    def get_session_history(self, page: Optional[PageRequest] = None) -> Tuple[List[SessionHistoryEntry], Optional[str]]:
         with Session(engine) as session:
-            return session.exec(select(AttendanceSession).where(AttendanceSession.is_active == False).order_by(AttendanceSession.created_at.desc())).all()
+            rows, next_cursor = keyset_page(
+                session,
+                select(AttendanceSession, SessionSummary)
+                .join(SessionSummary, SessionSummary.session_id == AttendanceSession.id, isouter=True)
+                .where(AttendanceSession.is_active == False),
+                page or PageRequest(),
+                id_col=AttendanceSession.id,
+                ts_col=AttendanceSession.created_at
+            )
 
-    def mark_attendance(
-        self, 
-        student_name: str, 
-        confidence: float = 0.0, 
+            history = []
+            for att_session, summary in rows:
+                entry = SessionHistoryEntry(**att_session.model_dump())
+                if summary:
+                    entry.present_count = summary.present_count
+                    entry.absent_count = summary.absent_count
+                    entry.unknown_count = summary.unknown_count
+                    entry.evidence_count = summary.evidence_count
+                    entry.first_arrival = summary.first_arrival
+                    entry.last_arrival = summary.last_arrival
+                history.append(entry)
+            return history, next_cursor
+
+    def queue_attendance(
+        self,
+        student_name: str,
         session_id: Optional[int] = None,
-        metadata: Optional[Dict] = None
-    ) -> Optional[AttendanceRecord]:
+        distance: Optional[float] = None
+    ) -> Optional[Future]:
         """
-        Marks attendance. Requires an active session ID (or finds one if not provided).
+        Queues an attendance mark on the background writer without waiting for it.
+        Returns None when nothing is queued (Unknown face, no active session, or the
+        student is already in the cached marked-set with a better distance),
+        otherwise a Future resolving to the new record, or None if the DB already had it.
         """
         if student_name == "Unknown":
             return None
 
-        with Session(engine) as session:
-            if not session_id:
-                # Find active session
-                active_session = session.exec(select(AttendanceSession).where(AttendanceSession.is_active == True)).first()
-                if not active_session:
-                    print(f"Skipping attendance for {student_name}: No active session.")
-                    return None
-                session_id = active_session.id
-            
-            # Check for existing record IN THIS SESSION
-            statement = select(AttendanceRecord).where(
-                AttendanceRecord.student_name == student_name,
-                AttendanceRecord.session_id == session_id
-            )
-            existing_record = session.exec(statement).first()
-
-            if existing_record:
-                # Already marked for this session
-                # Optional: Update metadata if new confidence is better? 
-                # For now, first detection wins.
+        if not session_id:
+            active_session = self.get_active_session()
+            if not active_session:
+                print(f"Skipping attendance for {student_name}: No active session.")
                 return None
+            session_id = active_session.id
 
-            # Create new record
-            metadata_str = json.dumps(metadata) if metadata else None
-            new_record = AttendanceRecord(
-                student_name=student_name, 
-                confidence=confidence, 
-                session_id=session_id,
-                metadata_json=metadata_str
-            )
-            session.add(new_record)
-            session.commit()
-            session.refresh(new_record)
-            print(f"Attendance marked for {student_name} in session {session_id}")
-            return new_record
+        if not self.state.try_mark(session_id, student_name, distance):
+            # Already marked in the active session at least as well, no need to touch the DB
+            return None
+
+        future = self.writer.submit_attendance(student_name, session_id, distance=distance)
+        future.add_done_callback(self._on_mark_written)
+        return future
+
+    def _on_mark_written(self, future: Future):
+        # The claim in the cached marked-set is only valid if the row was written
+        if future.exception() is not None:
+            self.state.invalidate()
+        elif future.result() is not None:
+            event_bus.publish(events.ATTENDANCE_MARKED, future.result())
+
+    def _on_unknown_written(self, future: Future):
+        if future.exception() is None:
+            event_bus.publish(events.UNKNOWN_REGISTERED, future.result())
+
+    def mark_attendance(
+        self, 
+        student_name: str, 
+        distance: Optional[float] = None, 
+        session_id: Optional[int] = None
+    ) -> Optional[AttendanceRecord]:
+        """
+        Marks attendance. Requires an active session ID (or finds one if not provided).
+        Blocks until the writer has committed the batch containing this mark.
+        """
+        future = self.queue_attendance(student_name, session_id=session_id, distance=distance)
+        if future is None:
+            return None
+        return future.result()
 
     def get_recent_records(self, limit: int = 50) -> List[AttendanceRecord]:
+        # Only get records for the currently active session
+        active = self.get_active_session()
+        if not active:
+            return []
+
         with Session(engine) as session:
-            # Only get records for the currently active session
-            active = session.exec(select(AttendanceSession).where(AttendanceSession.is_active == True)).first()
-            
-            if not active:
-                return []
-                
             statement = select(AttendanceRecord).where(
                 AttendanceRecord.session_id == active.id
             ).order_by(AttendanceRecord.timestamp.desc()).limit(limit)
@@ -108,6 +154,11 @@ class AttendanceService:
             return results
 
     def get_absentees_for_session(self, session_id: int, all_students: List[str]) -> List[str]:
+        marked = self.state.marked_students(session_id)
+        if marked is not None:
+            # Active session: pure set difference against the cached marked-set
+            return sorted(set(all_students) - marked)
+
         with Session(engine) as session:
             statement = select(AttendanceRecord.student_name).where(
                 AttendanceRecord.session_id == session_id
@@ -127,12 +178,21 @@ class AttendanceService:
 
     def get_session_report(self, session_id: int, all_students: List[str]) -> Dict[str, List[str]]:
         with Session(engine) as session:
+            # Unique (session_id, student_name) index: present names come straight off the index
             statement = select(AttendanceRecord.student_name).where(
                 AttendanceRecord.session_id == session_id
-            ).distinct()
-            
-            present_list = session.exec(statement).all()
-            present_set = set(present_list)
+            ).order_by(AttendanceRecord.student_name)
+            present_sorted = list(session.exec(statement).all())
+
+            summary = session.get(SessionSummary, session_id)
+            if summary and summary.is_final and summary.absent_json is not None:
+                # Absentees were snapshotted against the roster when the session ended
+                return {
+                    "present": present_sorted,
+                    "absent": json.loads(summary.absent_json)
+                }
+
+            present_set = set(present_sorted)
             all_known = set(all_students)
             
             absent_list = list(all_known - present_set)
@@ -146,17 +206,34 @@ class AttendanceService:
                 "absent": absent_sorted
             }
 
+    def queue_unknown(self, session_id: int, image_path: str, confidence: float = 0.0) -> Future:
+        future = self.writer.submit_unknown(session_id, image_path, confidence)
+        future.add_done_callback(self._on_unknown_written)
+        return future
+
     def register_unknown(self, session_id: int, image_path: str, confidence: float = 0.0) -> UnknownFace:
-        with Session(engine) as session:
-            unknown = UnknownFace(
-                session_id=session_id,
-                image_path=image_path,
-                confidence=confidence
-            )
-            session.add(unknown)
-            session.commit()
-            session.refresh(unknown)
-            return unknown
+        return self.queue_unknown(session_id, image_path, confidence).result()
+
+    def queue_source(
+        self,
+        session_id: int,
+        file_path: str,
+        media_type: str,
+        faces: Optional[List[Dict]] = None,
+        content_hash: Optional[str] = None
+    ) -> Future:
+        """Queues an evidence source together with a FaceDetection row per recognized face."""
+        return self.writer.submit_source(session_id, file_path, media_type, faces, content_hash)
+
+    def record_source(
+        self,
+        session_id: int,
+        file_path: str,
+        media_type: str,
+        faces: Optional[List[Dict]] = None,
+        content_hash: Optional[str] = None
+    ) -> AttendanceSource:
+        return self.queue_source(session_id, file_path, media_type, faces, content_hash).result()
 
     def get_unknowns(self, session_id: int) -> List[UnknownFace]:
         with Session(engine) as session:
@@ -175,26 +252,93 @@ class AttendanceService:
             unknown.resolved_to = student_name
             session.add(unknown)
             
-            # Create attendance record
-            record = AttendanceRecord(
+            # Create (or upgrade) the attendance record; human verified beats any match
+            record, inserted = upsert_attendance(
+                session,
                 student_name=student_name,
                 session_id=unknown.session_id,
-                confidence=1.0, # Human verified
-                metadata_json=json.dumps({"source": "manual_resolution", "original_unknown_id": unknown.id})
+                distance=0.0
+            )
+            if record is None:
+                # Already human verified, keep the existing mark
+                record = session.exec(select(AttendanceRecord).where(
+                    AttendanceRecord.session_id == unknown.session_id,
+                    AttendanceRecord.student_name == student_name
+                )).first()
+            elif inserted and not refinalize_if_final(session, unknown.session_id):
+                bump_summary(
+                    session, unknown.session_id, present=1,
+                    first_arrival=record.timestamp, last_arrival=record.timestamp
+                )
+            # The detection that produced this crop now has an identity
+            session.exec(
+                update(FaceDetection)
+                .where(FaceDetection.crop_path == unknown.image_path)
+                .values(identity=student_name, distance=0.0)
             )
-            session.add(record)
             session.commit()
             session.refresh(record)
-            session.refresh(record)
+            # Written outside the writer, so the cached marked-set must be reloaded
+            self.state.invalidate()
+            event_bus.publish(events.UNKNOWN_RESOLVED, {
+                "unknown_id": unknown_id,
+                "session_id": unknown.session_id,
+                "student_name": student_name,
+            })
+            event_bus.publish(events.ATTENDANCE_MARKED, record)
             return record
 
-    def get_student_history(self, student_name: str, aliases: Optional[List[str]] = None) -> List[AttendanceRecord]:
+    def get_student_history(
+        self,
+        student_name: str,
+        aliases: Optional[List[str]] = None,
+        page: Optional[PageRequest] = None
+    ) -> Tuple[List[AttendanceRecord], Optional[str]]:
         with Session(engine) as session:
             # Check for records matching username OR face identity alias
             names_to_check = [student_name]
             if aliases:
                 names_to_check.extend(aliases)
             
-            return session.exec(select(AttendanceRecord).where(
-                AttendanceRecord.student_name.in_(names_to_check)
-            ).order_by(AttendanceRecord.timestamp.desc())).all()
+            return keyset_page(
+                session,
+                select(AttendanceRecord).where(AttendanceRecord.student_name.in_(names_to_check)),
+                page or PageRequest(),
+                id_col=AttendanceRecord.id,
+                ts_col=AttendanceRecord.timestamp
+            )
+
+    def get_session_evidence(self, session_id: int, page: Optional[PageRequest] = None) -> Tuple[List[AttendanceSource], Optional[str]]:
+        with Session(engine) as session:
+            return keyset_page(
+                session,
+                select(AttendanceSource).where(AttendanceSource.session_id == session_id),
+                page or PageRequest(),
+                id_col=AttendanceSource.id,
+                ts_col=AttendanceSource.timestamp
+            )
+
+    def get_student_evidence(
+        self,
+        student_name: str,
+        aliases: Optional[List[str]] = None,
+        page: Optional[PageRequest] = None
+    ) -> Tuple[List[AttendanceSource], Optional[str]]:
+        """Evidence frames in which the student's face was detected, newest first."""
+        names_to_check = [student_name] + (aliases or [])
+        with Session(engine) as session:
+            # Served from the (identity, session_id) detection index
+            matching = select(FaceDetection.source_id).where(FaceDetection.identity.in_(names_to_check))
+            return keyset_page(
+                session,
+                select(AttendanceSource).where(AttendanceSource.id.in_(matching)),
+                page or PageRequest(),
+                id_col=AttendanceSource.id,
+                ts_col=AttendanceSource.timestamp
+            )
+
+    def get_source_faces(self, source_id: int) -> List[FaceDetection]:
+        with Session(engine) as session:
+            return session.exec(select(FaceDetection).where(
+                FaceDetection.source_id == source_id
+            ).order_by(FaceDetection.left)).all()
@@ -0,0 +1,309 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+from .models import AttendanceRecord, AttendanceSource, FaceDetection, FaceEmbedding, UnknownFace
+from .embedding_models import encode_embedding
+from .database import engine
+from .session_summary import bump_summary, refinalize_if_final
+from .evidence_store import touch_blobs
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_SECONDS = metrics.histogram(
+    "attendance_writer_transaction_seconds", "Duration of one attendance writer transaction (a batch)."
+)
+BATCH_SIZE = metrics.histogram(
+    "attendance_writer_batch_size", "Write ops committed per attendance writer transaction.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+
+def upsert_attendance(
+    session: Session,
+    student_name: str,
+    session_id: int,
+    distance: Optional[float] = None,
+    timestamp: Optional[datetime] = None
+) -> Tuple[Optional[AttendanceRecord], bool]:
+    """
+    Marks a student in a session with a single INSERT ... ON CONFLICT statement.
+
+    A repeat sighting only replaces the stored distance when it is better
+    (lower) than the stored one; the first-arrival timestamp is kept.
+    Returns (row, inserted). `row` is None when an existing mark was left as is.
+    `timestamp` backdates a new mark (e.g. to the sighting that produced it).
+    """
+    now = timestamp or datetime.utcnow()
+    stmt = sqlite_insert(AttendanceRecord).values(
+        student_name=student_name,
+        session_id=session_id,
+        timestamp=now,
+        distance=distance
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AttendanceRecord.session_id, AttendanceRecord.student_name],
+        set_={
+            "distance": stmt.excluded.distance,
+        },
+        where=or_(
+            AttendanceRecord.distance.is_(None),
+            stmt.excluded.distance < AttendanceRecord.distance
+        )
+    ).returning(AttendanceRecord)
+
+    # populate_existing refreshes a row already in this session's identity map
+    row = session.scalars(stmt, execution_options={"populate_existing": True}).first()
+    if row is None:
+        return None, False
+    # An update keeps the original timestamp, so only a fresh insert carries ours
+    return row, row.timestamp == now
+
+
+def detection_rows(source: AttendanceSource, faces: List[Dict]) -> List[FaceDetection]:
+    """FaceDetection rows for recognition results (see RecognitionService.recognize_image)."""
+    rows = []
+    for face in faces:
+        top, right, bottom, left = face["bounding_box"]
+        rows.append(FaceDetection(
+            source_id=source.id,
+            session_id=source.session_id,
+            identity=None if face["name"] == "Unknown" else face["name"],
+            distance=face.get("distance"),
+            quality=face.get("quality"),
+            top=top,
+            right=right,
+            bottom=bottom,
+            left=left,
+            crop_path=face.get("crop_path"),
+            timestamp=source.timestamp
+        ))
+    return rows
+
+
+def embedding_rows(detections: List[FaceDetection], faces: List[Dict]) -> List[FaceEmbedding]:
+    """FaceEmbedding rows for faces recognized with encodings (detections must be flushed)."""
+    return [
+        FaceEmbedding(
+            detection_id=detection.id,
+            model_version=face["model_version"],
+            embedding=encode_embedding(face["encoding"])
+        )
+        for detection, face in zip(detections, faces)
+        if face.get("encoding") is not None
+    ]
+
+
+@dataclass
+class _WriteOp:
+    kind: str  # 'attendance', 'source' or 'unknown'
+    payload: Dict
+    future: Future = field(default_factory=Future)
+
+
+class AttendanceWriter:
+    """
+    Single background writer for the hot recognition write path.
+
+    Attendance, AttendanceSource (with its FaceDetection rows) and UnknownFace
+    writes are queued and coalesced
+    into one transaction per batch, together with the matching SessionSummary
+    counter updates. A batch is flushed when it reaches
+    `max_batch_size` ops or when `flush_interval` seconds have passed since the
+    first queued op, whichever comes first. Every submit returns a Future that
+    resolves to the persisted row (or None for a duplicate attendance mark).
+    """
+
+    def __init__(self, max_batch_size: int = 64, flush_interval: float = 0.05):
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[_WriteOp]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Flushes everything already queued, then stops the writer thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit_attendance(
+        self,
+        student_name: str,
+        session_id: int,
+        distance: Optional[float] = None
+    ) -> Future:
+        return self._submit("attendance", {
+            "student_name": student_name,
+            "session_id": session_id,
+            "distance": distance,
+        })
+
+    def submit_source(
+        self,
+        session_id: int,
+        file_path: str,
+        media_type: str,
+        faces: Optional[List[Dict]] = None,
+        content_hash: Optional[str] = None
+    ) -> Future:
+        return self._submit("source", {
+            "session_id": session_id,
+            "file_path": file_path,
+            "media_type": media_type,
+            "content_hash": content_hash,
+            "faces": faces or [],
+        })
+
+    def submit_unknown(self, session_id: int, image_path: str, confidence: float = 0.0) -> Future:
+        return self._submit("unknown", {
+            "session_id": session_id,
+            "image_path": image_path,
+            "confidence": confidence,
+        })
+
+    def _submit(self, kind: str, payload: Dict) -> Future:
+        # Lazily start so CLI scripts and background tasks work without the app lifecycle
+        self.start()
+        op = _WriteOp(kind=kind, payload=payload)
+        self._queue.put(op)
+        return op.future
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            op = self._queue.get()
+            if op is None:
+                break
+
+            batch = [op]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    next_op = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if next_op is None:
+                    stopping = True
+                    break
+                batch.append(next_op)
+
+            self._flush(batch)
+
+        # Drain whatever was queued behind the stop sentinel
+        leftover = []
+        while True:
+            try:
+                op = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if op is not None:
+                leftover.append(op)
+        if leftover:
+            self._flush(leftover)
+
+    def pending(self) -> int:
+        """Ops queued and not yet picked up for a transaction."""
+        return self._queue.qsize()
+
+    def _flush(self, batch: List[_WriteOp]):
+        try:
+            results = self._write_batch(batch)
+        except Exception as e:
+            # One bad op must not fail the whole batch: retry each op on its own
+            logger.warning("AttendanceWriter: batch of %d failed (%s), retrying individually", len(batch), e)
+            for op in batch:
+                try:
+                    result = self._write_batch([op])[0]
+                except Exception as op_error:
+                    op.future.set_exception(op_error)
+                else:
+                    op.future.set_result(result)
+            return
+
+        for op, result in zip(batch, results):
+            op.future.set_result(result)
+
+    def _write_batch(self, batch: List[_WriteOp]) -> List:
+        started = time.perf_counter()
+        # expire_on_commit=False keeps returned rows readable after the session closes
+        with Session(engine, expire_on_commit=False) as session:
+            results = []
+            # Per-session summary deltas, applied once per session at the end of the batch
+            deltas: Dict[int, Dict] = {}
+            # Evidence blobs the batch's sources reference (e.g. deduplicated uploads)
+            blobs = set()
+
+            for op in batch:
+                data = op.payload
+                delta = deltas.setdefault(data["session_id"], {
+                    "present": 0, "unknown": 0, "evidence": 0, "first_arrival": None, "last_arrival": None
+                })
+                if op.kind == "attendance":
+                    row, inserted = upsert_attendance(session, **data)
+                    # Repeat sightings are not new marks, even if they improved the distance
+                    results.append(row if inserted else None)
+                    if inserted:
+                        delta["present"] += 1
+                        delta["first_arrival"] = min(filter(None, [delta["first_arrival"], row.timestamp]))
+                        delta["last_arrival"] = max(filter(None, [delta["last_arrival"], row.timestamp]))
+                    continue
+                elif op.kind == "source":
+                    faces = data["faces"]
+                    row = AttendanceSource(**{k: v for k, v in data.items() if k != "faces"})
+                    delta["evidence"] += 1
+                    if row.content_hash:
+                        blobs.add(row.content_hash)
+                    if faces:
+                        # Detections need the source id and embeddings the detection ids, so flush in order
+                        session.add(row)
+                        session.flush()
+                        detections = detection_rows(row, faces)
+                        session.add_all(detections)
+                        session.flush()
+                        session.add_all(embedding_rows(detections, faces))
+                elif op.kind == "unknown":
+                    row = UnknownFace(**data)
+                    delta["unknown"] += 1
+                else:
+                    raise ValueError(f"Unknown write op: {op.kind}")
+
+                session.add(row)
+                results.append(row)
+
+            for session_id, delta in deltas.items():
+                if session_id is not None and not refinalize_if_final(session, session_id):
+                    bump_summary(session, session_id, **delta)
+            touch_blobs(session, blobs)
+
+            session.commit()
+        TRANSACTION_SECONDS.observe(time.perf_counter() - started)
+        BATCH_SIZE.observe(len(batch))
+
+        # Per-mark detail only at debug level: this runs for every row on the write path
+        if logger.isEnabledFor(logging.DEBUG):
+            for op, row in zip(batch, results):
+                if op.kind == "attendance" and row is not None:
+                    logger.debug("Attendance marked for %s in session %s", row.student_name, row.session_id)
+        return results
@@ -1,5 +1,8 @@
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -13,8 +16,13 @@ SECRET_KEY = "robocop_secret_key_change_me"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480 # 8 hours
 
+# Authenticated users are cached briefly so requests don't hit the DB
+PRINCIPAL_CACHE_TTL_SECONDS = 60
+PRINCIPAL_CACHE_SIZE = 1024
+
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -32,6 +40,64 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class PrincipalCache:
+    """
+    TTL + LRU cache of authenticated users keyed by (username, token version).
+    Tokens carry the version they were issued at; bumping a user's
+    token_version (password or role change) makes every older token miss the
+    cache and fail the DB check. Cached users are shared, treat them as read-only.
+    """
+
+    def __init__(self, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[User, float]]" = OrderedDict()
+
+    def get(self, username: str, token_version: int) -> Optional[User]:
+        key = (username, token_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, user: User):
+        with self._lock:
+            self._entries[(user.username, user.token_version)] = (user, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end((user.username, user.token_version))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == username]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+def create_user_token(user: User, expires_delta: Optional[timedelta] = None) -> str:
+    return create_access_token(
+        data={"sub": user.username, "role": user.role.value, "ver": user.token_version},
+        expires_delta=expires_delta
+    )
+
+def revoke_user_tokens(session: Session, user: User):
+    """Invalidates every token issued to `user` so far; call before committing a role or password change."""
+    user.token_version += 1
+    session.add(user)
+    principal_cache.invalidate(user.username)
+
 def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,23 +111,52 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
+
+    # Tokens issued before versioning count as version 0
+    token_version = payload.get("ver", 0)
+    user = principal_cache.get(username, token_version)
+    if user is not None:
+        return user
+
     with Session(engine) as session:
         user = session.exec(select(User).where(User.username == username)).first()
-        if user is None:
+        if user is None or user.token_version != token_version:
             raise credentials_exception
+        principal_cache.put(user)
         return user
 
+def get_media_user(
+    header_token: Optional[str] = Depends(optional_oauth2_scheme),
+    token: Optional[str] = None
+) -> User:
+    """
+    get_current_user for media URLs: <img>/<video> tags cannot send headers,
+    so the JWT may also come in the `token` query parameter (as for /events).
+    """
+    if not header_token and not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return get_current_user(header_token or token)
+
 class RoleChecker:
+    """Role guard; the user comes from the principal cache, so the check does no I/O."""
+
     def __init__(self, allowed_roles: List[UserRole]):
         self.allowed_roles = allowed_roles
 
     def __call__(self, user: User = Depends(get_current_user)):
-        print(f"DEBUG: Checking Role. User: {user.username}, Role: {user.role}, Allowed: {[r.value for r in self.allowed_roles]}")
         if user.role not in self.allowed_roles:
-            print(f"DEBUG: Access Denied for {user.username}")
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, 
                 detail=f"Operation not permitted. Required roles: {[r.value for r in self.allowed_roles]}"
             )
         return user
+
+class MediaRoleChecker(RoleChecker):
+    """RoleChecker for media URLs, which may carry the JWT as ?token= (see get_media_user)."""
+
+    def __call__(self, user: User = Depends(get_media_user)):
+        return super().__call__(user)
@@ -1,11 +1,22 @@
+import os
+from sqlalchemy import event
 from sqlmodel import SQLModel, create_engine, Session
 
-sqlite_file_name = "attendance.db"
+# Relative to the working directory; point scale tests and benchmarks at a scratch database
+sqlite_file_name = os.getenv("DATABASE_PATH", "attendance.db")
 sqlite_url = f"sqlite:///{sqlite_file_name}"
 
 connect_args = {"check_same_thread": False}
 engine = create_engine(sqlite_url, connect_args=connect_args)
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets dashboard reads proceed while the attendance writer holds the write lock
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
 
@@ -1,8 +1,9 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from sqlmodel import Session, select
-from .models import Dispute, DisputeStatus, User, AttendanceSession
+from .models import Dispute, DisputeStatus, User, AttendanceSession, AttendanceSource, FaceDetection
 from .database import engine
+from .pagination import PageRequest, keyset_page
 
 class DisputeService:
     def create_dispute(
@@ -25,28 +26,71 @@ class DisputeService:
                 # Update existing if needed or return
                 return existing
 
-            coords_str = str(selected_face_coords) if selected_face_coords else None
             dispute = Dispute(
                 student_username=student_username,
                 session_id=session_id,
                 description=description,
-                attendance_source_id=attendance_source_id,
-                selected_face_coords=coords_str
+                attendance_source_id=attendance_source_id
             )
+            if selected_face_coords and len(selected_face_coords) == 4:
+                dispute.face_top, dispute.face_right, dispute.face_bottom, dispute.face_left = selected_face_coords
+                if attendance_source_id:
+                    detection = self.find_detection(session, attendance_source_id, selected_face_coords)
+                    dispute.face_detection_id = detection.id if detection else None
             session.add(dispute)
             session.commit()
             session.refresh(dispute)
             return dispute
 
-    def get_my_disputes(self, student_username: str) -> List[Dispute]:
+    def find_detection(self, session: Session, source_id: int, coords: List[int]) -> Optional[FaceDetection]:
+        """The detected face in `source_id` containing the centre of the selected box, if any."""
+        top, right, bottom, left = coords
+        y, x = (top + bottom) / 2, (left + right) / 2
+        return session.exec(select(FaceDetection).where(
+            FaceDetection.source_id == source_id,
+            FaceDetection.top <= y, FaceDetection.bottom >= y,
+            FaceDetection.left <= x, FaceDetection.right >= x
+        ).order_by(FaceDetection.distance)).first()
+
+    def get_dispute_evidence(self, dispute_id: int) -> Optional[Dict]:
+        """The disputed evidence frame, every face detected in it and the one the student picked."""
+        with Session(engine) as session:
+            dispute = session.get(Dispute, dispute_id)
+            if not dispute:
+                return None
+            source = session.get(AttendanceSource, dispute.attendance_source_id) if dispute.attendance_source_id else None
+            faces = session.exec(select(FaceDetection).where(
+                FaceDetection.source_id == dispute.attendance_source_id
+            )).all() if source else []
+            return {
+                "dispute": dispute,
+                "source": source,
+                "faces": faces,
+                "selected_face": session.get(FaceDetection, dispute.face_detection_id) if dispute.face_detection_id else None,
+            }
+
+    def get_my_disputes(
+        self,
+        student_username: str,
+        page: Optional[PageRequest] = None,
+        status: Optional[DisputeStatus] = None
+    ) -> Tuple[List[Dispute], Optional[str]]:
+        statement = select(Dispute).where(Dispute.student_username == student_username)
+        if status:
+            statement = statement.where(Dispute.status == status)
         with Session(engine) as session:
-            return session.exec(select(Dispute).where(
-                Dispute.student_username == student_username
-            ).order_by(Dispute.created_at.desc())).all()
+            return keyset_page(session, statement, page or PageRequest(), id_col=Dispute.id, ts_col=Dispute.created_at)
 
-    def get_all_disputes(self) -> List[Dispute]:
+    def get_all_disputes(
+        self,
+        page: Optional[PageRequest] = None,
+        status: Optional[DisputeStatus] = None
+    ) -> Tuple[List[Dispute], Optional[str]]:
+        statement = select(Dispute)
+        if status:
+            statement = statement.where(Dispute.status == status)
         with Session(engine) as session:
-            return session.exec(select(Dispute).order_by(Dispute.created_at.desc())).all()
+            return keyset_page(session, statement, page or PageRequest(), id_col=Dispute.id, ts_col=Dispute.created_at)
 
     def resolve_dispute(self, dispute_id: int, status: DisputeStatus) -> Optional[Dispute]:
         with Session(engine) as session:
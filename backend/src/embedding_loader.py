@@ -1,7 +1,14 @@
-import face_recognition
+import hashlib
 import os
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import delete, update
+from sqlmodel import Session, select
+from .models import GalleryEmbedding
+from .database import engine
+from .embedding_models import (
+    EmbeddingModel, get_model, active_model_version, encode_embedding, decode_embeddings
+)
 
 # Define the path to the dataset directory
 # Priority: Env var -> Relative path
@@ -10,57 +17,219 @@ if not DATASET_DIR:
     # Assuming structure: project_root/backend/src/embedding_loader.py and project_root/dataset
     DATASET_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "dataset")
 
+# Stored gallery rows under this image path prefix are synthetic identities
+# (generate_synthetic_gallery.py): they have no enrollment image to re-encode
+SYNTHETIC_PREFIX = "synthetic/"
+# Synthetic identities are scale-test data: served (and on rosters) only when enabled
+SYNTHETIC_GALLERY = os.getenv("SYNTHETIC_GALLERY") == "1"
+
+# (size, mtime_ns) of an enrollment image: the cheap check before hashing it
+Fingerprint = Tuple[int, int]
+
+
+def image_fingerprint(image_path: str) -> Fingerprint:
+    stat = os.stat(os.path.join(DATASET_DIR, image_path))
+    return stat.st_size, stat.st_mtime_ns
+
+
+def image_sha256(image_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(os.path.join(DATASET_DIR, image_path), "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def gallery_row(student_name: str, image_path: str, model_version: str, encoding: np.ndarray) -> GalleryEmbedding:
+    """A GalleryEmbedding for an enrollment image, fingerprinted as it is on disk now."""
+    size, mtime_ns = image_fingerprint(image_path)
+    return GalleryEmbedding(
+        student_name=student_name,
+        image_path=image_path,
+        model_version=model_version,
+        embedding=encode_embedding(encoding),
+        image_size=size,
+        image_mtime_ns=mtime_ns,
+        image_sha256=image_sha256(image_path)
+    )
+
+
+def is_current(row: GalleryEmbedding, image_path: str) -> Tuple[bool, Optional[Fingerprint]]:
+    """
+    Whether a stored encoding still belongs to the image on disk. Unchanged
+    size and mtime settle it without reading the file; otherwise the content
+    hash decides. Returns the new fingerprint to record when only the stat changed
+    (e.g. a copy that did not preserve timestamps).
+    """
+    fingerprint = image_fingerprint(image_path)
+    if fingerprint == (row.image_size, row.image_mtime_ns):
+        return True, None
+    if row.image_sha256 is not None and row.image_sha256 == image_sha256(image_path):
+        return True, fingerprint
+    return False, None
+
+
 class EmbeddingLoader:
-    def __init__(self):
-        self.student_embeddings: Dict[str, List[np.ndarray]] = {}
+    def __init__(self, model_version: Optional[str] = None, progress: Optional[Callable[[int, int], None]] = None):
+        # Model and gallery live in one tuple so a cutover swaps both atomically
+        self._state: Tuple[EmbeddingModel, Dict[str, List[np.ndarray]]] = (
+            get_model(model_version or active_model_version()), {}
+        )
+        # Called with (students done, students total) while a gallery builds
+        self.progress = progress
         self.load_embeddings()
 
-    def load_embeddings(self):
-        """
-        Loads student images from the dataset directory and computes their face embeddings.
-        Stores embeddings in a dictionary mapping student names to a list of their embeddings.
-        """
-        print(f"Loading embeddings from {DATASET_DIR}...")
+    @property
+    def model(self) -> EmbeddingModel:
+        return self._state[0]
+
+    @property
+    def model_version(self) -> str:
+        return self._state[0].version
+
+    @property
+    def student_embeddings(self) -> Dict[str, List[np.ndarray]]:
+        return self._state[1]
+
+    @student_embeddings.setter
+    def student_embeddings(self, gallery: Dict[str, List[np.ndarray]]):
+        self._state = (self._state[0], gallery)
+
+    def snapshot(self) -> Tuple[EmbeddingModel, Dict[str, List[np.ndarray]]]:
+        """Model and gallery that belong together, for one recognition pass."""
+        return self._state
+
+    def list_dataset_images(self) -> Dict[str, List[str]]:
+        """Enrollment images per student, as paths relative to the dataset directory."""
         if not os.path.exists(DATASET_DIR):
             raise FileNotFoundError(f"Dataset directory '{DATASET_DIR}' not found.")
 
+        images = {}
         for student_name in os.listdir(DATASET_DIR):
             student_dir = os.path.join(DATASET_DIR, student_name)
             if not os.path.isdir(student_dir):
                 continue
+            images[student_name] = sorted(
+                os.path.join(student_name, f) for f in os.listdir(student_dir)
+                if f.lower().endswith(('.png', '.jpg', '.jpeg'))
+            )
+        return images
+
+    def encode_enrollment_image(self, student_name: str, image_path: str, model: EmbeddingModel) -> Optional[np.ndarray]:
+        """Encodes the (first) face of one enrollment image, or None if there is no usable face."""
+        import face_recognition
 
+        image_file = os.path.basename(image_path)
+        try:
+            image = face_recognition.load_image_file(os.path.join(DATASET_DIR, image_path))
+            face_locations = face_recognition.face_locations(image)
+
+            if len(face_locations) == 0:
+                print(f"Warning: No face found in {image_file} for {student_name}. Skipping.")
+                return None
+            elif len(face_locations) > 1:
+                print(f"Warning: Multiple faces found in {image_file} for {student_name}. Using the first one.")
+                # For simplicity, we'll use the first detected face.
+                # A more robust system might ask for user intervention or use a different strategy.
+
+            return model.encode(image, face_locations[:1])[0]
+        except Exception as e:
+            print(f"Error processing {image_file} for {student_name}: {e}")
+            return None
+
+    def build_gallery(self, model: EmbeddingModel) -> Dict[str, List[np.ndarray]]:
+        """
+        Gallery for `model`: encodings stored for that version are reused while
+        their image is unchanged, other images are (re-)encoded and stored for
+        the next start. Stored rows of images that no longer exist are dropped.
+        """
+        with Session(engine) as session:
+            stored = {
+                (row.student_name, row.image_path): row
+                for row in session.exec(select(GalleryEmbedding).where(
+                    GalleryEmbedding.model_version == model.version
+                )).all()
+            }
+
+        gallery: Dict[str, List[np.ndarray]] = {}
+        new_rows = []
+        # Rows to delete (stale or orphaned) and rows whose fingerprint only needs refreshing
+        dropped: List[int] = []
+        refreshed: Dict[int, Fingerprint] = {}
+        dataset = self.list_dataset_images()
+        for done, (student_name, image_paths) in enumerate(dataset.items()):
+            if self.progress:
+                self.progress(done, len(dataset))
             print(f"Processing student: {student_name}")
-            image_files = [f for f in os.listdir(student_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-            if not image_files:
+            if not image_paths:
                 print(f"Warning: No image files found for student '{student_name}'. Skipping.")
                 continue
 
-            self.student_embeddings[student_name] = []
-
-            for image_file in image_files:
-                image_path = os.path.join(student_dir, image_file)
-                try:
-                    image = face_recognition.load_image_file(image_path)
-                    face_locations = face_recognition.face_locations(image)
-
-                    if len(face_locations) == 0:
-                        print(f"Warning: No face found in {image_file} for {student_name}. Skipping.")
+            encodings = []
+            for image_path in image_paths:
+                row = stored.get((student_name, image_path))
+                if row is not None:
+                    current, fingerprint = is_current(row, image_path)
+                    if current:
+                        if fingerprint:
+                            refreshed[row.id] = fingerprint
+                        encodings.append(decode_embeddings([row.embedding])[0])
                         continue
-                    elif len(face_locations) > 1:
-                        print(f"Warning: Multiple faces found in {image_file} for {student_name}. Using the first one.")
-                        # For simplicity, we'll use the first detected face.
-                        # A more robust system might ask for user intervention or use a different strategy.
-                    
-                    face_encoding = face_recognition.face_encodings(image, known_face_locations=face_locations)[0]
-                    self.student_embeddings[student_name].append(face_encoding)
-
-                except Exception as e:
-                    print(f"Error processing {image_file} for {student_name}: {e}")
-                    continue
-            
-            if not self.student_embeddings[student_name]:
+                    print(f"Enrollment image {image_path} changed, re-encoding.")
+                    dropped.append(row.id)
+                encoding = self.encode_enrollment_image(student_name, image_path, model)
+                if encoding is not None:
+                    encodings.append(encoding)
+                    new_rows.append(gallery_row(student_name, image_path, model.version, encoding))
+
+            if not encodings:
                 print(f"Error: No valid embeddings loaded for student '{student_name}'. Please check images.")
-                del self.student_embeddings[student_name] # Remove student if no embeddings were loaded
+                continue
+            gallery[student_name] = encodings
+
+        enrolled = {(student_name, image_path) for student_name, image_paths in dataset.items() for image_path in image_paths}
+        # Synthetic identities exist only as stored rows
+        synthetic = []
+        for key, row in stored.items():
+            if key[1].startswith(SYNTHETIC_PREFIX):
+                synthetic.append((key[0], row.embedding))
+            elif key not in enrolled:
+                dropped.append(row.id)
+        if synthetic and not SYNTHETIC_GALLERY:
+            print(f"Ignoring {len(synthetic)} synthetic gallery embeddings (set SYNTHETIC_GALLERY=1 to serve them).")
+        elif synthetic:
+            encodings = decode_embeddings([blob for _, blob in synthetic])
+            for (student_name, _), encoding in zip(synthetic, encodings):
+                gallery.setdefault(student_name, []).append(encoding)
+            print(f"Loaded {len(synthetic)} synthetic gallery embeddings.")
+
+        if new_rows or dropped or refreshed:
+            with Session(engine) as session:
+                # Deleted first: a re-encoded image reuses its (version, student, path) key
+                if dropped:
+                    session.exec(delete(GalleryEmbedding).where(GalleryEmbedding.id.in_(dropped)))
+                for row_id, (size, mtime_ns) in refreshed.items():
+                    session.exec(update(GalleryEmbedding).where(GalleryEmbedding.id == row_id).values(
+                        image_size=size, image_mtime_ns=mtime_ns
+                    ))
+                session.add_all(new_rows)
+                session.commit()
+            if dropped:
+                print(f"Dropped {len(dropped)} stale {model.version} gallery embeddings.")
+            if new_rows:
+                print(f"Stored {len(new_rows)} new {model.version} gallery embeddings.")
+        if self.progress:
+            self.progress(len(dataset), len(dataset))
+        return gallery
+
+    def load_embeddings(self):
+        """
+        Loads student images from the dataset directory and their face embeddings
+        for the active model version. Stores embeddings in a dictionary mapping
+        student names to a list of their embeddings.
+        """
+        print(f"Loading {self.model_version} embeddings from {DATASET_DIR}...")
+        self.student_embeddings = self.build_gallery(self.model)
 
         if not self.student_embeddings:
             print("Warning: No student embeddings were loaded. System will start but no faces will be recognized.")
@@ -69,17 +238,27 @@ class EmbeddingLoader:
         
         print("Embeddings loading complete.")
 
-    def get_known_face_encodings(self) -> List[np.ndarray]:
-        """Returns a list of all known face encodings."""
+    def switch_version(self, model_version: str):
+        """
+        Cutover: builds the gallery for another version, then swaps model and
+        gallery in one assignment so recognition keeps serving throughout.
+        """
+        model = get_model(model_version)
+        gallery = self.build_gallery(model)
+        self._state = (model, gallery)
+        print(f"Switched recognition to embedding model {model_version}.")
+
+    def get_known_face_encodings(self, gallery: Optional[Dict[str, List[np.ndarray]]] = None) -> List[np.ndarray]:
+        """Returns a list of all known face encodings (of `gallery`, default the current one)."""
         all_encodings = []
-        for embeddings in self.student_embeddings.values():
+        for embeddings in (gallery if gallery is not None else self.student_embeddings).values():
             all_encodings.extend(embeddings)
         return all_encodings
 
-    def get_known_face_names(self) -> List[str]:
+    def get_known_face_names(self, gallery: Optional[Dict[str, List[np.ndarray]]] = None) -> List[str]:
         """Returns a list of names corresponding to the known face encodings."""
         all_names = []
-        for student_name, embeddings in self.student_embeddings.items():
+        for student_name, embeddings in (gallery if gallery is not None else self.student_embeddings).items():
             all_names.extend([student_name] * len(embeddings))
         return all_names
 
@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+from sqlalchemy import and_, func
+from sqlmodel import Session, select
+from .models import AttendanceSource, FaceDetection, FaceEmbedding, GalleryEmbedding
+from .database import engine
+from .embedding_loader import EmbeddingLoader, gallery_row
+from .embedding_models import EmbeddingModel, get_model, encode_embedding
+from .app_settings import get_setting, set_setting
+
+# Evidence paths are stored relative to the static mount
+STATIC_DIR = "static"
+# AppSetting key prefix: detection ids a version could not re-embed (unreadable or deleted evidence)
+SKIPPED_SETTING = "embedding_migration_skipped:"
+
+
+class EmbeddingMigrator:
+    """
+    Throttled background re-embedding into another model version, while
+    recognition keeps serving the active one. Enrollment images go first (the
+    cutover needs a full gallery), then evidence faces, one evidence image
+    decode per source. Progress is the set of stored rows, so a restarted
+    migration resumes where it stopped, and completeness is recomputed from
+    them on every status: detections recorded after a finished migration make
+    it incomplete again until they are migrated too.
+
+    Only faces on image evidence can be re-embedded: video sources keep no
+    frame index and legacy detections have no source at all.
+    """
+
+    def __init__(self, embedding_loader: EmbeddingLoader, batch_size: int = 16, pause_seconds: float = 0.5):
+        self.embedding_loader = embedding_loader
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target: Optional[str] = None
+        self._errors: List[str] = []
+
+    def start(self, model_version: str) -> bool:
+        """Starts migrating into `model_version`; False if a migration is already running."""
+        model = get_model(model_version)
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._target = model.version
+            self._errors = []
+            self._thread = threading.Thread(
+                target=self._run, args=(model,), name="embedding-migration", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def status(self, model_version: str) -> Dict:
+        dataset = self.embedding_loader.list_dataset_images()
+        with Session(engine) as session:
+            stored = set(session.exec(select(GalleryEmbedding.student_name, GalleryEmbedding.image_path).where(
+                GalleryEmbedding.model_version == model_version
+            )).all())
+            evidence_total = session.exec(
+                select(func.count()).select_from(FaceDetection)
+                .join(AttendanceSource, AttendanceSource.id == FaceDetection.source_id)
+                .where(AttendanceSource.media_type == "image")
+            ).one()
+            evidence_done = session.exec(
+                select(func.count()).select_from(FaceEmbedding)
+                .join(FaceDetection, FaceDetection.id == FaceEmbedding.detection_id)
+                .join(AttendanceSource, AttendanceSource.id == FaceDetection.source_id)
+                .where(AttendanceSource.media_type == "image", FaceEmbedding.model_version == model_version)
+            ).one()
+            # Attempted and failed; only those still without an embedding count as skipped
+            skipped = self._skipped(model_version)
+            evidence_skipped = session.exec(
+                select(func.count()).select_from(FaceDetection)
+                .join(AttendanceSource, AttendanceSource.id == FaceDetection.source_id)
+                .join(FaceEmbedding, and_(
+                    FaceEmbedding.detection_id == FaceDetection.id,
+                    FaceEmbedding.model_version == model_version
+                ), isouter=True)
+                .where(
+                    AttendanceSource.media_type == "image",
+                    FaceEmbedding.id.is_(None),
+                    FaceDetection.id.in_(skipped)
+                )
+            ).one() if skipped else 0
+
+        gallery_done = sum(1 for name, paths in dataset.items() for path in paths if (name, path) in stored)
+        students = [name for name, paths in dataset.items() if paths]
+        students_covered = sum(1 for name in students if any((name, path) in stored for path in dataset[name]))
+        evidence_pending = max(0, evidence_total - evidence_done - evidence_skipped)
+        running = self.is_running() and self._target == model_version
+        return {
+            "model_version": model_version,
+            "active_version": self.embedding_loader.model_version,
+            "running": running,
+            "gallery": {
+                "done": gallery_done,
+                "total": sum(len(paths) for paths in dataset.values()),
+                "students_covered": students_covered,
+                "students": len(students),
+            },
+            "evidence": {
+                "done": evidence_done,
+                "skipped": evidence_skipped,
+                "pending": evidence_pending,
+                "total": evidence_total,
+            },
+            # Every student must be recognizable under the new version, and every
+            # detection re-embedded or known to be unusable, before a cutover
+            "complete": not running and students_covered == len(students) and evidence_pending == 0,
+            "errors": self._errors[-20:] if self._target == model_version else [],
+        }
+
+    def _skipped(self, model_version: str) -> List[int]:
+        return json.loads(get_setting(SKIPPED_SETTING + model_version) or "[]")
+
+    def _add_skipped(self, model_version: str, detection_ids: List[int]):
+        skipped = set(self._skipped(model_version)) | set(detection_ids)
+        set_setting(SKIPPED_SETTING + model_version, json.dumps(sorted(skipped)))
+
+    def _pause(self) -> bool:
+        """Sleeps between batches; True if the migration was asked to stop."""
+        return self._stop.wait(self.pause_seconds)
+
+    def _run(self, model: EmbeddingModel):
+        print(f"Embedding migration to {model.version} started")
+        try:
+            if self._migrate_gallery(model) and self._migrate_evidence(model):
+                print(f"Embedding migration to {model.version} complete")
+            else:
+                print(f"Embedding migration to {model.version} stopped")
+        except Exception as e:
+            self._errors.append(str(e))
+            print(f"Embedding migration to {model.version} failed: {e}")
+
+    def _migrate_gallery(self, model: EmbeddingModel) -> bool:
+        with Session(engine) as session:
+            done = set(session.exec(select(GalleryEmbedding.student_name, GalleryEmbedding.image_path).where(
+                GalleryEmbedding.model_version == model.version
+            )).all())
+
+        pending = [
+            (student_name, image_path)
+            for student_name, image_paths in self.embedding_loader.list_dataset_images().items()
+            for image_path in image_paths
+            if (student_name, image_path) not in done
+        ]
+        for start in range(0, len(pending), self.batch_size):
+            rows = []
+            for student_name, image_path in pending[start:start + self.batch_size]:
+                encoding = self.embedding_loader.encode_enrollment_image(student_name, image_path, model)
+                if encoding is None:
+                    self._errors.append(f"No usable face in {image_path}")
+                    continue
+                rows.append(gallery_row(student_name, image_path, model.version, encoding))
+            with Session(engine) as session:
+                session.add_all(rows)
+                session.commit()
+            if self._pause():
+                return False
+        return True
+
+    def _migrate_evidence(self, model: EmbeddingModel) -> bool:
+        import face_recognition
+
+        last_id = 0
+        while True:
+            # Keyset over detection ids, so unreadable sources are skipped rather than retried forever
+            with Session(engine) as session:
+                batch = session.exec(
+                    select(FaceDetection, AttendanceSource.file_path)
+                    .join(AttendanceSource, AttendanceSource.id == FaceDetection.source_id)
+                    .join(FaceEmbedding, and_(
+                        FaceEmbedding.detection_id == FaceDetection.id,
+                        FaceEmbedding.model_version == model.version
+                    ), isouter=True)
+                    .where(
+                        AttendanceSource.media_type == "image",
+                        FaceEmbedding.id.is_(None),
+                        FaceDetection.id > last_id
+                    )
+                    .order_by(FaceDetection.id)
+                    .limit(self.batch_size)
+                ).all()
+            if not batch:
+                return True
+            last_id = batch[-1][0].id
+
+            by_source = defaultdict(list)
+            for detection, file_path in batch:
+                by_source[file_path].append(detection)
+
+            rows = []
+            failed = []
+            for file_path, detections in by_source.items():
+                try:
+                    image = face_recognition.load_image_file(os.path.join(STATIC_DIR, file_path))
+                    encodings = model.encode(image, [(d.top, d.right, d.bottom, d.left) for d in detections])
+                except Exception as e:
+                    self._errors.append(f"{file_path}: {e}")
+                    failed.extend(d.id for d in detections)
+                    continue
+                rows.extend(
+                    FaceEmbedding(detection_id=d.id, model_version=model.version, embedding=encode_embedding(enc))
+                    for d, enc in zip(detections, encodings)
+                )
+            with Session(engine) as session:
+                session.add_all(rows)
+                session.commit()
+            if failed:
+                self._add_skipped(model.version, failed)
+            if self._pause():
+                return False
@@ -0,0 +1,66 @@
+import os
+from dataclasses import dataclass
+from typing import List, Tuple
+import numpy as np
+from .app_settings import get_setting, set_setting
+
+# AppSetting key holding the version recognition currently serves
+ACTIVE_MODEL_SETTING = "embedding_model_version"
+
+
+@dataclass(frozen=True)
+class EmbeddingModel:
+    """
+    One way of turning a face into a 128-d encoding. Encodings are only
+    comparable within the same version, so every stored encoding is tagged with it.
+    """
+    version: str
+    landmark_model: str = "small" # face_recognition landmarks: 'small' (5 points) or 'large' (68 points)
+    num_jitters: int = 1
+
+    def encode(self, image: np.ndarray, face_locations: List[Tuple[int, int, int, int]]) -> List[np.ndarray]:
+        # Imported on first use: loading the dlib models takes seconds
+        import face_recognition
+        return face_recognition.face_encodings(
+            image,
+            known_face_locations=face_locations,
+            num_jitters=self.num_jitters,
+            model=self.landmark_model
+        )
+
+
+EMBEDDING_MODELS = {model.version: model for model in [
+    # face_recognition defaults; everything stored before versioning was encoded with this
+    EmbeddingModel("dlib-v1-small-j1"),
+    EmbeddingModel("dlib-v1-large-j1", landmark_model="large"),
+    EmbeddingModel("dlib-v1-large-j10", landmark_model="large", num_jitters=10),
+]}
+DEFAULT_MODEL_VERSION = "dlib-v1-small-j1"
+
+
+def get_model(version: str) -> EmbeddingModel:
+    if version not in EMBEDDING_MODELS:
+        raise ValueError(f"Unknown embedding model version '{version}'. Known: {list(EMBEDDING_MODELS)}")
+    return EMBEDDING_MODELS[version]
+
+
+def active_model_version() -> str:
+    """Version set by the last cutover, else EMBEDDING_MODEL_VERSION, else the default."""
+    return get_setting(ACTIVE_MODEL_SETTING) or os.getenv("EMBEDDING_MODEL_VERSION") or DEFAULT_MODEL_VERSION
+
+
+def set_active_model_version(version: str):
+    get_model(version)
+    set_setting(ACTIVE_MODEL_SETTING, version)
+
+
+def encode_embedding(encoding) -> bytes:
+    # float16 halves the storage; the rounding error is far below match tolerances
+    return np.asarray(encoding, dtype=np.float16).tobytes()
+
+
+def decode_embeddings(blobs: List[bytes]) -> np.ndarray:
+    """Stacks float16 embedding blobs into a float32 (n, 128) matrix."""
+    if not blobs:
+        return np.empty((0, 128), dtype=np.float32)
+    return np.frombuffer(b"".join(blobs), dtype=np.float16).reshape(len(blobs), -1).astype(np.float32)
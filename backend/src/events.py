@@ -0,0 +1,123 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from fastapi.encoders import jsonable_encoder
+
+# Event types pushed to dashboards
+ATTENDANCE_MARKED = "attendance_marked"
+UNKNOWN_REGISTERED = "unknown_registered"
+UNKNOWN_RESOLVED = "unknown_resolved"
+SESSION_STARTED = "session_started"
+SESSION_ENDED = "session_ended"
+# Sent when a client resumes from an id that is no longer buffered; it must refetch
+RESET = "reset"
+
+
+class SessionEventBus:
+    """
+    In-process fan-out of session events to Server-Sent Events subscribers
+    and synchronous listeners (e.g. cache invalidation).
+
+    Events are kept in a bounded ring buffer so reconnecting clients can resume
+    from their Last-Event-ID. Ids start at the boot time in milliseconds, so ids
+    from a previous process are always older than the buffer and trigger a reset.
+    `publish` is thread-safe and may be called from worker threads.
+    """
+
+    def __init__(self, buffer_size: int = 1000, keepalive_seconds: float = 15.0):
+        self.keepalive_seconds = keepalive_seconds
+        self._lock = threading.Lock()
+        self._buffer: Deque[Dict] = deque(maxlen=buffer_size)
+        self._next_id = int(time.time() * 1000)
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._listeners: List[Callable[[Dict], None]] = []
+
+    def add_listener(self, callback: Callable[[Dict], None]):
+        """Registers an in-process callback run synchronously on every published event."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def publish(self, event_type: str, data) -> Dict:
+        with self._lock:
+            event = {"id": self._next_id, "type": event_type, "data": jsonable_encoder(data)}
+            self._next_id += 1
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Event listener failed for {event_type}: {e}")
+
+        for loop, wakeup in subscribers:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # Subscriber's loop already closed; it is removed when its stream exits
+                pass
+        return event
+
+    def events_after(self, last_event_id: Optional[int]) -> Optional[List[Dict]]:
+        """
+        Returns buffered events newer than `last_event_id`, or None if the client
+        is too far behind (or ahead, e.g. after a restart) to resume.
+        """
+        with self._lock:
+            if last_event_id is None:
+                return []
+            newest = self._next_id - 1
+            oldest = self._buffer[0]["id"] if self._buffer else self._next_id
+            if last_event_id > newest or last_event_id < oldest - 1:
+                return None
+            return [e for e in self._buffer if e["id"] > last_event_id]
+
+    async def stream(
+        self,
+        last_event_id: Optional[int],
+        is_disconnected: Callable[[], Awaitable[bool]]
+    ) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        subscriber = (loop, wakeup)
+        with self._lock:
+            self._subscribers.append(subscriber)
+            if last_event_id is None:
+                # Fresh connection: only events from now on
+                last_event_id = self._next_id - 1
+
+        try:
+            # Tell the browser how long to wait before reconnecting
+            yield "retry: 3000\n\n"
+            while not await is_disconnected():
+                wakeup.clear()
+                events = self.events_after(last_event_id)
+                if events is None:
+                    with self._lock:
+                        last_event_id = self._next_id - 1
+                    yield format_sse({"id": last_event_id, "type": RESET, "data": None})
+                    continue
+
+                for event in events:
+                    last_event_id = event["id"]
+                    yield format_sse(event)
+
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    # SSE comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+        finally:
+            with self._lock:
+                self._subscribers.remove(subscriber)
+
+
+def format_sse(event: Dict) -> str:
+    return f"id: {event['id']}\ndata: {json.dumps(event)}\n\n"
+
+
+event_bus = SessionEventBus()
@@ -0,0 +1,247 @@
+import hashlib
+import io
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Set
+from PIL import Image
+from sqlalchemy import delete, exists, func, update
+from sqlmodel import Session, select
+from .models import AttendanceSource, EvidenceBlob
+from .database import engine
+
+CHUNK_SIZE = 1024 * 1024
+EXIF_ORIENTATION = 0x0112
+
+
+def has_exif_rotation(data: bytes) -> bool:
+    """
+    True if the image carries an EXIF orientation other than upright. OpenCV
+    applies the rotation when decoding, so face boxes refer to the rotated
+    pixels, which the stored original bytes would not show to every reader.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.getexif().get(EXIF_ORIENTATION, 1) != 1
+    except Exception:
+        return False
+
+
+@dataclass
+class StoredEvidence:
+    content_hash: str
+    file_path: str # relative to the static mount
+    deduplicated: bool # True if the content was already stored
+
+
+class EvidenceStore:
+    """
+    Content-addressed evidence files under static/evidence/<h[:2]>/<h[2:4]>/<sha256><ext>.
+    Uploads are stored byte for byte, and identical uploads share one file.
+
+    AttendanceSource.content_hash references the blobs. Garbage collection only
+    removes a blob that has no referencing source and was not stored again
+    within the grace period. The attendance writer restarts that period when
+    it inserts a source (see `touch_blobs`), in the same batched transaction.
+
+    The request path only reads: `reserve`/`put_file` claim the hash in memory
+    and look the blob up. GC skips hashes claimed within the grace period, and
+    a claim waits while GC is deleting that very hash, so a file cannot be
+    deleted between a deduplicating lookup and its source being queued. Blobs
+    being written are invisible to GC until `register` records them.
+    """
+
+    def __init__(self, root: str = "static", prefix: str = "evidence", grace_seconds: float = 3600):
+        self.root = root
+        self.prefix = prefix
+        self.grace_seconds = grace_seconds
+        self._lock = threading.Lock()
+        # Deduplicating lookups not yet covered by a committed source, and hashes GC is deleting
+        self._claims = threading.Condition()
+        self._claimed: Dict[str, float] = {}
+        self._collecting: Set[str] = set()
+
+    def path_for(self, content_hash: str, ext: str) -> str:
+        return f"{self.prefix}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{ext}"
+
+    def absolute(self, file_path: str) -> str:
+        return os.path.join(self.root, file_path)
+
+    def reserve(self, data: bytes, ext: str) -> StoredEvidence:
+        """
+        Resolves where `data` lives in the store without writing it. Unless
+        `deduplicated`, the caller writes the file to `absolute(file_path)`
+        (e.g. through the MediaWriter) and then calls `register`.
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+        stored = self._claim(content_hash)
+        return stored or StoredEvidence(
+            content_hash=content_hash, file_path=self.path_for(content_hash, ext), deduplicated=False
+        )
+
+    def register(self, stored: StoredEvidence, size: int):
+        """Records a reserved blob once its file is on disk; a concurrent writer of the same content may have won."""
+        with self._lock:
+            with Session(engine) as session:
+                blob = session.get(EvidenceBlob, stored.content_hash)
+                if blob:
+                    # Also repoints a row whose file had gone missing
+                    blob.file_path = stored.file_path
+                    blob.last_stored_at = datetime.utcnow()
+                else:
+                    blob = EvidenceBlob(content_hash=stored.content_hash, file_path=stored.file_path, size_bytes=size)
+                session.add(blob)
+                session.commit()
+
+    def put_file(self, source_path: str, ext: str) -> StoredEvidence:
+        """Stores a file (e.g. an uploaded video), hard-linking it where the filesystem allows."""
+        digest = hashlib.sha256()
+        with open(source_path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+
+        stored = self._claim(content_hash)
+        if stored:
+            return stored
+
+        def write(tmp_path: str):
+            try:
+                os.link(source_path, tmp_path)
+            except OSError:
+                shutil.copyfile(source_path, tmp_path)
+
+        stored = StoredEvidence(content_hash=content_hash, file_path=self.path_for(content_hash, ext), deduplicated=False)
+        self._write_atomic(stored.file_path, write)
+        self.register(stored, os.path.getsize(source_path))
+        return stored
+
+    def _write_atomic(self, file_path: str, write: Callable[[str], None]):
+        # Written next to its final place, then renamed: readers never see a partial file
+        final_path = self.absolute(file_path)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        tmp_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, final_path)
+
+    def _claim(self, content_hash: str) -> Optional[StoredEvidence]:
+        """Existing blob with its file on disk, or None to write it. Only reads the DB."""
+        with self._claims:
+            while content_hash in self._collecting:
+                self._claims.wait()
+            self._claimed[content_hash] = time.monotonic()
+        with Session(engine) as session:
+            blob = session.get(EvidenceBlob, content_hash)
+        # A row without a file (e.g. restored DB) is rewritten; `register` repoints the row
+        if not blob or not os.path.exists(self.absolute(blob.file_path)):
+            return None
+        return StoredEvidence(content_hash=content_hash, file_path=blob.file_path, deduplicated=True)
+
+    def _start_collecting(self, content_hash: str, grace: float) -> bool:
+        """False if the hash was claimed within the grace period; otherwise holds new claims on it."""
+        with self._claims:
+            claimed_at = self._claimed.get(content_hash)
+            if claimed_at is not None and time.monotonic() - claimed_at < grace:
+                return False
+            self._claimed.pop(content_hash, None)
+            self._collecting.add(content_hash)
+            return True
+
+    def _stop_collecting(self, content_hash: str):
+        with self._claims:
+            self._collecting.discard(content_hash)
+            self._claims.notify_all()
+
+    def _expire_claims(self, grace: float):
+        with self._claims:
+            horizon = time.monotonic() - grace
+            for content_hash in [h for h, at in self._claimed.items() if at < horizon]:
+                del self._claimed[content_hash]
+
+    def stats(self) -> Dict:
+        totals = select(func.count(), func.coalesce(func.sum(EvidenceBlob.size_bytes), 0))
+        with Session(engine) as session:
+            blobs, stored_bytes = session.exec(totals).one()
+            unreferenced, unreferenced_bytes = session.exec(totals.where(~self._referenced())).one()
+            references, referenced_bytes = session.exec(
+                totals.select_from(AttendanceSource)
+                .join(EvidenceBlob, EvidenceBlob.content_hash == AttendanceSource.content_hash)
+            ).one()
+        return {
+            "blobs": blobs,
+            "stored_bytes": stored_bytes,
+            "references": references,
+            "unreferenced_blobs": unreferenced,
+            # Disk that storing every source separately would have cost on top
+            "deduplicated_bytes": referenced_bytes - (stored_bytes - unreferenced_bytes),
+        }
+
+    @staticmethod
+    def _referenced():
+        return exists().where(AttendanceSource.content_hash == EvidenceBlob.content_hash)
+
+    def collect_garbage(
+        self,
+        grace_seconds: Optional[float] = None,
+        on_delete: Optional[Callable[[str], None]] = None
+    ) -> Dict:
+        """
+        Deletes blobs no source references any more, once their grace period has
+        passed. `on_delete` gets each deleted hash (e.g. to drop its thumbnails).
+        """
+        grace = self.grace_seconds if grace_seconds is None else grace_seconds
+        cutoff = datetime.utcnow() - timedelta(seconds=grace)
+        with Session(engine) as session:
+            candidates = session.exec(select(EvidenceBlob.content_hash, EvidenceBlob.file_path).where(
+                EvidenceBlob.last_stored_at < cutoff, ~self._referenced()
+            )).all()
+
+        deleted, freed = 0, 0
+        self._expire_claims(grace)
+        for content_hash, file_path in candidates:
+            if not self._start_collecting(content_hash, grace):
+                continue
+            try:
+                size = self._delete_blob(content_hash, file_path, cutoff)
+            finally:
+                self._stop_collecting(content_hash)
+            if size is None:
+                continue
+            deleted += 1
+            freed += size
+            if on_delete:
+                on_delete(content_hash)
+        return {"deleted_blobs": deleted, "freed_bytes": freed}
+
+    def _delete_blob(self, content_hash: str, file_path: str, cutoff: datetime) -> Optional[int]:
+        """Deletes an unreferenced blob row and its file; returns the bytes freed, or None if kept."""
+        with self._lock:
+            # Re-checked at delete time: a register or a new source may have claimed it meanwhile
+            with Session(engine) as session:
+                result = session.exec(delete(EvidenceBlob).where(
+                    EvidenceBlob.content_hash == content_hash,
+                    EvidenceBlob.last_stored_at < cutoff,
+                    ~self._referenced()
+                ))
+                session.commit()
+            if not result.rowcount:
+                return None
+            full_path = self.absolute(file_path)
+            try:
+                size = os.path.getsize(full_path)
+                os.remove(full_path)
+            except FileNotFoundError:
+                size = 0
+            return size
+
+
+def touch_blobs(session: Session, content_hashes: Set[str]):
+    """Restarts the GC grace period of the blobs new sources reference, in the caller's transaction."""
+    if content_hashes:
+        session.exec(update(EvidenceBlob).where(EvidenceBlob.content_hash.in_(content_hashes)).values(
+            last_stored_at=datetime.utcnow()
+        ))
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List, Optional
+from sqlmodel import Session, select
+from .models import AttendanceRecord, AttendanceSession
+from .database import engine
+
+EXPORT_COLUMNS = ["record_id", "session_id", "session_name", "student_name", "timestamp", "distance"]
+
+# Media types and file extensions per export format
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+@dataclass
+class ExportFilter:
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    session_ids: Optional[List[int]] = None
+    students: Optional[List[str]] = None
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file object that hands written bytes back in chunks.
+    It keeps counting the logical position, so Parquet footer offsets stay valid
+    even though the bytes are drained as they are produced.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ExportService:
+    def __init__(self, chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+
+    def iter_row_chunks(self, export_filter: ExportFilter) -> Iterator[List[tuple]]:
+        """
+        Yields attendance rows in chunks of `chunk_size`, straight off the DB cursor.
+        Only plain column tuples are fetched (no ORM objects), so memory stays
+        constant however many rows match.
+        """
+        statement = select(
+            AttendanceRecord.id,
+            AttendanceRecord.session_id,
+            AttendanceSession.name,
+            AttendanceRecord.student_name,
+            AttendanceRecord.timestamp,
+            AttendanceRecord.distance
+        ).join(AttendanceSession, AttendanceSession.id == AttendanceRecord.session_id, isouter=True)
+
+        if export_filter.since:
+            statement = statement.where(AttendanceRecord.timestamp >= export_filter.since)
+        if export_filter.until:
+            statement = statement.where(AttendanceRecord.timestamp < export_filter.until)
+        if export_filter.session_ids:
+            statement = statement.where(AttendanceRecord.session_id.in_(export_filter.session_ids))
+        if export_filter.students:
+            statement = statement.where(AttendanceRecord.student_name.in_(export_filter.students))
+
+        statement = statement.order_by(AttendanceRecord.timestamp, AttendanceRecord.id)
+
+        with Session(engine) as session:
+            result = session.exec(statement.execution_options(yield_per=self.chunk_size))
+            for partition in result.partitions():
+                yield [tuple(row) for row in partition]
+
+    def stream_csv(self, export_filter: ExportFilter) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for chunk in self.iter_row_chunks(export_filter):
+            writer.writerows(
+                (rid, sid, sname, student, ts.isoformat() if ts else None, dist)
+                for rid, sid, sname, student, ts, dist in chunk
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    def stream_ndjson(self, export_filter: ExportFilter) -> Iterator[str]:
+        for chunk in self.iter_row_chunks(export_filter):
+            lines = []
+            for row in chunk:
+                item = dict(zip(EXPORT_COLUMNS, row))
+                item["timestamp"] = item["timestamp"].isoformat() if item["timestamp"] else None
+                lines.append(json.dumps(item))
+            yield "\n".join(lines) + "\n"
+
+    def stream_parquet(self, export_filter: ExportFilter) -> Iterator[bytes]:
+        """One Parquet row group per chunk. Requires the optional `pyarrow` package."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("record_id", pa.int64()),
+            ("session_id", pa.int64()),
+            ("session_name", pa.string()),
+            ("student_name", pa.string()),
+            ("timestamp", pa.timestamp("us")),
+            ("distance", pa.float64()),
+        ])
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, schema) as writer:
+            for chunk in self.iter_row_chunks(export_filter):
+                columns = list(zip(*chunk))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                yield sink.drain()
+        yield sink.drain()
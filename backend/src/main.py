@@ -1,9 +1,13 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, status, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, status, BackgroundTasks, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from typing import Optional, List, Dict
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional, List, Dict, Tuple
+from concurrent.futures import Future
 from sqlmodel import Session, select
-from datetime import timedelta
+from datetime import datetime, timedelta
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -12,29 +16,53 @@ from fastapi import Request
 from .embedding_loader import EmbeddingLoader
 from .recognition import RecognitionService
 from .video_processor import VideoProcessor
+from .reidentification import ReidentificationService
+from .embedding_migration import EmbeddingMigrator
+from .embedding_models import EMBEDDING_MODELS, set_active_model_version
 from .database import create_db_and_tables, engine
+from .migrations import run_migrations
 from .attendance import AttendanceService
 from .dispute_service import DisputeService
 from .admin_service import AdminService
-from .models import AttendanceRecord, User, UserRole, Dispute, DisputeStatus, DisputeCreate, AuditLog, AttendanceSource, UserCreate
-from .schemas import MapUserRequest
+from .export_service import ExportService, ExportFilter, EXPORT_FORMATS
+from .analytics import AnalyticsService
+from .student_import import StudentImporter
+from .evidence_store import EvidenceStore, StoredEvidence, has_exif_rotation
+from .media_serving import DerivativeService, PublicStaticFiles, VARIANTS, media_key, serve_media
+from .retention import RetentionEngine, RetentionPolicy
+from .media_writer import MediaWriter, MediaBacklogFull, when_all
+from .admission import AdmissionController, AdmissionRejected, Ticket, INTERACTIVE, BATCH, DETECT
+from .events import event_bus
+from .warmup import GalleryWarmup, ProgressCallback
+from . import metrics, profiling
+from .profiling import RequestProfiler, ProfilingSettings, ProfilingMiddleware, PROFILE_HEADER, PROFILE_ID_HEADER
+from .pagination import PageRequest, page_params, keyset_page, set_next_cursor, NEXT_CURSOR_HEADER
+from .models import AttendanceRecord, User, UserRole, Dispute, DisputeStatus, DisputeCreate, AuditLog, AttendanceSource, FaceDetection, UserCreate, SessionHistoryEntry
+from .schemas import MapUserRequest, UpdateRoleRequest, ChangePasswordRequest, RetentionPolicyRequest, ProfilingSettingsRequest
 from .auth_service import (
-    create_access_token, 
+    create_user_token, 
     verify_password, 
     get_password_hash, 
     get_current_user, 
+    get_media_user, 
+    revoke_user_tokens, 
+    principal_cache, 
     RoleChecker, 
+    MediaRoleChecker, 
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 
+import asyncio
 import shutil
 import tempfile
+import json
 import os
+import time
 import uuid
+from dataclasses import asdict
 import cv2
 import numpy as np
-from fastapi.staticfiles import StaticFiles
-from .models import UnknownFace
+from .models import UnknownFace, SessionSummary
 
 app = FastAPI()
 
@@ -50,31 +78,97 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Retry-After", PROFILE_ID_HEADER],
 )
 
 # Ensure static directory exists
 os.makedirs("static/unknowns", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Evidence and unknown-face crops need authentication, see get_media_user
+# Evidence, unknown-face crops and their derivatives need authentication, see get_media_user
 
 embedding_loader: Optional[EmbeddingLoader] = None
 recognition_service: Optional[RecognitionService] = None
 video_processor: Optional[VideoProcessor] = None
-video_processor: Optional[VideoProcessor] = None
+reidentification_service: Optional[ReidentificationService] = None
+embedding_migrator: Optional[EmbeddingMigrator] = None
+# Models and gallery load in the background; recognition answers 503 until then
+gallery_warmup = GalleryWarmup()
 # Stateless services can be initialized immediately
 attendance_service = AttendanceService()
 dispute_service = DisputeService()
 admin_service = AdminService()
+export_service = ExportService()
+analytics_service = AnalyticsService()
+student_importer = StudentImporter()
+# Load-aware admission for recognition (replaces fixed per-IP limits on those endpoints)
+admission = AdmissionController()
+evidence_store = EvidenceStore()
+# Evidence frames and face crops are written off the request path
+media_writer = MediaWriter()
+derivatives = DerivativeService()
+retention_engine = RetentionEngine(evidence_store, derivatives)
+# Opt-in cProfile runs of single requests (admin header or sampling)
+request_profiler = RequestProfiler(keep=int(os.getenv("PROFILE_KEEP", "50")))
+# Cached analytics are dropped whenever marks or sessions change
+event_bus.add_listener(analytics_service.on_event)
+
+# Prometheus metrics (GET /metrics). Gauges are read at scrape time.
+REQUEST_SECONDS = metrics.histogram(
+    "recognition_request_seconds", "End-to-end time of admitted recognition requests.", ["endpoint"]
+)
+ADMISSION_REJECTIONS = metrics.counter(
+    "admission_rejections_total", "Recognition requests rejected by admission control.", ["work_class", "status"]
+)
+metrics.gauge(
+    "attendance_writer_queue_depth", "Attendance writer ops waiting for a transaction.",
+    lambda: attendance_service.writer.pending()
+)
+metrics.gauge("media_writer_queue_depth", "Evidence files waiting to be written.", lambda: media_writer.metrics()["queued"])
+metrics.gauge("media_writer_in_flight", "Evidence files being written.", lambda: media_writer.metrics()["in_flight"])
+metrics.gauge(
+    "admission_in_flight", "Admitted recognition work, running or waiting for a slot.",
+    lambda: {(name, ): state["in_flight"] for name, state in admission.status().items()}, ["work_class"]
+)
+metrics.gauge(
+    "admission_estimated_wait_seconds", "Expected wait of a newly admitted request.",
+    lambda: {(name, ): state["estimated_wait_seconds"] for name, state in admission.status().items()}, ["work_class"]
+)
+metrics.gauge(
+    "gallery_identities", "Students in the recognition gallery.",
+    lambda: len(embedding_loader.student_embeddings) if embedding_loader else None
+)
+metrics.gauge(
+    "gallery_embeddings", "Encodings in the recognition gallery.",
+    lambda: sum(map(len, embedding_loader.student_embeddings.values())) if embedding_loader else None
+)
+metrics.gauge("recognition_ready", "1 once the gallery has loaded after startup.", lambda: int(gallery_warmup.ready))
+metrics.callback_counter(
+    "process_cpu_seconds_total", "User and system CPU time of the server process, all threads.", time.process_time
+)
+# Optional bearer token for scrapers; unset leaves /metrics open like /health
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+def profiling_admin(token: str) -> Optional[str]:
+    """Username of the admin owning `token`, if any (request profiling is admin-only)."""
+    try:
+        user = get_current_user(token)
+    except HTTPException:
+        return None
+    return user.username if user.role == UserRole.ADMIN else None
+
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler, resolve_admin=profiling_admin)
 
 # Role Guards
 allow_teacher_admin = RoleChecker([UserRole.TEACHER, UserRole.ADMIN])
 allow_admin = RoleChecker([UserRole.ADMIN])
 allow_teacher_kiosk = RoleChecker([UserRole.TEACHER, UserRole.KIOSK, UserRole.ADMIN])
+allow_teacher_admin_media = MediaRoleChecker([UserRole.TEACHER, UserRole.ADMIN])
 
 @app.on_event("startup")
 async def startup_event():
-    global embedding_loader, recognition_service, video_processor
     print("Initializing Database...")
     create_db_and_tables()
+    run_migrations()
     
     # Seed default Admin
     with Session(engine) as session:
@@ -113,26 +207,84 @@ async def startup_event():
 
     print("Database initialized.")
 
+    attendance_service.writer.start()
+    retention_engine.start_schedule(float(os.getenv("RETENTION_INTERVAL_HOURS", "6")) * 3600)
+
+    # Loaded here, not by the first request on the event loop
+    request_profiler.settings
+
+    # Requests are served while this runs; /ready reports its progress
+    gallery_warmup.start(load_recognition)
+
+def load_recognition(progress: ProgressCallback):
+    """Builds the gallery and the services that need it (run by gallery_warmup)."""
+    global embedding_loader, recognition_service, video_processor, reidentification_service, embedding_migrator
     print("Initializing EmbeddingLoader...")
-    embedding_loader = EmbeddingLoader()
+    loader = EmbeddingLoader(progress=progress)
+    # Later gallery builds (cutovers) are not part of the warm-up
+    loader.progress = None
     print("EmbeddingLoader initialized.")
     
     print("Initializing RecognitionService...")
-    recognition_service = RecognitionService(embedding_loader)
+    recognition = RecognitionService(loader)
+    recognition.load_models()
     print("RecognitionService initialized.")
     
     print("Initializing VideoProcessor...")
-    video_processor = VideoProcessor(recognition_service)
+    processor = VideoProcessor(recognition)
     print("VideoProcessor initialized.")
 
+    reidentification = ReidentificationService(loader, attendance_service)
+    migrator = EmbeddingMigrator(loader)
+
+    # Published together, once everything is usable
+    embedding_loader, recognition_service, video_processor = loader, recognition, processor
+    reidentification_service, embedding_migrator = reidentification, migrator
+
+def require_recognition():
+    """503 (with Retry-After) while the gallery is still warming up, 500 if loading it failed."""
+    if gallery_warmup.ready:
+        return
+    warmup = gallery_warmup.status()
+    if warmup["error"]:
+        raise HTTPException(status_code=500, detail=f"Recognition failed to load: {warmup['error']}")
+    raise HTTPException(
+        status_code=503,
+        detail=f"Recognition is warming up ({warmup['students_loaded']}/{warmup['students_total'] or '?'} students loaded)",
+        headers={"Retry-After": "5"}
+    )
+
+@app.on_event("shutdown")
+def shutdown_event():
+    # Pending media first: its completions queue the rows for the attendance writer
+    media_writer.stop()
+    # Flush any queued attendance writes before the process exits
+    attendance_service.writer.stop()
+    if embedding_migrator:
+        embedding_migrator.stop()
+    retention_engine.stop()
+
 @app.get("/")
 def read_root():
     return {"message": "Robocop Attendance Backend is running. Go to /docs for API documentation."}
 
 @app.get("/health")
 def read_health():
+    # Liveness: the process serves requests, whether or not recognition is ready
     return {"status": "ok"}
 
+@app.get("/ready")
+def read_ready():
+    """Readiness: 200 once recognition can serve, 503 with the gallery load progress until then."""
+    warmup = gallery_warmup.status()
+    return JSONResponse(status_code=200 if gallery_warmup.ready else 503, content=jsonable_encoder(warmup))
+
+@app.get("/metrics")
+def read_metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/token")
 @limiter.limit("5/minute")
 async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
@@ -145,9 +297,7 @@ async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequ
                 headers={"WWW-Authenticate": "Bearer"},
             )
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.username, "role": user.role.value}, expires_delta=access_token_expires
-        )
+        access_token = create_user_token(user, expires_delta=access_token_expires)
         return {"access_token": access_token, "token_type": "bearer", "role": user.role.value}
 
 @app.post("/register", response_model=User)
@@ -176,6 +326,21 @@ async def register_user(request: Request, user_data: UserCreate):
 async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+@app.post("/users/me/password")
+@limiter.limit("5/minute")
+def change_password(request: Request, body: ChangePasswordRequest, current_user: User = Depends(get_current_user)):
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.username == current_user.username)).first()
+        if not user or not verify_password(body.current_password, user.password_hash):
+            raise HTTPException(status_code=400, detail="Current password is incorrect")
+        user.password_hash = get_password_hash(body.new_password)
+        # Sessions on other devices must log in again
+        revoke_user_tokens(session, user)
+        session.commit()
+        session.refresh(user)
+        access_token = create_user_token(user, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+        return {"access_token": access_token, "token_type": "bearer", "role": user.role.value}
+
 @app.get("/attendance", response_model=List[AttendanceRecord])
 def get_attendance_log(current_user: User = Depends(get_current_user)):
     # Any authenticated user can view log (for now), or restrict to teacher/admin/student(self)
@@ -184,7 +349,11 @@ def get_attendance_log(current_user: User = Depends(get_current_user)):
     return attendance_service.get_recent_records()
 
 @app.get("/attendance/my", response_model=List[AttendanceRecord])
-def get_my_attendance(current_user: User = Depends(get_current_user)):
+def get_my_attendance(
+    response: Response,
+    page: PageRequest = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
     if not attendance_service:
         raise HTTPException(status_code=500, detail="Services not initialized")
     
@@ -192,7 +361,9 @@ def get_my_attendance(current_user: User = Depends(get_current_user)):
     if current_user.face_identity:
         aliases.append(current_user.face_identity)
         
-    return attendance_service.get_student_history(current_user.username, aliases=aliases)
+    records, next_cursor = attendance_service.get_student_history(current_user.username, aliases=aliases, page=page)
+    set_next_cursor(response, next_cursor)
+    return records
 
 @app.post("/sessions")
 def create_session(name: str, user: User = Depends(allow_teacher_admin)):
@@ -210,32 +381,140 @@ def get_active_session(current_user: User = Depends(get_current_user)):
 def end_session(user: User = Depends(allow_teacher_admin)):
     if not attendance_service:
         raise HTTPException(status_code=500, detail="Services not initialized")
-    return attendance_service.end_active_session()
+    # Roster snapshot lets the finalized summary carry the absentee list
+    all_students = list(embedding_loader.student_embeddings.keys()) if embedding_loader else None
+    return attendance_service.end_active_session(all_students)
+
+@app.get("/events")
+async def stream_session_events(request: Request, token: str, last_event_id: Optional[int] = None):
+    """
+    Server-Sent Events feed of session deltas (attendance marked, unknown registered
+    or resolved, session started or ended) replacing dashboard polling.
+    EventSource cannot send headers, so the JWT comes in the query string. Browsers
+    resume with the Last-Event-ID header; `last_event_id` is the manual equivalent.
+    """
+    get_current_user(token)
 
-@app.get("/sessions")
-def get_session_history(user: User = Depends(get_current_user)):
+    header_id = request.headers.get("last-event-id")
+    if header_id and header_id.isdigit():
+        last_event_id = int(header_id)
+
+    return StreamingResponse(
+        event_bus.stream(last_event_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/sessions", response_model=List[SessionHistoryEntry])
+def get_session_history(
+    response: Response,
+    page: PageRequest = Depends(page_params),
+    user: User = Depends(get_current_user)
+):
+    # Paged newest-first; follow the X-Next-Cursor header for older sessions
     if not attendance_service:
         raise HTTPException(status_code=500, detail="Services not initialized")
-    return attendance_service.get_session_history()
+    history, next_cursor = attendance_service.get_session_history(page)
+    set_next_cursor(response, next_cursor)
+    return history
 
 @app.get("/sessions/{session_id}/report")
 def get_session_report(session_id: int, user: User = Depends(allow_teacher_admin)):
-    if not attendance_service or not embedding_loader:
-        raise HTTPException(status_code=500, detail="Services not initialized")
+    require_recognition()
     
     all_students = list(embedding_loader.student_embeddings.keys())
     return attendance_service.get_session_report(session_id, all_students)
 
+@app.get("/export/attendance")
+def export_attendance(
+    format: str = "csv",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    session_id: Optional[List[int]] = Query(None),
+    student: Optional[List[str]] = Query(None),
+    user: User = Depends(allow_teacher_admin)
+):
+    """
+    Streams attendance records as CSV, newline-delimited JSON or Parquet.
+    Filter by date range, sessions (repeat `session_id`) and/or students (repeat `student`).
+    Rows flow from a DB cursor in fixed-size chunks with chunked transfer encoding.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {list(EXPORT_FORMATS)}")
+    if format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export requires the 'pyarrow' package")
+
+    export_filter = ExportFilter(since=since, until=until, session_ids=session_id, students=student)
+    stream = getattr(export_service, f"stream_{format}")(export_filter)
+    media_type, extension = EXPORT_FORMATS[format]
+
+    if admin_service:
+        admin_service.log_action(
+            actor_username=user.username,
+            action="EXPORT_ATTENDANCE",
+            details={
+                "format": format,
+                "since": since.isoformat() if since else None,
+                "until": until.isoformat() if until else None,
+                "session_ids": session_id,
+                "students": student
+            }
+        )
+
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="attendance_export.{extension}"'}
+    )
+
+@app.get("/analytics/attendance")
+def get_attendance_analytics(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    session_id: Optional[List[int]] = Query(None),
+    chronic_threshold: float = Query(0.8, ge=0.0, le=1.0),
+    late_after_minutes: float = Query(10.0, ge=0.0),
+    user: User = Depends(allow_teacher_admin)
+):
+    """
+    Attendance rates, streaks, chronic absentees and per-session punctuality over
+    finished sessions (optionally limited by creation date or `session_id`).
+    """
+    require_recognition()
+    all_students = list(embedding_loader.student_embeddings.keys())
+    return analytics_service.attendance_report(
+        all_students,
+        since=since,
+        until=until,
+        session_ids=session_id,
+        chronic_threshold=chronic_threshold,
+        late_after_minutes=late_after_minutes
+    )
+
+@app.get("/analytics/my")
+def get_my_analytics(current_user: User = Depends(get_current_user)):
+    require_recognition()
+    all_students = list(embedding_loader.student_embeddings.keys())
+    report = analytics_service.attendance_report(all_students)
+
+    names = [current_user.username]
+    if current_user.face_identity:
+        names.append(current_user.face_identity)
+    return analytics_service.student_summary(report, names)
+
 @app.post("/attendance/manual")
 def manual_mark(student_name: str, session_id: int, user: User = Depends(allow_teacher_admin)):
     if not attendance_service:
          raise HTTPException(status_code=500, detail="Services not initialized")
-    return attendance_service.mark_attendance(student_name, confidence=1.0, session_id=session_id)
+    # Human verified: distance 0.0 upgrades an existing recognition mark
+    return attendance_service.mark_attendance(student_name, distance=0.0, session_id=session_id)
 
 @app.get("/attendance/absent")
 def get_absent_students(current_user: User = Depends(get_current_user)):
-    if not attendance_service or not embedding_loader:
-        raise HTTPException(status_code=500, detail="Services not initialized")
+    require_recognition()
     
     active = attendance_service.get_active_session()
     all_students = list(embedding_loader.student_embeddings.keys())
@@ -246,166 +525,251 @@ def get_absent_students(current_user: User = Depends(get_current_user)):
     
     return attendance_service.get_absentees_for_session(active.id, all_students)
 
-@app.post("/recognize/video")
-async def recognize_video(
-    request: Request,
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...), 
-    user: User = Depends(allow_teacher_kiosk)
-):
-    # ... existing code ... (This is actually recognize_video, wait I am replacing content, I need to insert BEFORE or nearby)
-    pass
-
 @app.post("/detect-faces")
 async def detect_faces(file: UploadFile = File(...), user: User = Depends(get_current_user)):
     # Lightweight endpoint for real-time camera overlay
-    if not recognition_service:
-        raise HTTPException(status_code=500, detail="Recognition service not initialized")
-    
-    # Read file
-    contents = await file.read()
-    nparr = np.frombuffer(contents, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    if img is None:
-        return {"faces": []}
-    
-    # Convert to RGB
-    rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    
-    # Detect
-    locations = recognition_service.detect_only(rgb_img)
-    
+    require_recognition()
+
+    # Shed (429/503 with Retry-After) rather than queue stale overlay frames
+    ticket = admit_or_reject(DETECT, user)
+    with ticket:
+        started = time.perf_counter()
+        # Read file
+        with metrics.stage_timer("upload"):
+            contents = await file.read()
+        with metrics.stage_timer("decode"):
+            nparr = np.frombuffer(contents, np.uint8)
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+        if img is None:
+            return {"faces": []}
+
+        # Convert to RGB
+        rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+        # HOG detection is CPU-bound: off the event loop, in a detect worker slot
+        locations = await run_in_threadpool(detect_in_slot, ticket, rgb_img)
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="detect_faces")
+
     # Convert to JSON friendly format (top, right, bottom, left)
     return {"faces": locations}
 
 @app.post("/recognize/image")
-@limiter.limit("10/minute")
-async def recognize_image(request: Request, file: UploadFile = File(...), user: User = Depends(allow_teacher_kiosk)):
-    if not recognition_service:
-        raise HTTPException(status_code=500, detail="Recognition service not initialized")
+async def recognize_image(file: UploadFile = File(...), user: User = Depends(allow_teacher_kiosk)):
+    require_recognition()
     
     # Check file type
     if file.content_type not in ["image/jpeg", "image/png"]:
         raise HTTPException(status_code=400, detail="Invalid file type. Only JPEG and PNG are supported.")
 
-    # Ensure evidence directory exists
-    os.makedirs("static/evidence", exist_ok=True)
-    evidence_filename = f"{uuid.uuid4()}.jpg"
-    evidence_path = os.path.join("static/evidence", evidence_filename)
+    # FastAPI has already received the multipart body; rejecting here still saves the decode and recognition
+    ticket = admit_or_reject(INTERACTIVE, user)
+    started = time.perf_counter()
 
     try:
         # Read file into memory to use with OpenCV
-        contents = await file.read()
-        nparr = np.fromstring(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Save evidence to disk (write raw bytes or opencv image)
-        # Using opencv write to ensure it's saved as valid image
-        cv2.imwrite(evidence_path, img)
-        
-        # Convert to RGB for recognition
-        rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        with metrics.stage_timer("upload"):
+            contents = await file.read()
+        with metrics.stage_timer("decode"):
+            nparr = np.fromstring(contents, np.uint8)
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Convert to RGB for recognition
+            rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
-        # Pass the numpy array to recognition service
-        results = recognition_service.recognize_image(rgb_img)
+        # Recognition runs off the event loop, in one of the interactive worker slots
+        results = await run_in_threadpool(recognize_in_slot, ticket, rgb_img)
         
         # Mark attendance / Handle Unknowns
         if attendance_service:
             active_session = attendance_service.get_active_session()
             session_id = active_session.id if active_session else None
+            # Attendance marks for this frame are queued and committed together by the writer
+            pending_writes = []
+            # Crop files by path; their rows are queued once the files are on disk
+            crop_writes = {}
             
-            # Create AttendanceSource record
-            if session_id:
-                with Session(engine) as db:
-                    source = AttendanceSource(
-                        session_id=session_id,
-                        file_path=f"evidence/{evidence_filename}",
-                        media_type="image"
+            # One FaceDetection row per face; unknown faces also get their crop saved
+            detections = [dict(face) for face in results]
+            for face in detections:
+                if face['name'] == "Unknown" and active_session:
+                    # Handle Unknown Face
+                    # Crop face
+                    top, right, bottom, left = face['bounding_box']
+                    # Add padding? For now exact crop.
+                    # Ensure coordinates are within bounds
+                    h, w, _ = img.shape
+                    top = max(0, top); left = max(0, left)
+                    bottom = min(h, bottom); right = min(w, right)
+                    
+                    face_img = img[top:bottom, left:right]
+                    
+                    # Save to disk (encoded and written by the media writer)
+                    filename = f"{uuid.uuid4()}.jpg"
+                    # Organize by session? Or flat? key is session_id in DB.
+                    # Let's simple flat folder "static/unknowns"
+                    filepath = f"static/unknowns/{filename}"
+                    
+                    # Note: path stored relative to static mount? or full?
+                    # Let's store relative "unknowns/filename"
+                    face['crop_path'] = f"unknowns/{filename}"
+                    crop_writes[face['crop_path']] = media_writer.submit(
+                        filepath, lambda crop=face_img: encode_jpeg(crop)
                     )
-                    db.add(source)
-                    db.commit()
-            
+
+            # Create AttendanceSource record (with its face detections) and the unknown faces
+            if session_id:
+                with metrics.stage_timer("evidence"):
+                    stored, frame_write = await run_in_threadpool(stage_image_evidence, contents, file.content_type, img)
+                queue_image_records(session_id, stored, frame_write, detections, crop_writes)
+
             for face in results:
                 name = face['name']
-                
                 if name == "Unknown":
-                    # Handle Unknown Face
-                    if active_session:
-                        # Crop face
-                        top, right, bottom, left = face['bounding_box']
-                        # Add padding? For now exact crop.
-                        # Ensure coordinates are within bounds
-                        h, w, _ = img.shape
-                        top = max(0, top); left = max(0, left)
-                        bottom = min(h, bottom); right = min(w, right)
-                        
-                        face_img = img[top:bottom, left:right]
-                        
-                        # Save to disk
-                        filename = f"{uuid.uuid4()}.jpg"
-                        # Organize by session? Or flat? key is session_id in DB.
-                        # Let's simple flat folder "static/unknowns"
-                        filepath = f"static/unknowns/{filename}"
-                        cv2.imwrite(filepath, face_img)
-                        
-                        # Register in DB
-                        # Note: path stored relative to static mount? or full?
-                        # Let's store relative "unknowns/filename"
-                        attendance_service.register_unknown(
-                            session_id=active_session.id,
-                            image_path=f"unknowns/{filename}",
-                            confidence=face.get('distance', 0.0)
-                        )
-                else:
-                    # Regular Attendance
-                    attendance_service.mark_attendance(
+                    continue
+                if session_id:
+                    # Regular Attendance (None when already marked in this session)
+                    future = attendance_service.queue_attendance(
                         name, 
-                        confidence=face.get('distance', 0.0),
-                        metadata=face
+                        session_id=session_id,
+                        distance=face.get('distance')
                     )
+                    if future:
+                        pending_writes.append(future)
+                else:
+                    print(f"Skipping attendance for {name}: No active session.")
 
-        return {"faces": results}
+            with metrics.stage_timer("attendance_write"):
+                await asyncio.gather(*(asyncio.wrap_future(f) for f in pending_writes))
+
+        # Encodings are stored with the detections, not sent back
+        return {"faces": [{k: v for k, v in face.items() if k != "encoding"} for face in results]}
+    except MediaBacklogFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         print(f"Error processing image: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
+        ticket.release()
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="recognize_image")
         await file.close()
 
-def process_video_background(file_path: str, user_username: str, active_session_id: Optional[int]):
+def admit_or_reject(work_class: str, user: User) -> Ticket:
+    try:
+        return admission.admit(work_class, user)
+    except AdmissionRejected as e:
+        ADMISSION_REJECTIONS.inc(work_class=work_class, status=e.status_code)
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+def encode_jpeg(image: np.ndarray) -> bytes:
+    ok, encoded = cv2.imencode(".jpg", image)
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return encoded.tobytes()
+
+def stage_image_evidence(contents: bytes, content_type: str, img: np.ndarray) -> Tuple[StoredEvidence, Optional[Future]]:
+    """Reserves the frame in the evidence store; returns the pending write, or None if already stored."""
+    with profiling.section():
+        return _stage_image_evidence(contents, content_type, img)
+
+def _stage_image_evidence(contents: bytes, content_type: str, img: np.ndarray) -> Tuple[StoredEvidence, Optional[Future]]:
+    # Original bytes, unless they would display differently from what was recognized
+    if has_exif_rotation(contents):
+        data, ext = encode_jpeg(img), ".jpg"
+    else:
+        data, ext = contents, ".png" if content_type == "image/png" else ".jpg"
+    stored = evidence_store.reserve(data, ext)
+    if stored.deduplicated:
+        return stored, None
+    return stored, media_writer.submit(
+        evidence_store.absolute(stored.file_path), data,
+        on_written=lambda: evidence_store.register(stored, len(data))
+    )
+
+def queue_image_records(
+    session_id: int,
+    stored: StoredEvidence,
+    frame_write: Optional[Future],
+    detections: List[Dict],
+    crop_writes: Dict[str, Future]
+):
+    """
+    Queues the frame's source (with its detections) and unknown-face rows once
+    their files are durable. Nothing points at a file that failed to write:
+    failed crops lose their crop_path, a failed frame drops the source.
+    """
+    def _queue():
+        failed = {path for path, write in crop_writes.items() if write.exception()}
+        for face in detections:
+            if face.get('crop_path') in failed:
+                face['crop_path'] = None
+
+        if frame_write and frame_write.exception():
+            print(f"Evidence frame {stored.file_path} not recorded: {frame_write.exception()}")
+        else:
+            attendance_service.queue_source(
+                session_id=session_id,
+                file_path=stored.file_path,
+                media_type="image",
+                faces=detections,
+                content_hash=stored.content_hash
+            )
+        for face in detections:
+            if face.get('crop_path'):
+                attendance_service.queue_unknown(
+                    session_id=session_id,
+                    image_path=face['crop_path'],
+                    confidence=face.get('distance', 0.0)
+                )
+
+    when_all(list(crop_writes.values()) + ([frame_write] if frame_write else []), _queue)
+
+def detect_in_slot(ticket: Ticket, rgb_img: np.ndarray):
+    with admission.slot(ticket), profiling.section():
+        return recognition_service.detect_only(rgb_img)
+
+def recognize_in_slot(ticket: Ticket, rgb_img: np.ndarray):
+    with admission.slot(ticket), profiling.section():
+        return recognition_service.recognize_image(rgb_img, with_encodings=True)
+
+def process_video_background(file_path: str, user_username: str, active_session_id: Optional[int], ticket: Ticket):
+    with ticket:
+        _process_video(file_path, user_username, active_session_id, ticket)
+
+def _process_video(file_path: str, user_username: str, active_session_id: Optional[int], ticket: Ticket):
     try:
         print(f"Background: Processing task for video {file_path}")
         if not video_processor:
             print("Error: VideoProcessor not initialized in background task.")
             return
 
-        # Move temporary video to evidence storage if session exists
+        # Store the video as evidence if session exists (a re-upload shares the stored file)
+        stored = None
         if active_session_id:
-             os.makedirs("static/evidence", exist_ok=True)
-             evidence_filename = f"{uuid.uuid4()}.mp4"
-             evidence_dest = os.path.join("static/evidence", evidence_filename)
-             # Copy/Move logic
-             shutil.copy(file_path, evidence_dest)
-             
-             with Session(engine) as db:
-                 source = AttendanceSource(
-                    session_id=active_session_id,
-                    file_path=f"evidence/{evidence_filename}",
-                    media_type="video"
-                 )
-                 db.add(source)
-                 db.commit()
-
-        # Process the video
-        # We process the original temp file or the new evidence file?
-        # Let's process the temp file as it's already there and we might delete it later (though shutil.copy keeps it)
-        results = video_processor.process_video(file_path)
+            stored = evidence_store.put_file(file_path, os.path.splitext(file_path)[1].lower() or ".mp4")
+
+        # Process the temp file; the stored evidence may be a hard link to it, removing the temp file keeps it intact
+        with admission.slot(ticket), REQUEST_SECONDS.time(endpoint="recognize_video"):
+            results = video_processor.process_video(file_path)
         identities = results.get('identities', [])
         metadata = results.get('metadata', {})
 
         print(f"Background: Video processed. Identities found: {identities}")
 
         if attendance_service:
+            pending_writes = []
+            if stored:
+                # Best sighting per identity becomes the video's face detections
+                pending_writes.append(attendance_service.queue_source(
+                    session_id=active_session_id,
+                    file_path=stored.file_path,
+                    media_type="video",
+                    faces=list(metadata.values()),
+                    content_hash=stored.content_hash
+                ))
             for name in identities:
                 if name == "Unknown":
                     # For unknown faces in video, we currently don't extract individual frames 
@@ -414,13 +778,16 @@ def process_video_background(file_path: str, user_username: str, active_session_
                     continue
                 
                 # Mark attendance
-                # Use metadata if available
-                confidence = 1.0
+                # Use metadata if available (it carries the best distance for this identity)
                 meta = metadata.get(name, {})
-                if 'distance' in meta:
-                    confidence = meta['distance']
                 
-                attendance_service.mark_attendance(name, confidence=confidence, session_id=active_session_id, metadata=meta)
+                future = attendance_service.queue_attendance(name, session_id=active_session_id, distance=meta.get('distance'))
+                if future:
+                    pending_writes.append(future)
+
+            # Marks for every identity in the video land in a single batch
+            for future in pending_writes:
+                future.result()
 
     except Exception as e:
         print(f"Error in background video processing: {e}")
@@ -431,20 +798,20 @@ def process_video_background(file_path: str, user_username: str, active_session_
             print(f"Background: Cleaned up temp file {file_path}")
 
 @app.post("/recognize/video", status_code=202)
-@limiter.limit("2/minute")
 async def recognize_video(
-    request: Request,
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...), 
     user: User = Depends(allow_teacher_kiosk)
 ):
-    if not video_processor:
-        raise HTTPException(status_code=500, detail="Video processor not initialized")
+    require_recognition()
     
     # Check file type extension (basic check)
     if not file.filename.lower().endswith(('.mp4', '.avi', '.mov')):
          raise HTTPException(status_code=400, detail="Invalid file type. Only MP4, AVI, MOV are supported.")
 
+    # Admitted before the upload is copied; the ticket is held until processing ends
+    ticket = admit_or_reject(BATCH, user)
+
     # Save uploaded file to a temporary file
     try:
         # Create a temp file that persists after close so background task can read it
@@ -452,6 +819,7 @@ async def recognize_video(
         with os.fdopen(fd, 'wb') as tmp:
             shutil.copyfileobj(file.file, tmp)
     except Exception as e:
+        ticket.release()
         raise HTTPException(status_code=500, detail=f"Failed to save uploaded video: {e}")
 
     # Capture current active session ID to attribute attendance correctly
@@ -462,7 +830,7 @@ async def recognize_video(
             active_session_id = active.id
 
     # Add to background tasks
-    background_tasks.add_task(process_video_background, tmp_path, user.username, active_session_id)
+    background_tasks.add_task(process_video_background, tmp_path, user.username, active_session_id, ticket)
 
     return {"status": "processing", "message": "Video accepted for background processing. Check Live Log for updates."}
 
@@ -488,17 +856,148 @@ def resolve_unknown(unknown_id: int, student_name: str, user: User = Depends(all
     
     return record
 
+@app.post("/sessions/{session_id}/reidentify")
+def reidentify_session(
+    session_id: int,
+    tolerance: float = Query(0.6, gt=0.0),
+    apply: bool = False,
+    user: User = Depends(allow_teacher_admin)
+):
+    """
+    Re-matches the session's stored face embeddings against the current gallery.
+    Dry run by default; `apply=true` writes the new identities and marks.
+    """
+    require_recognition()
+    report = reidentification_service.reidentify_session(session_id, tolerance=tolerance, apply=apply)
+    if apply and admin_service:
+        admin_service.log_action(
+            actor_username=user.username,
+            action="REIDENTIFY_SESSION",
+            target_id=str(session_id),
+            details={
+                "tolerance": tolerance,
+                "changed": len(report["changed"]),
+                "newly_present": report["newly_present"]
+            }
+        )
+    return report
+
 # Dispute System
 
 
 
 @app.get("/sessions/{session_id}/evidence", response_model=List[AttendanceSource])
-def get_session_evidence(session_id: int, current_user: User = Depends(get_current_user)):
+def get_session_evidence(
+    session_id: int,
+    response: Response,
+    page: PageRequest = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
     # Students can only see evidence for sessions they are part of? 
     # Or strict: Only session they are in? 
     # For now allow all logged in users to see evidence for correct dispute filing.
+    sources, next_cursor = attendance_service.get_session_evidence(session_id, page)
+    set_next_cursor(response, next_cursor)
+    return sources
+
+@app.get("/sources/{source_id}/faces", response_model=List[FaceDetection])
+def get_source_faces(source_id: int, current_user: User = Depends(get_current_user)):
+    return attendance_service.get_source_faces(source_id)
+
+MEDIA_VARIANTS = ["original", *VARIANTS]
+
+def require_source_access(session: Session, source: AttendanceSource, user: User):
+    """
+    Teachers and admins see every source; a student only those showing their
+    face or taken in a session they belong to (marked, disputed or on the
+    roster), which is what the dispute gallery offers them.
+    """
+    if user.role in (UserRole.TEACHER, UserRole.ADMIN):
+        return
+    identities = {user.username, user.face_identity} - {None}
+    if user.role == UserRole.STUDENT:
+        if session.exec(select(FaceDetection.id).where(
+            FaceDetection.source_id == source.id, FaceDetection.identity.in_(identities)
+        )).first():
+            return
+        if source.session_id is not None and student_in_session(session, source.session_id, user.username, identities):
+            return
+    raise HTTPException(status_code=403, detail="Not permitted to view this evidence")
+
+def student_in_session(session: Session, session_id: int, username: str, identities: set) -> bool:
+    if session.exec(select(AttendanceRecord.id).where(
+        AttendanceRecord.session_id == session_id, AttendanceRecord.student_name.in_(identities)
+    )).first():
+        return True
+    if session.exec(select(Dispute.id).where(
+        Dispute.session_id == session_id, Dispute.student_username == username
+    )).first():
+        return True
+    summary = session.get(SessionSummary, session_id)
+    if summary and summary.is_final and summary.absent_json is not None:
+        # Roster snapshotted at session end
+        return bool(identities & set(json.loads(summary.absent_json)))
+    return bool(identities & set(embedding_loader.student_embeddings.keys()))
+
+# <img>/<video> tags pass the JWT as ?token=, see get_media_user
+@app.get("/sources/{source_id}/media/{variant}")
+def get_source_media(source_id: int, variant: str, request: Request, user: User = Depends(get_media_user)):
+    """
+    An evidence frame or video ('original', with byte ranges for seeking), or
+    a 'thumb'/'preview' JPEG/WebP (poster frame for videos), with immutable
+    caching and ETags derived from the content hash.
+    """
+    if variant not in MEDIA_VARIANTS:
+        raise HTTPException(status_code=404, detail=f"Unknown variant. Use one of: {MEDIA_VARIANTS}")
     with Session(engine) as session:
-        return session.exec(select(AttendanceSource).where(AttendanceSource.session_id == session_id).order_by(AttendanceSource.timestamp.desc())).all()
+        source = session.get(AttendanceSource, source_id)
+        if not source:
+            raise HTTPException(status_code=404, detail="Source not found")
+        require_source_access(session, source, user)
+    path = evidence_store.absolute(source.file_path)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Evidence file missing")
+    try:
+        return serve_media(request, derivatives, media_key(source.content_hash, source.file_path), path, source.media_type, variant)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/unknowns/{unknown_id}/thumb")
+def get_unknown_thumb(unknown_id: int, request: Request, user: User = Depends(allow_teacher_admin_media)):
+    with Session(engine) as session:
+        unknown = session.get(UnknownFace, unknown_id)
+    if not unknown or not unknown.image_path:
+        raise HTTPException(status_code=404, detail="Unknown face not found")
+    path = os.path.join("static", unknown.image_path)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Crop file missing")
+    try:
+        return serve_media(request, derivatives, media_key(None, unknown.image_path), path, "image", "thumb")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/students/{student_name}/evidence", response_model=List[AttendanceSource])
+def get_student_evidence(
+    student_name: str,
+    response: Response,
+    page: PageRequest = Depends(page_params),
+    user: User = Depends(allow_teacher_admin)
+):
+    # Evidence frames in which this student's face was detected
+    sources, next_cursor = attendance_service.get_student_evidence(student_name, page=page)
+    set_next_cursor(response, next_cursor)
+    return sources
+
+@app.get("/attendance/my/evidence", response_model=List[AttendanceSource])
+def get_my_evidence(
+    response: Response,
+    page: PageRequest = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
+    aliases = [current_user.face_identity] if current_user.face_identity else []
+    sources, next_cursor = attendance_service.get_student_evidence(current_user.username, aliases=aliases, page=page)
+    set_next_cursor(response, next_cursor)
+    return sources
 
 @app.post("/disputes", response_model=Dispute)
 def create_dispute(dispute: DisputeCreate, current_user: User = Depends(get_current_user)):
@@ -519,27 +1018,53 @@ def create_dispute(dispute: DisputeCreate, current_user: User = Depends(get_curr
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/disputes/my", response_model=List[Dispute])
-def get_my_disputes(current_user: User = Depends(get_current_user)):
+def get_my_disputes(
+    response: Response,
+    status: Optional[DisputeStatus] = None,
+    page: PageRequest = Depends(page_params),
+    current_user: User = Depends(get_current_user)
+):
     try:
         if not dispute_service:
             raise HTTPException(status_code=500, detail="Services not initialized")
-        return dispute_service.get_my_disputes(current_user.username)
+        disputes, next_cursor = dispute_service.get_my_disputes(current_user.username, page, status)
+        set_next_cursor(response, next_cursor)
+        return disputes
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/disputes", response_model=List[Dispute])
-def get_all_disputes(current_user: User = Depends(allow_teacher_admin)):
+def get_all_disputes(
+    response: Response,
+    status: Optional[DisputeStatus] = None,
+    page: PageRequest = Depends(page_params),
+    current_user: User = Depends(allow_teacher_admin)
+):
     try:
         if not dispute_service:
             raise HTTPException(status_code=500, detail="Services not initialized")
-        return dispute_service.get_all_disputes()
+        disputes, next_cursor = dispute_service.get_all_disputes(page, status)
+        set_next_cursor(response, next_cursor)
+        return disputes
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/disputes/{dispute_id}/evidence")
+def get_dispute_evidence(dispute_id: int, current_user: User = Depends(get_current_user)):
+    if not dispute_service:
+        raise HTTPException(status_code=500, detail="Services not initialized")
+    evidence = dispute_service.get_dispute_evidence(dispute_id)
+    if not evidence:
+        raise HTTPException(status_code=404, detail="Dispute not found")
+    # Students may only review their own disputes
+    if current_user.role == UserRole.STUDENT and evidence["dispute"].student_username != current_user.username:
+        raise HTTPException(status_code=403, detail="Not your dispute")
+    return evidence
+
 @app.post("/disputes/{dispute_id}/resolve")
 def resolve_dispute(dispute_id: int, status: DisputeStatus, current_user: User = Depends(allow_teacher_admin)):
     try:
@@ -557,9 +1082,20 @@ def resolve_dispute(dispute_id: int, status: DisputeStatus, current_user: User =
 # Admin & Audit System
 
 @app.get("/admin/users", response_model=List[User])
-def get_all_users(current_user: User = Depends(allow_admin)):
+def get_all_users(
+    response: Response,
+    role: Optional[UserRole] = None,
+    page: PageRequest = Depends(page_params),
+    current_user: User = Depends(allow_admin)
+):
+    # Users have no timestamp, so the keyset is the id alone (since/until are ignored)
+    statement = select(User)
+    if role:
+        statement = statement.where(User.role == role)
     with Session(engine) as session:
-        return session.exec(select(User)).all()
+        users, next_cursor = keyset_page(session, statement, page, id_col=User.id)
+    set_next_cursor(response, next_cursor)
+    return users
 
 @app.post("/admin/map-identity")
 def map_user_identity(request: MapUserRequest, current_user: User = Depends(allow_admin)):
@@ -571,6 +1107,8 @@ def map_user_identity(request: MapUserRequest, current_user: User = Depends(allo
         user.face_identity = request.face_identity
         session.add(user)
         session.commit()
+        # Tokens stay valid, but cached copies of the user are stale
+        principal_cache.invalidate(user.username)
         
         # Log action
         if admin_service:
@@ -583,53 +1121,252 @@ def map_user_identity(request: MapUserRequest, current_user: User = Depends(allo
             
         return {"status": "success", "username": user.username, "face_identity": user.face_identity}
 
+@app.put("/admin/users/{username}/role")
+def update_user_role(username: str, request: UpdateRoleRequest, current_user: User = Depends(allow_admin)):
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.username == username)).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        previous = user.role
+        if previous != request.role:
+            user.role = request.role
+            # Cached principals and issued tokens still carry the old role
+            revoke_user_tokens(session, user)
+            session.commit()
+
+            if admin_service:
+                admin_service.log_action(
+                    actor_username=current_user.username,
+                    action="UPDATE_ROLE",
+                    target_id=user.username,
+                    details={"from": previous.value, "to": request.role.value}
+                )
+
+        return {"status": "success", "username": user.username, "role": request.role.value}
+
+@app.post("/admin/users/import")
+def import_users(
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    current_user: User = Depends(allow_admin)
+):
+    """
+    Bulk account creation from a CSV with columns username, full_name, sap_id,
+    face_identity and optional password and role. Rows without a password get
+    a generated one, returned once in the response. Rows without a
+    face_identity are linked to a matching dataset folder where one exists.
+    """
+    try:
+        text = file.file.read().decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8 encoded")
+
+    try:
+        result = student_importer.import_csv(text, dry_run=dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not dry_run and result.created and admin_service:
+        admin_service.log_action(
+            actor_username=current_user.username,
+            action="IMPORT_USERS",
+            target_id=file.filename or "upload",
+            details={"created": len(result.created), "errors": len(result.errors)}
+        )
+    return result.to_dict()
+
 @app.get("/admin/audit-logs", response_model=List[AuditLog])
-def get_audit_logs(current_user: User = Depends(allow_admin)):
+def get_audit_logs(
+    response: Response,
+    action: Optional[str] = None,
+    page: PageRequest = Depends(page_params),
+    current_user: User = Depends(allow_admin)
+):
     if not admin_service:
         raise HTTPException(status_code=500, detail="Services not initialized")
-    return admin_service.get_audit_logs()
+    logs, next_cursor = admin_service.get_audit_logs(page, action)
+    set_next_cursor(response, next_cursor)
+    return logs
+
+@app.get("/admin/evidence")
+def get_evidence_store_stats(current_user: User = Depends(allow_admin)):
+    return evidence_store.stats()
+
+@app.get("/admin/media-writer")
+def get_media_writer_metrics(current_user: User = Depends(allow_admin)):
+    """Backlog of evidence and crop files waiting to be written."""
+    return media_writer.metrics()
+
+@app.post("/admin/evidence/gc")
+def collect_evidence_garbage(current_user: User = Depends(allow_admin)):
+    """Deletes evidence files no source references any more (after the store's grace period)."""
+    result = evidence_store.collect_garbage(on_delete=derivatives.remove)
+    if result["deleted_blobs"] and admin_service:
+        admin_service.log_action(
+            actor_username=current_user.username,
+            action="EVIDENCE_GC",
+            target_id="evidence",
+            details=result
+        )
+    return result
+
+@app.get("/admin/admission")
+def get_admission_status(current_user: User = Depends(allow_admin)):
+    """Recognition load per priority class: in-flight work, measured cost and rejections."""
+    return admission.status()
+
+@app.get("/admin/embeddings")
+def get_embedding_versions(current_user: User = Depends(allow_admin)):
+    require_recognition()
+    return {
+        "active_version": embedding_loader.model_version,
+        "versions": [embedding_migrator.status(version) for version in EMBEDDING_MODELS]
+    }
+
+@app.post("/admin/embeddings/migrate")
+def start_embedding_migration(version: str, current_user: User = Depends(allow_admin)):
+    """
+    Starts re-embedding enrollment images and evidence faces into `version` in the
+    background. Recognition keeps using the active version until the cutover.
+    """
+    require_recognition()
+    if version not in EMBEDDING_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown version. Use one of: {list(EMBEDDING_MODELS)}")
+    if not embedding_migrator.start(version):
+        raise HTTPException(status_code=409, detail="An embedding migration is already running")
+    if admin_service:
+        admin_service.log_action(
+            actor_username=current_user.username,
+            action="START_EMBEDDING_MIGRATION",
+            details={"version": version}
+        )
+    return embedding_migrator.status(version)
+
+@app.post("/admin/embeddings/migrate/stop")
+def stop_embedding_migration(current_user: User = Depends(allow_admin)):
+    require_recognition()
+    embedding_migrator.stop()
+    return {"status": "stopping"}
+
+@app.post("/admin/embeddings/cutover")
+def cutover_embedding_version(version: str, force: bool = False, current_user: User = Depends(allow_admin)):
+    """
+    Switches recognition to `version`. Refused until its migration is complete,
+    unless `force` (e.g. to roll back to a version that is known to be good).
+    """
+    require_recognition()
+    if version not in EMBEDDING_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown version. Use one of: {list(EMBEDDING_MODELS)}")
+
+    status = embedding_migrator.status(version)
+    if not status["complete"] and not force:
+        raise HTTPException(status_code=409, detail={"message": "Migration not complete", "status": status})
+
+    previous = embedding_loader.model_version
+    embedding_loader.switch_version(version)
+    set_active_model_version(version)
+    # Faces recognized while the new gallery was built were embedded with the
+    # old version only: re-check coverage and backfill them in the background
+    after = embedding_migrator.status(version)
+    backfill = after["evidence"]["pending"] > 0 and embedding_migrator.start(version)
+    if admin_service:
+        admin_service.log_action(
+            actor_username=current_user.username,
+            action="EMBEDDING_CUTOVER",
+            details={
+                "from": previous,
+                "to": version,
+                "forced": force and not status["complete"],
+                "backfill_pending": after["evidence"]["pending"],
+            }
+        )
+    return embedding_migrator.status(version) if backfill else after
 
 @app.post("/admin/cleanup")
-def cleanup_media(days: int = 30, current_user: User = Depends(allow_admin)):
+def cleanup_media(days: int = Query(30, ge=1), current_user: User = Depends(allow_admin)):
     """
     Deletes UnknownFace images older than 'days' and removes corresponding DB records.
+    Runs in bounded chunks (see RetentionEngine), so live recognition keeps writing meanwhile.
     """
-    if not attendance_service:
-         raise HTTPException(status_code=500, detail="Services not initialized")
-    
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-    count = 0
-    deleted_files = 0
-    
-    with Session(engine) as session:
-        # Find old records
-        statement = select(UnknownFace).where(UnknownFace.timestamp < cutoff_date)
-        results = session.exec(statement).all()
-        
-        for face in results:
-            # Delete file
-            # Path stored as "unknowns/filename.jpg"
-            # Full path: static/unknowns/filename.jpg
-            if face.image_path:
-                full_path = os.path.join("static", face.image_path)
-                if os.path.exists(full_path):
-                    try:
-                        os.remove(full_path)
-                        deleted_files += 1
-                    except Exception as e:
-                        print(f"Failed to delete {full_path}: {e}")
-            
-            session.delete(face)
-            count += 1
-            
-        session.commit()
-        
-        # Log action
-        if admin_service:
-            admin_service.log_action(
-                actor_username=current_user.username,
-                action="CLEANUP_MEDIA",
-                details={"days": days, "records_deleted": count, "files_deleted": deleted_files}
-            )
+    result = retention_engine.expire_unknown_crops(days)
+
+    # Log action
+    if admin_service:
+        admin_service.log_action(
+            actor_username=current_user.username,
+            action="CLEANUP_MEDIA",
+            details={"days": days, **result}
+        )
 
-    return {"status": "success", "records_deleted": count, "files_deleted": deleted_files}
+    return {"status": "success", **result}
+
+@app.get("/admin/retention")
+def get_retention(current_user: User = Depends(allow_admin)):
+    return {
+        "policy": asdict(RetentionPolicy.load()),
+        "running": retention_engine.is_running(),
+        "last_report": retention_engine.last_report,
+    }
+
+@app.put("/admin/retention")
+def update_retention(request: RetentionPolicyRequest, current_user: User = Depends(allow_admin)):
+    policy = RetentionPolicy(**request.model_dump())
+    policy.save()
+    if admin_service:
+        admin_service.log_action(
+            actor_username=current_user.username,
+            action="UPDATE_RETENTION",
+            target_id="retention_policy",
+            details=asdict(policy)
+        )
+    return asdict(policy)
+
+@app.get("/admin/profiling")
+def get_profiling(current_user: User = Depends(allow_admin)):
+    """Sampling settings and the stored request profiles, newest first."""
+    return {
+        "settings": asdict(request_profiler.settings),
+        "header": PROFILE_HEADER,
+        "profiles": request_profiler.list(),
+    }
+
+@app.put("/admin/profiling")
+def update_profiling(request: ProfilingSettingsRequest, current_user: User = Depends(allow_admin)):
+    settings = ProfilingSettings(**request.model_dump())
+    request_profiler.update_settings(settings)
+    if admin_service:
+        admin_service.log_action(
+            actor_username=current_user.username,
+            action="UPDATE_PROFILING",
+            target_id="request_profiling",
+            details=asdict(settings)
+        )
+    return asdict(settings)
+
+@app.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, current_user: User = Depends(allow_admin)):
+    record = request_profiler.get(profile_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return record
+
+@app.get("/admin/profiles/{profile_id}/pstats")
+def download_profile(profile_id: str, current_user: User = Depends(allow_admin)):
+    path = request_profiler.pstats_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.pstats")
+
+@app.post("/admin/retention/run", status_code=202)
+def run_retention(current_user: User = Depends(allow_admin)):
+    """Applies the retention policy now, in the background (it also runs on a schedule)."""
+    if not retention_engine.trigger():
+        raise HTTPException(status_code=409, detail="A retention run is already in progress")
+    if admin_service:
+        admin_service.log_action(
+            actor_username=current_user.username,
+            action="RUN_RETENTION",
+            target_id="retention_policy"
+        )
+    return {"status": "started"}
@@ -0,0 +1,217 @@
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import uuid
+from typing import Dict, Iterator, Optional, Tuple
+import cv2
+import numpy as np
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+
+# Longest side in pixels per derivative variant
+VARIANTS: Dict[str, int] = {"thumb": 320, "preview": 1280}
+FORMATS = {"webp": (".webp", "image/webp", [cv2.IMWRITE_WEBP_QUALITY, 80]),
+           "jpeg": (".jpg", "image/jpeg", [cv2.IMWRITE_JPEG_QUALITY, 82])}
+# A source's file never changes, so its URLs can be cached forever; media
+# requires authentication, so only by the browser and not shared proxies
+IMMUTABLE = "private, max-age=31536000, immutable"
+CHUNK_SIZE = 256 * 1024
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class PublicStaticFiles(StaticFiles):
+    """
+    The /static mount minus directories that hold evidence, face crops or
+    their thumbnails/previews; those are only served through authenticated
+    endpoints (/sources/{id}/media, /unknowns/{id}/thumb).
+    """
+
+    def __init__(self, *args, private: Tuple[str, ...] = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.private = set(private)
+
+    async def get_response(self, path: str, scope) -> Response:
+        if path.split(os.sep, 1)[0] in self.private:
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+
+def media_key(content_hash: Optional[str], file_path: str) -> str:
+    """Cache key of a media file: its content hash, or a hash of its (never reused) legacy path."""
+    return content_hash or hashlib.sha256(file_path.encode()).hexdigest()
+
+
+def negotiate_format(request: Request) -> str:
+    return "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+
+
+class DerivativeService:
+    """
+    Thumbnails and previews of evidence frames and video poster frames,
+    rendered on first request and kept under static/derivatives/<key[:2]>/.
+    Concurrent requests for the same derivative render it once.
+    """
+
+    def __init__(self, root: str = "static", prefix: str = "derivatives", lock_stripes: int = 64):
+        self.root = root
+        self.prefix = prefix
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+
+    def path_for(self, key: str, variant: str, fmt: str) -> str:
+        return os.path.join(self.root, self.prefix, key[:2], f"{key}-{variant}{FORMATS[fmt][0]}")
+
+    def get(self, key: str, source_path: str, media_type: str, variant: str, fmt: str) -> str:
+        """Absolute path of the derivative, rendering it if needed."""
+        path = self.path_for(key, variant, fmt)
+        if os.path.exists(path):
+            return path
+        with self._locks[int(key[:8], 16) % len(self._locks)]:
+            if os.path.exists(path):
+                return path
+            data = self._render(source_path, media_type, VARIANTS[variant], fmt)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return path
+
+    def remove(self, key: str):
+        """Deletes every derivative of `key` (e.g. after the evidence blob was collected)."""
+        for variant in VARIANTS:
+            for fmt in FORMATS:
+                try:
+                    os.remove(self.path_for(key, variant, fmt))
+                except FileNotFoundError:
+                    pass
+
+    def _render(self, source_path: str, media_type: str, max_side: int, fmt: str) -> bytes:
+        image = poster_frame(source_path) if media_type == "video" else cv2.imread(source_path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Cannot decode {source_path}")
+        height, width = image.shape[:2]
+        scale = max_side / max(height, width)
+        if scale < 1:
+            image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+        ext, _, params = FORMATS[fmt]
+        ok, encoded = cv2.imencode(ext, image, params)
+        if not ok:
+            raise ValueError(f"Cannot encode {fmt} derivative of {source_path}")
+        return encoded.tobytes()
+
+
+def poster_frame(video_path: str, at_seconds: float = 1.0) -> Optional[np.ndarray]:
+    """A frame about `at_seconds` in (skipping fade-ins), or the first frame of shorter videos."""
+    capture = cv2.VideoCapture(video_path)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0
+        frames = capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+        if fps and frames > fps * at_seconds:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, int(fps * at_seconds))
+        ok, frame = capture.read()
+        if not ok:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = capture.read()
+        return frame if ok else None
+    finally:
+        capture.release()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as required for If-None-Match
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (first, last) byte offsets of a single-range `Range` header; None to serve
+    the whole file (absent, multi-range or malformed). Raises ValueError if unsatisfiable.
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range outside the file")
+    return start, end
+
+
+def _file_chunks(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def cached_file_response(
+    request: Request,
+    path: str,
+    etag: str,
+    media_type: Optional[str] = None,
+    vary: Optional[str] = None
+) -> Response:
+    """
+    Serves an immutable file with a strong ETag, answering If-None-Match with
+    304 and single byte ranges (video seeking) with 206.
+    """
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE, "Accept-Ranges": "bytes"}
+    if vary:
+        headers["Vary"] = vary
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    size = os.path.getsize(path)
+    try:
+        byte_range = parse_range(request.headers.get("range", ""), size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    # A stale If-Range validator means the client's partial copy is outdated: send everything
+    if_range = request.headers.get("if-range")
+    if byte_range is None or (if_range and if_range != etag):
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(_file_chunks(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+
+def serve_media(
+    request: Request,
+    derivatives: DerivativeService,
+    key: str,
+    source_path: str,
+    media_type: str,
+    variant: str
+) -> Response:
+    """The original file (`variant` 'original') or a derivative in the best format the client accepts."""
+    if variant == "original":
+        return cached_file_response(request, source_path, f'"{key}"')
+    fmt = negotiate_format(request)
+    etag = f'"{key}-{variant}-{fmt}"'
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        # Revalidation without touching (or rendering) the file
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": IMMUTABLE, "Vary": "Accept"})
+    path = derivatives.get(key, source_path, media_type, variant, fmt)
+    return cached_file_response(request, path, etag, FORMATS[fmt][1], vary="Accept")
@@ -0,0 +1,235 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Union
+from . import metrics
+
+BATCH_SECONDS = metrics.histogram(
+    "media_writer_batch_seconds", "Time to encode, write and fsync one batch of evidence files."
+)
+
+# Bytes, or a callable producing them in the writer thread (e.g. a JPEG encode)
+Payload = Union[bytes, Callable[[], bytes]]
+
+
+class MediaBacklogFull(Exception):
+    """The write queue stayed full for the whole submit timeout."""
+
+
+@dataclass
+class _MediaJob:
+    path: str
+    payload: Payload
+    # Runs after the file is durable and before the future resolves (e.g. registering a blob)
+    on_written: Optional[Callable[[], None]] = None
+    queued_at: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+
+
+class MediaWriter:
+    """
+    Background writer for evidence frames and face crops, so JPEG encoding
+    and disk latency stay off the request path.
+
+    `submit` returns at once with a Future that resolves to the path once the
+    file is durable, or fails. Callers queue DB rows that point at a file only
+    from that Future (see `when_all`), so a row never references a file that
+    failed to write. The workers write each batch to temp files, fsync them
+    together, rename them into place and fsync each directory once per batch.
+    The queue is bounded: when it stays full, `submit` raises MediaBacklogFull
+    instead of growing without limit.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queue: int = 256,
+        batch_size: int = 16,
+        submit_timeout: float = 1.0
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.submit_timeout = submit_timeout
+        self._queue: "queue.Queue[Optional[_MediaJob]]" = queue.Queue(maxsize=max_queue)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._written = 0
+        self._failed = 0
+        self._bytes_written = 0
+        self._last_batch_seconds = 0.0
+        self._max_queue_wait_seconds = 0.0
+
+    def start(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f"media-writer-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """Writes everything already queued, then stops the worker threads."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, path: str, payload: Payload, on_written: Optional[Callable[[], None]] = None) -> Future:
+        # Lazily start so CLI scripts and background tasks work without the app lifecycle
+        self.start()
+        job = _MediaJob(path=path, payload=payload, on_written=on_written)
+        try:
+            self._queue.put(job, timeout=self.submit_timeout)
+        except queue.Full:
+            raise MediaBacklogFull(f"Media write queue full ({self._queue.maxsize} files)")
+        return job.future
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "in_flight": self._in_flight,
+                "written": self._written,
+                "failed": self._failed,
+                "bytes_written": self._bytes_written,
+                "last_batch_seconds": round(self._last_batch_seconds, 4),
+                "max_queue_wait_seconds": round(self._max_queue_wait_seconds, 4),
+                "workers": len(self._threads),
+            }
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            batch = [job]
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    next_job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_job is None:
+                    stopping = True
+                    break
+                batch.append(next_job)
+            self._write_batch(batch)
+            if stopping:
+                return
+
+    def _write_batch(self, batch: List[_MediaJob]):
+        started = time.monotonic()
+        with self._lock:
+            self._in_flight += len(batch)
+            self._max_queue_wait_seconds = max(
+                self._max_queue_wait_seconds, max(started - job.queued_at for job in batch)
+            )
+
+        staged = []  # (job, tmp_path, size)
+        for job in batch:
+            tmp_path = None
+            try:
+                data = job.payload() if callable(job.payload) else job.payload
+                os.makedirs(os.path.dirname(job.path) or ".", exist_ok=True)
+                tmp_path = f"{job.path}.{uuid.uuid4().hex}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                staged.append((job, tmp_path, len(data)))
+            except Exception as e:
+                self._fail(job, e, tmp_path)
+
+        # All files are written before the first fsync, so the disk flushes them together
+        written = []
+        for job, tmp_path, size in staged:
+            try:
+                _fsync_file(tmp_path)
+                os.replace(tmp_path, job.path)
+                written.append((job, size))
+            except Exception as e:
+                self._fail(job, e, tmp_path)
+
+        # One directory fsync per batch makes every rename in it durable
+        for directory in {os.path.dirname(job.path) or "." for job, _ in written}:
+            _fsync_directory(directory)
+
+        for job, size in written:
+            try:
+                if job.on_written:
+                    job.on_written()
+            except Exception as e:
+                # The file is in place and its path may be shared (a content-addressed
+                # blob), so it stays; a later write of the same content registers it
+                self._fail(job, e, None)
+                continue
+            with self._lock:
+                self._written += 1
+                self._bytes_written += size
+            job.future.set_result(job.path)
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._in_flight -= len(batch)
+            self._last_batch_seconds = elapsed
+        BATCH_SECONDS.observe(elapsed)
+
+    def _fail(self, job: _MediaJob, error: Exception, leftover: Optional[str]):
+        print(f"MediaWriter: failed to write {job.path}: {error}")
+        if leftover:
+            try:
+                os.remove(leftover)
+            except OSError:
+                pass
+        with self._lock:
+            self._failed += 1
+        job.future.set_exception(error)
+
+
+def _fsync_file(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_directory(directory: str):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows, where directories cannot be opened
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def when_all(futures: Sequence[Future], callback: Callable[[], None]):
+    """Runs `callback` once every future is done (in the thread completing the last one)."""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def _done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            try:
+                callback()
+            except Exception as e:
+                print(f"MediaWriter: completion callback failed: {e}")
+
+    if not futures:
+        callback()
+        return
+    for future in futures:
+        future.add_done_callback(_done)
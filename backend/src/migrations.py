@@ -0,0 +1,178 @@
+"""
+Idempotent schema migrations for databases created before a model change.
+`create_db_and_tables` only creates missing tables, so columns and indexes
+added to existing tables are brought in here. Every step is safe to re-run.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlmodel import SQLModel
+from .database import engine
+from .embedding_models import DEFAULT_MODEL_VERSION
+
+
+def _columns(conn: Connection, table: str) -> set:
+    return {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+
+
+def _migrate_attendance_unique_marks(conn: Connection):
+    """
+    Adds AttendanceRecord.distance, collapses duplicate (session, student) marks
+    and creates the unique index the attendance upsert relies on.
+    """
+    if "distance" not in _columns(conn, "attendancerecord"):
+        print("Migration: adding attendancerecord.distance")
+        conn.execute(text("ALTER TABLE attendancerecord ADD COLUMN distance FLOAT"))
+        # Backfill from the recognition metadata; manual resolutions count as verified
+        conn.execute(text("""
+            UPDATE attendancerecord
+            SET distance = CASE
+                WHEN json_extract(metadata_json, '$.source') = 'manual_resolution' THEN 0.0
+                ELSE json_extract(metadata_json, '$.distance')
+            END
+            WHERE metadata_json IS NOT NULL AND json_valid(metadata_json)
+        """))
+
+    # Keep the best-distance row of each group, stamped with the group's first arrival
+    ranked = """
+        SELECT id,
+               ROW_NUMBER() OVER (
+                   PARTITION BY session_id, student_name
+                   ORDER BY distance IS NULL, distance, id
+               ) AS rn,
+               MIN(timestamp) OVER (PARTITION BY session_id, student_name) AS first_seen,
+               COUNT(*) OVER (PARTITION BY session_id, student_name) AS n
+        FROM attendancerecord
+        WHERE session_id IS NOT NULL
+    """
+    conn.execute(text(f"""
+        UPDATE attendancerecord
+        SET timestamp = (SELECT first_seen FROM ({ranked}) AS r WHERE r.id = attendancerecord.id)
+        WHERE id IN (SELECT id FROM ({ranked}) WHERE rn = 1 AND n > 1)
+    """))
+    deleted = conn.execute(text(f"""
+        DELETE FROM attendancerecord WHERE id IN (SELECT id FROM ({ranked}) WHERE rn > 1)
+    """)).rowcount
+    if deleted:
+        print(f"Migration: removed {deleted} duplicate attendance records")
+
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_attendancerecord_session_student "
+        "ON attendancerecord (session_id, student_name)"
+    ))
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str):
+    if column not in _columns(conn, table):
+        print(f"Migration: adding {table}.{column}")
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _migrate_face_evidence(conn: Connection):
+    """
+    Moves recognition metadata blobs into FaceDetection rows and stringified
+    dispute coordinates into typed columns, then drops the old columns.
+    Legacy detections have no evidence frame, so their source_id stays NULL.
+    """
+    if "metadata_json" in _columns(conn, "attendancerecord"):
+        moved = conn.execute(text("""
+            INSERT INTO facedetection (session_id, identity, distance, top, "right", bottom, "left", timestamp)
+            SELECT session_id, student_name, distance,
+                   json_extract(metadata_json, '$.bounding_box[0]'),
+                   json_extract(metadata_json, '$.bounding_box[1]'),
+                   json_extract(metadata_json, '$.bounding_box[2]'),
+                   json_extract(metadata_json, '$.bounding_box[3]'),
+                   timestamp
+            FROM attendancerecord
+            WHERE json_valid(metadata_json)
+              AND json_array_length(metadata_json, '$.bounding_box') = 4
+        """)).rowcount
+        print(f"Migration: moved {moved} recognition metadata blobs to facedetection")
+        conn.execute(text("ALTER TABLE attendancerecord DROP COLUMN metadata_json"))
+
+    for column in ("face_top", "face_right", "face_bottom", "face_left"):
+        _add_column(conn, "dispute", column, "INTEGER")
+    _add_column(conn, "dispute", "face_detection_id", "INTEGER REFERENCES facedetection (id)")
+
+    if "selected_face_coords" in _columns(conn, "dispute"):
+        # Stored as str(list), which is valid JSON for a list of ints
+        conn.execute(text("""
+            UPDATE dispute
+            SET face_top = json_extract(selected_face_coords, '$[0]'),
+                face_right = json_extract(selected_face_coords, '$[1]'),
+                face_bottom = json_extract(selected_face_coords, '$[2]'),
+                face_left = json_extract(selected_face_coords, '$[3]')
+            WHERE json_valid(selected_face_coords)
+              AND json_array_length(selected_face_coords) = 4
+        """))
+        conn.execute(text("ALTER TABLE dispute DROP COLUMN selected_face_coords"))
+
+
+def _migrate_versioned_embeddings(conn: Connection):
+    """
+    Moves unversioned FaceDetection.embedding blobs into FaceEmbedding rows.
+    They were all encoded with face_recognition's defaults, i.e. the default model version.
+    """
+    if "embedding" not in _columns(conn, "facedetection"):
+        return
+    moved = conn.execute(text("""
+        INSERT OR IGNORE INTO faceembedding (detection_id, model_version, embedding)
+        SELECT id, :version, embedding FROM facedetection WHERE embedding IS NOT NULL
+    """), {"version": DEFAULT_MODEL_VERSION}).rowcount
+    print(f"Migration: moved {moved} face embeddings to faceembedding ({DEFAULT_MODEL_VERSION})")
+    conn.execute(text("ALTER TABLE facedetection DROP COLUMN embedding"))
+
+
+def _migrate_token_versions(conn: Connection):
+    _add_column(conn, "user", "token_version", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _migrate_evidence_store(conn: Connection):
+    # Existing evidence files stay where they are, unhashed and never collected
+    _add_column(conn, "attendancesource", "content_hash", "VARCHAR REFERENCES evidenceblob(content_hash)")
+
+
+def _migrate_gallery_fingerprints(conn: Connection):
+    # Rows stored without a fingerprint are re-encoded once on the next gallery build
+    _add_column(conn, "galleryembedding", "image_size", "INTEGER")
+    _add_column(conn, "galleryembedding", "image_mtime_ns", "INTEGER")
+    _add_column(conn, "galleryembedding", "image_sha256", "VARCHAR")
+
+
+def _backfill_session_summaries(conn: Connection):
+    """Creates summary rows for sessions that predate the sessionsummary table."""
+    created = conn.execute(text("""
+        INSERT INTO sessionsummary (
+            session_id, present_count, unknown_count, evidence_count,
+            first_arrival, last_arrival, is_final
+        )
+        SELECT s.id,
+               (SELECT COUNT(*) FROM attendancerecord r WHERE r.session_id = s.id),
+               (SELECT COUNT(*) FROM unknownface u WHERE u.session_id = s.id),
+               (SELECT COUNT(*) FROM attendancesource a WHERE a.session_id = s.id),
+               (SELECT MIN(timestamp) FROM attendancerecord r WHERE r.session_id = s.id),
+               (SELECT MAX(timestamp) FROM attendancerecord r WHERE r.session_id = s.id),
+               NOT s.is_active
+        FROM attendancesession s
+        WHERE s.id NOT IN (SELECT session_id FROM sessionsummary)
+    """)).rowcount
+    if created:
+        print(f"Migration: backfilled {created} session summaries")
+
+
+def _create_missing_indexes(conn: Connection):
+    """create_all skips indexes on tables that already exist; add any declared since."""
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def run_migrations():
+    with engine.begin() as conn:
+        _migrate_attendance_unique_marks(conn)
+        _backfill_session_summaries(conn)
+        _migrate_face_evidence(conn)
+        _migrate_versioned_embeddings(conn)
+        _migrate_token_versions(conn)
+        _migrate_evidence_store(conn)
+        _migrate_gallery_fingerprints(conn)
+        _create_missing_indexes(conn)
@@ -1,9 +1,15 @@
 from datetime import datetime
 from enum import Enum
 from typing import Optional, List
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 class AttendanceSession(SQLModel, table=True):
+    # Keyset pagination index for the session history listing
+    __table_args__ = (
+        Index("ix_attendancesession_active_created", "is_active", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -11,15 +17,49 @@ class AttendanceSession(SQLModel, table=True):
     is_active: bool = Field(default=True)
 
 class AttendanceRecord(SQLModel, table=True):
+    # One row per student per session; marks are upserted against this index
+    __table_args__ = (
+        Index("ux_attendancerecord_session_student", "session_id", "student_name", unique=True),
+        Index("ix_attendancerecord_student_timestamp", "student_name", "timestamp", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     student_name: str = Field(index=True)
     timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
     session_id: Optional[int] = Field(default=None, foreign_key="attendancesession.id", index=True)
-    # Store JSON metadata (bounding box, recognition details)
-    # Using str for SQLite compatibility, or use sa_column for JSON
-    metadata_json: Optional[str] = Field(default=None)
+    # Match distance of the best sighting so far (lower is better, 0.0 = human verified)
+    distance: Optional[float] = None
+
+class SessionSummary(SQLModel, table=True):
+    # Aggregates maintained incrementally by the attendance writer, reconciled at session end
+    session_id: int = Field(foreign_key="attendancesession.id", primary_key=True)
+    present_count: int = Field(default=0)
+    absent_count: Optional[int] = None # Known once the session is finalized against the roster
+    unknown_count: int = Field(default=0)
+    evidence_count: int = Field(default=0)
+    first_arrival: Optional[datetime] = None
+    last_arrival: Optional[datetime] = None
+    absent_json: Optional[str] = None # JSON list of absentees snapshotted at session end
+    is_final: bool = Field(default=False)
+
+class SessionHistoryEntry(SQLModel):
+    id: int
+    name: str
+    created_at: datetime
+    end_time: Optional[datetime] = None
+    is_active: bool
+    present_count: int = 0
+    absent_count: Optional[int] = None
+    unknown_count: int = 0
+    evidence_count: int = 0
+    first_arrival: Optional[datetime] = None
+    last_arrival: Optional[datetime] = None
 
 class UnknownFace(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_unknownface_timestamp", "timestamp", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     session_id: Optional[int] = Field(default=None, foreign_key="attendancesession.id", index=True)
     image_path: str # Path to the cropped face image
@@ -29,11 +69,81 @@ class UnknownFace(SQLModel, table=True):
     resolved_to: Optional[str] = None # Name of student if resolved
 
 class AttendanceSource(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_attendancesource_session_timestamp", "session_id", "timestamp", "id"),
+        Index("ix_attendancesource_media_timestamp", "media_type", "timestamp", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     session_id: Optional[int] = Field(default=None, foreign_key="attendancesession.id", index=True)
     file_path: str # Path to the original full image/video frame
     media_type: str # 'image' or 'video'
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    # Evidence store blob holding the file; None for files saved before the store existed
+    content_hash: Optional[str] = Field(default=None, foreign_key="evidenceblob.content_hash", index=True)
+
+class EvidenceBlob(SQLModel, table=True):
+    # One stored evidence file, shared by every AttendanceSource with the same content
+    content_hash: str = Field(primary_key=True) # sha256 hex digest
+    file_path: str # Relative to the static mount, e.g. evidence/ab/cd/<hash>.jpg
+    size_bytes: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_stored_at: datetime = Field(default_factory=datetime.utcnow) # GC grace period counts from here
+
+class FaceDetection(SQLModel, table=True):
+    # One row per face found in an evidence frame (bounding box in image pixels)
+    __table_args__ = (
+        Index("ix_facedetection_identity_session", "identity", "session_id", "distance"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    source_id: Optional[int] = Field(default=None, foreign_key="attendancesource.id", index=True)
+    session_id: Optional[int] = Field(default=None, foreign_key="attendancesession.id", index=True)
+    identity: Optional[str] = None # Matched student, None for an unknown face
+    distance: Optional[float] = None
+    quality: Optional[float] = None # Sharpness of the face crop, higher is better
+    top: int
+    right: int
+    bottom: int
+    left: int
+    crop_path: Optional[str] = Field(default=None, index=True) # UnknownFace.image_path for unknown faces
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class FaceEmbedding(SQLModel, table=True):
+    # Encoding of a detected face under one embedding model version; versions coexist
+    __table_args__ = (
+        Index("ux_faceembedding_detection_version", "detection_id", "model_version", unique=True),
+        Index("ix_faceembedding_version", "model_version"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    detection_id: int = Field(foreign_key="facedetection.id")
+    model_version: str
+    # float16 bytes; never sent to clients
+    embedding: bytes = Field(exclude=True)
+
+class GalleryEmbedding(SQLModel, table=True):
+    # Enrollment image encodings per model version, so restarts and cutovers skip re-encoding
+    __table_args__ = (
+        Index("ux_galleryembedding_image_version", "model_version", "student_name", "image_path", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    student_name: str = Field(index=True)
+    image_path: str # Relative to the dataset directory
+    model_version: str
+    embedding: bytes = Field(exclude=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Fingerprint of the encoded image file, so a photo replaced under the same name is re-encoded
+    image_size: Optional[int] = None
+    image_mtime_ns: Optional[int] = None
+    image_sha256: Optional[str] = None
+
+class AppSetting(SQLModel, table=True):
+    # Runtime switches that must survive restarts (e.g. the active embedding model)
+    key: str = Field(primary_key=True)
+    value: str
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class DisputeStatus(str, Enum):
     PENDING = "pending"
@@ -41,11 +151,23 @@ class DisputeStatus(str, Enum):
     REJECTED = "rejected"
 
 class Dispute(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_dispute_created", "created_at", "id"),
+        Index("ix_dispute_status_created", "status", "created_at", "id"),
+        Index("ix_dispute_student_created", "student_username", "created_at", "id"),
+        Index("ix_dispute_source", "attendance_source_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     student_username: str = Field(foreign_key="user.username")
     session_id: int = Field(foreign_key="attendancesession.id", index=True)
     attendance_source_id: Optional[int] = Field(default=None, foreign_key="attendancesource.id")
-    selected_face_coords: Optional[str] = None # JSON [top, right, bottom, left]
+    # Face the student pointed at, in image pixels
+    face_top: Optional[int] = None
+    face_right: Optional[int] = None
+    face_bottom: Optional[int] = None
+    face_left: Optional[int] = None
+    face_detection_id: Optional[int] = Field(default=None, foreign_key="facedetection.id", index=True)
     description: str
     status: DisputeStatus = Field(default=DisputeStatus.PENDING, index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -54,7 +176,7 @@ class DisputeCreate(SQLModel):
     session_id: int
     description: str
     attendance_source_id: Optional[int] = None
-    selected_face_coords: Optional[List[int]] = None
+    selected_face_coords: Optional[List[int]] = None # [top, right, bottom, left]
 
 class UserRole(str, Enum):
     ADMIN = "admin"
@@ -71,6 +193,8 @@ class User(SQLModel, table=True):
     sap_id: Optional[str] = None
     # For robust mapping, we might store "face_identity" here
     face_identity: Optional[str] = None 
+    # Bumped on password or role changes; tokens carry the version they were issued at
+    token_version: int = Field(default=0)
 
 class UserCreate(SQLModel):
     username: str
@@ -80,6 +204,10 @@ class UserCreate(SQLModel):
     face_identity: Optional[str] = None 
 
 class AuditLog(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_auditlog_timestamp", "timestamp", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     actor_username: str = Field(foreign_key="user.username")
     action: str
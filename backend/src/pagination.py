@@ -0,0 +1,92 @@
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+from sqlmodel import Session
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+@dataclass
+class PageRequest:
+    limit: int = DEFAULT_PAGE_SIZE
+    cursor: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+
+def page_params(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> PageRequest:
+    """FastAPI dependency for keyset-paginated list endpoints."""
+    if cursor:
+        # Reject bad cursors before the endpoint body (some wrap errors into 500s)
+        decode_cursor(cursor)
+    return PageRequest(limit=limit, cursor=cursor, since=since, until=until)
+
+
+def encode_cursor(timestamp: Optional[datetime], row_id: int) -> str:
+    raw = f"{timestamp.isoformat() if timestamp else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        ts, row_id = raw.split("|")
+        return (datetime.fromisoformat(ts) if ts else None), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(session: Session, statement, page: PageRequest, id_col, ts_col=None) -> Tuple[List, Optional[str]]:
+    """
+    Runs `statement` newest-first on (ts_col, id_col) and returns one page plus the
+    next cursor. With a matching composite index every page is a range scan, so
+    the cost does not grow with how far back the client pages.
+    Without `ts_col` the keyset is the id alone.
+    """
+    if ts_col is not None:
+        if page.since:
+            statement = statement.where(ts_col >= page.since)
+        if page.until:
+            statement = statement.where(ts_col < page.until)
+
+    if page.cursor:
+        cursor_ts, cursor_id = decode_cursor(page.cursor)
+        if ts_col is not None and cursor_ts is not None:
+            statement = statement.where(or_(
+                ts_col < cursor_ts,
+                and_(ts_col == cursor_ts, id_col < cursor_id)
+            ))
+        else:
+            statement = statement.where(id_col < cursor_id)
+
+    order = [ts_col.desc(), id_col.desc()] if ts_col is not None else [id_col.desc()]
+    # Fetch one extra row to know whether another page exists
+    rows = session.exec(statement.order_by(*order).limit(page.limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        if hasattr(last, "_mapping"):
+            # Multi-entity select: the keyset columns belong to the first entity
+            last = last[0]
+        last_ts = getattr(last, ts_col.key) if ts_col is not None else None
+        next_cursor = encode_cursor(last_ts, getattr(last, id_col.key))
+    return rows, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
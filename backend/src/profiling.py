@@ -0,0 +1,309 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+from starlette.concurrency import run_in_threadpool
+from .app_settings import get_setting, set_setting
+from . import metrics
+
+# Admins opt a single request in with this header, or with ?profile=1
+PROFILE_HEADER = "X-Profile-Request"
+PROFILE_QUERY = "profile"
+# Response header naming the stored profile
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILING_SETTING = "request_profiling"
+TOP_FUNCTIONS = 30
+
+
+@dataclass
+class ProfilingSettings:
+    sample_rate: float = 0.0  # share of matching requests profiled without the header
+    path_prefix: str = "/recognize"  # only sampled on these paths
+
+    @classmethod
+    def load(cls) -> "ProfilingSettings":
+        stored = get_setting(PROFILING_SETTING)
+        if not stored:
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in json.loads(stored).items() if k in known})
+
+    def save(self):
+        set_setting(PROFILING_SETTING, json.dumps(asdict(self)))
+
+
+class RequestProfile:
+    """One profiled request: cProfile data per profiled section plus its stage timings."""
+
+    def __init__(self):
+        self.id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def section(self):
+        """Profiles the block on the current thread (cProfile only sees the thread that enabled it)."""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def record_stage(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage].append(round(seconds * 1000, 3))
+
+    def stats(self) -> Optional[pstats.Stats]:
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0], stream=io.StringIO())
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def _record_stage(stage: str, seconds: float):
+    profile = _current.get()
+    if profile is not None:
+        profile.record_stage(stage, seconds)
+
+
+# Stage timings land in the profile of the request they belong to
+metrics.stage_observers.append(_record_stage)
+
+
+def section():
+    """
+    Profiles worker-thread work of the current request, if it is being
+    profiled; a no-op otherwise. Wrap the code handed to run_in_threadpool.
+    """
+    profile = _current.get()
+    return profile.section() if profile is not None else nullcontext()
+
+
+class RequestProfiler:
+    """
+    Runs opted-in requests under cProfile and keeps the newest `keep`
+    profiles under `directory`: <id>.pstats (for snakeviz, gprof2dot or
+    flameprof) and <id>.json with the request, its stage timings and the
+    top functions. A request is profiled when an admin sends PROFILE_HEADER
+    or when it is sampled (`ProfilingSettings`). Unprofiled requests pay a
+    header lookup and, with sampling on, one random draw.
+
+    The event-loop part of a request is profiled for its whole duration, so
+    coroutines of concurrent requests can show up in it; worker-thread work is
+    profiled where it is wrapped in `section()`. One request is profiled at a
+    time, as cProfile cannot nest on a thread.
+    """
+
+    def __init__(self, directory: str = "profiles", keep: int = 50):
+        self.directory = directory
+        self.keep = keep
+        self._settings: Optional[ProfilingSettings] = None
+        self._busy = threading.Lock()
+
+    @property
+    def settings(self) -> ProfilingSettings:
+        if self._settings is None:
+            self._settings = ProfilingSettings.load()
+        return self._settings
+
+    def update_settings(self, settings: ProfilingSettings):
+        settings.save()
+        self._settings = settings
+
+    def sampled(self, path: str) -> bool:
+        settings = self.settings
+        return settings.sample_rate > 0 and path.startswith(settings.path_prefix) \
+            and random.random() < settings.sample_rate
+
+    @contextmanager
+    def profile(self):
+        """Yields the RequestProfile, or None when another request is already being profiled."""
+        if not self._busy.acquire(blocking=False):
+            yield None
+            return
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with profile.section():
+                yield profile
+        finally:
+            _current.reset(token)
+            self._busy.release()
+
+    def save(self, profile: RequestProfile, request_info: Dict) -> Dict:
+        os.makedirs(self.directory, exist_ok=True)
+        stats = profile.stats()
+        top = []
+        if stats is not None:
+            stats.dump_stats(self._path(profile.id, ".pstats"))
+            stats.sort_stats(pstats.SortKey.CUMULATIVE)
+            for func in stats.fcn_list[:TOP_FUNCTIONS]:
+                calls, primitive, total, cumulative, _ = stats.stats[func]
+                top.append({
+                    "function": pstats.func_std_string(func),
+                    "calls": calls,
+                    "total_ms": round(total * 1000, 3),
+                    "cumulative_ms": round(cumulative * 1000, 3),
+                })
+        record = {
+            "id": profile.id,
+            **request_info,
+            "stages_ms": dict(profile.stages),
+            "has_pstats": stats is not None,
+            "top_functions": top,
+        }
+        with open(self._path(profile.id, ".json"), "w") as f:
+            json.dump(record, f, indent=2)
+        self._prune()
+        return record
+
+    def list(self) -> List[Dict]:
+        """Newest first, without the per-function detail."""
+        records = []
+        for name in sorted(self._files(".json"), reverse=True):
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            record.pop("top_functions", None)
+            records.append(record)
+        return records
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        path = self._path(profile_id, ".json")
+        if not path or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def pstats_path(self, profile_id: str) -> Optional[str]:
+        path = self._path(profile_id, ".pstats")
+        return path if path and os.path.exists(path) else None
+
+    def _path(self, profile_id: str, ext: str) -> Optional[str]:
+        # Ids come from URLs: never let one leave the directory
+        if not profile_id or os.path.basename(profile_id) != profile_id or profile_id.startswith("."):
+            return None
+        return os.path.join(self.directory, profile_id + ext)
+
+    def _files(self, ext: str) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [name for name in os.listdir(self.directory) if name.endswith(ext)]
+
+    def _prune(self):
+        # Ids start with their timestamp, so name order is age order
+        for name in sorted(self._files(".json"), reverse=True)[self.keep:]:
+            profile_id = name[:-len(".json")]
+            for ext in (".json", ".pstats"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + ext))
+                except FileNotFoundError:
+                    pass
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware in front of the app. A request without the opt-in
+    header or query parameter, and not sampled, is passed straight through:
+    no extra task, no response re-streaming. Opted-in requests are only
+    profiled if their bearer token belongs to an admin; `resolve_admin`
+    (token -> admin username or None) hits the database, so it runs in the
+    threadpool. The profile is stored once the response has been sent.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler, resolve_admin: Callable[[str], Optional[str]]):
+        self.app = app
+        self.profiler = profiler
+        self.resolve_admin = resolve_admin
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        reason = None
+        token = self._opt_in_token(scope)
+        if token is not None:
+            admin = await run_in_threadpool(self.resolve_admin, token) if token else None
+            if admin:
+                reason = f"requested by {admin}"
+        elif self.profiler.sampled(scope["path"]):
+            reason = "sampled"
+        if not reason:
+            return await self.app(scope, receive, send)
+
+        with self.profiler.profile() as profile:
+            if profile is None:
+                # Another request is being profiled
+                return await self.app(scope, receive, send)
+            status = {}
+
+            async def send_with_profile_id(message):
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                    message = dict(message, headers=list(message.get("headers", [])) + [
+                        (PROFILE_ID_HEADER.lower().encode(), profile.id.encode())
+                    ])
+                await send(message)
+
+            started_at = datetime.utcnow()
+            started = time.perf_counter()
+            await self.app(scope, receive, send_with_profile_id)
+            duration_ms = round((time.perf_counter() - started) * 1000, 3)
+
+        await run_in_threadpool(self.profiler.save, profile, {
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "reason": reason,
+            "status_code": status.get("code"),
+            "started_at": started_at.isoformat(),
+            "duration_ms": duration_ms,
+        })
+
+    @staticmethod
+    def _opt_in_token(scope) -> Optional[str]:
+        """None if the request did not opt in, else its bearer token ("" without one)."""
+        requested = False
+        authorization = b""
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.lower().encode():
+                requested = bool(value)
+            elif name == b"authorization":
+                authorization = value
+        query = scope.get("query_string", b"")
+        if not requested and PROFILE_QUERY.encode() in query:
+            requested = parse_qs(query.decode("latin-1")).get(PROFILE_QUERY, ["0"])[0] not in ("", "0", "false")
+        if not requested:
+            return None
+        scheme, _, token = authorization.decode("latin-1").partition(" ")
+        return token if scheme.lower() == "bearer" else ""
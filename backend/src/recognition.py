@@ -1,83 +1,141 @@
-import face_recognition
 import numpy as np
 from typing import List, Dict, Optional, Tuple
 from .embedding_loader import EmbeddingLoader
+from . import metrics
+
+DETECTIONS = metrics.counter(
+    "recognition_detections_total", "Face detection passes, by pass (first, or the upsampled retry).", ["attempt"]
+)
+FACES_PER_FRAME = metrics.histogram(
+    "recognition_faces_per_frame", "Faces found per recognized frame.", buckets=(0, 1, 2, 3, 5, 8, 13, 21)
+)
+FACES = metrics.counter("recognition_faces_total", "Recognized faces, known or unknown.", ["result"])
+
+def face_sharpness(image: np.ndarray, box: Tuple[int, int, int, int]) -> float:
+    """Variance of the Laplacian over the face crop; blurry or tiny faces score low."""
+    top, right, bottom, left = box
+    crop = image[max(0, top):bottom, max(0, left):right]
+    if crop.shape[0] < 3 or crop.shape[1] < 3:
+        return 0.0
+    gray = crop.mean(axis=2) if crop.ndim == 3 else crop.astype(float)
+    laplacian = (
+        4 * gray[1:-1, 1:-1]
+        - gray[:-2, 1:-1] - gray[2:, 1:-1]
+        - gray[1:-1, :-2] - gray[1:-1, 2:]
+    )
+    return float(laplacian.var())
+
+def match_face(
+    known_encodings: List[np.ndarray],
+    known_names: List[str],
+    face_encoding: np.ndarray,
+    tolerance: float = 0.6
+) -> Tuple[str, float]:
+    """
+    Nearest known face within `tolerance`: (name, distance), or ("Unknown", distance
+    to the nearest face) for debugging. ("Unknown", 0.0) with an empty gallery.
+    """
+    if len(known_encodings) == 0:
+        return "Unknown", 0.0
+    import face_recognition
+    # Calculate distances to all known faces
+    face_distances = face_recognition.face_distance(known_encodings, face_encoding)
+    best_match_index = np.argmin(face_distances)
+    distance = float(face_distances[best_match_index])
+    if distance <= tolerance:
+        return known_names[best_match_index], distance
+    return "Unknown", distance
 
 class RecognitionService:
     def __init__(self, embedding_loader: EmbeddingLoader):
         self.embedding_loader = embedding_loader
 
+    def load_models(self):
+        """
+        Imports face_recognition, which loads the dlib models (seconds). It is
+        imported lazily so CLI tools and startup don't pay for it; the server
+        calls this during warm-up so the first request doesn't either.
+        """
+        import face_recognition  # noqa: F401
+
     def detect_only(self, image_file) -> List[Tuple[int, int, int, int]]:
         """
         Detects faces and returns bounding boxes.
         Returns: List of (top, right, bottom, left) tuples.
         """
+        import face_recognition
+
         image = image_file
         if not isinstance(image, np.ndarray):
             image = face_recognition.load_image_file(image_file)
         
         # Detect face locations (using HOG by default for speed/CPU)
         # First pass: Default upsampling (1)
-        face_locations = face_recognition.face_locations(image)
+        with metrics.stage_timer("detect"):
+            face_locations = face_recognition.face_locations(image)
+        DETECTIONS.inc(attempt="first")
         
         # Second pass: If no faces found, try upsampling for smaller/blurry faces
         if not face_locations:
              # print("No faces found in first pass. Retrying with upsample=2...") 
              # (Commented print to reduce log spam on live preview)
-             face_locations = face_recognition.face_locations(image, number_of_times_to_upsample=2)
+             with metrics.stage_timer("detect_upsample"):
+                 face_locations = face_recognition.face_locations(image, number_of_times_to_upsample=2)
+             DETECTIONS.inc(attempt="upsample")
 
         return face_locations
 
-    def recognize_image(self, image_file, tolerance: float = 0.6) -> List[Dict]:
+    def recognize_image(self, image_file, tolerance: float = 0.6, with_encodings: bool = False) -> List[Dict]:
         """
         Detects faces in an image and matches them against known students.
         
         Args:
             image_file: numpy array or file-like object compatible with face_recognition.load_image_file
             tolerance: Euclidean distance threshold for matching. Lower is stricter.
+            with_encodings: Also return each face's 128-d 'encoding' (not JSON serializable)
+                and its 'model_version'.
             
         Returns:
-            List of dictionaries containing 'name', 'bounding_box', and 'distance'.
+            List of dictionaries containing 'name', 'bounding_box', 'distance' and 'quality'.
         """
         # Load image (if it's a file path or file-like object)
         image = image_file
         if not isinstance(image, np.ndarray):
+            import face_recognition
             image = face_recognition.load_image_file(image_file)
         
         face_locations = self.detect_only(image)
+        FACES_PER_FRAME.observe(len(face_locations))
         
         if not face_locations:
             return []
 
-        # Compute encodings
-        face_encodings = face_recognition.face_encodings(image, known_face_locations=face_locations)
+        # Encode with the gallery's model version; a concurrent cutover can't mix the two
+        model, gallery = self.embedding_loader.snapshot()
+        with metrics.stage_timer("encode"):
+            face_encodings = model.encode(image, face_locations)
 
-        known_encodings = self.embedding_loader.get_known_face_encodings()
-        known_names = self.embedding_loader.get_known_face_names()
+        # Flattening the gallery is per frame and grows with it, so it is its own stage
+        with metrics.stage_timer("gallery"):
+            known_encodings = self.embedding_loader.get_known_face_encodings(gallery)
+            known_names = self.embedding_loader.get_known_face_names(gallery)
 
         results = []
 
         for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            name = "Unknown"
-            distance = 0.0
-            
-            if known_encodings:
-                # Calculate distances to all known faces
-                face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-                
-                # Find the best match
-                best_match_index = np.argmin(face_distances)
-                if face_distances[best_match_index] <= tolerance:
-                    name = known_names[best_match_index]
-                    distance = float(face_distances[best_match_index])
-                else:
-                    # Logic for unknown: we take the min distance even if it's unknown, for debugging
-                    distance = float(face_distances[best_match_index])
+            with metrics.stage_timer("match"):
+                name, distance = match_face(known_encodings, known_names, face_encoding, tolerance)
+            FACES.inc(result="unknown" if name == "Unknown" else "known")
 
-            results.append({
+            result = {
                 "name": name,
                 "bounding_box": [top, right, bottom, left], # CSS order: top, right, bottom, left
-                "distance": distance
-            })
+                "distance": distance,
+                "quality": face_sharpness(image, (top, right, bottom, left))
+            }
+            if with_encodings:
+                result["encoding"] = face_encoding
+                result["model_version"] = model.version
+            results.append(result)
 
         return results
@@ -0,0 +1,152 @@
+from datetime import datetime
+from typing import Dict
+import numpy as np
+from sqlalchemy import update
+from sqlmodel import Session, select
+from .models import AttendanceRecord, FaceDetection, FaceEmbedding, UnknownFace
+from .database import engine
+from .embedding_loader import EmbeddingLoader
+from .attendance import AttendanceService
+from .attendance_writer import upsert_attendance
+from .embedding_models import decode_embeddings
+from .session_summary import bump_summary, refinalize_if_final
+from . import events
+from .events import event_bus
+
+
+def pairwise_distances(probes: np.ndarray, gallery: np.ndarray) -> np.ndarray:
+    """Euclidean distances between every probe and gallery row, shape (probes, gallery)."""
+    squared = (
+        np.einsum("ij,ij->i", probes, probes)[:, None]
+        + np.einsum("ij,ij->i", gallery, gallery)[None, :]
+        - 2.0 * probes @ gallery.T
+    )
+    return np.sqrt(np.maximum(squared, 0.0))
+
+
+class ReidentificationService:
+    """
+    Re-matches the stored face embeddings of past sessions against the current
+    gallery, e.g. after enrolling a student, fixing a mislabeled identity or
+    changing the tolerance. No evidence file is decoded again.
+    """
+
+    def __init__(self, embedding_loader: EmbeddingLoader, attendance_service: AttendanceService):
+        self.embedding_loader = embedding_loader
+        self.attendance_service = attendance_service
+
+    def reidentify_session(self, session_id: int, tolerance: float = 0.6, apply: bool = False) -> Dict:
+        """
+        Recomputes the identity of every stored face in the session.
+        With `apply`, changed detections are updated, newly matched students are
+        marked present and unknown crops that now match are resolved. Existing
+        marks are never removed; marks no longer backed by any detection are
+        only reported, for a human to review. Human-verified detections
+        (distance 0.0) keep their identity.
+        """
+        # Stored faces are compared under the gallery's own model version only
+        model, student_embeddings = self.embedding_loader.snapshot()
+        known = self.embedding_loader.get_known_face_encodings(student_embeddings)
+        gallery = np.asarray(known, dtype=np.float32).reshape(len(known), -1)
+        names = np.array(self.embedding_loader.get_known_face_names(student_embeddings), dtype=object)
+
+        with Session(engine) as session:
+            rows = session.exec(select(
+                FaceDetection.id, FaceDetection.identity, FaceDetection.distance,
+                FaceDetection.crop_path, FaceDetection.timestamp, FaceEmbedding.embedding
+            ).join(FaceEmbedding, FaceEmbedding.detection_id == FaceDetection.id).where(
+                FaceDetection.session_id == session_id,
+                FaceEmbedding.model_version == model.version
+            )).all()
+
+            probes = decode_embeddings([r.embedding for r in rows])
+            if len(rows) and len(gallery):
+                distances = pairwise_distances(probes, gallery)
+                best = distances.argmin(axis=1)
+                best_distance = distances[np.arange(len(rows)), best]
+                matched = best_distance <= tolerance
+                new_identities = np.where(matched, names[best], None)
+            else:
+                best_distance = np.full(len(rows), np.nan)
+                new_identities = np.full(len(rows), None, dtype=object)
+
+            changes = []
+            for row, identity, distance in zip(rows, new_identities, best_distance):
+                if row.distance == 0.0 or identity == row.identity:
+                    continue
+                changes.append({
+                    "detection_id": row.id,
+                    "old_identity": row.identity,
+                    "new_identity": identity,
+                    "old_distance": row.distance,
+                    "new_distance": None if np.isnan(distance) else float(distance),
+                    "crop_path": row.crop_path,
+                })
+
+            # Best distance and first sighting per student supported by the recomputed detections
+            support: Dict[str, float] = {}
+            first_seen: Dict[str, datetime] = {}
+            for row, identity, distance in zip(rows, new_identities, best_distance):
+                if row.distance == 0.0:
+                    identity, distance = row.identity, 0.0
+                if identity is not None:
+                    support[identity] = min(support.get(identity, float(distance)), float(distance))
+                    first_seen[identity] = min(first_seen.get(identity, row.timestamp), row.timestamp)
+
+            present = set(session.exec(select(AttendanceRecord.student_name).where(
+                AttendanceRecord.session_id == session_id
+            )).all())
+            newly_present = sorted(set(support) - present)
+            # Only judge marks that came from faces with stored embeddings
+            previously_detected = {r.identity for r in rows if r.identity}
+            unsupported = sorted((present & previously_detected) - set(support))
+
+            report = {
+                "session_id": session_id,
+                "model_version": model.version,
+                "faces": len(rows),
+                "tolerance": tolerance,
+                "changed": changes,
+                "newly_present": newly_present,
+                "unsupported": unsupported,
+                "applied": apply,
+            }
+            if not apply or not (changes or newly_present):
+                return report
+
+            if changes:
+                # ORM bulk UPDATE by primary key: one executemany for all changed faces
+                session.execute(update(FaceDetection), [
+                    {"id": c["detection_id"], "identity": c["new_identity"], "distance": c["new_distance"]}
+                    for c in changes
+                ])
+                for change in changes:
+                    if change["crop_path"] and change["new_identity"]:
+                        session.exec(
+                            update(UnknownFace)
+                            .where(UnknownFace.image_path == change["crop_path"])
+                            .values(is_resolved=True, resolved_to=change["new_identity"])
+                        )
+
+            marked = []
+            for student_name in newly_present:
+                record, inserted = upsert_attendance(
+                    session, student_name, session_id,
+                    distance=support[student_name], timestamp=first_seen[student_name]
+                )
+                if inserted:
+                    marked.append(record)
+
+            if not refinalize_if_final(session, session_id):
+                for record in marked:
+                    bump_summary(
+                        session, session_id, present=1,
+                        first_arrival=record.timestamp, last_arrival=record.timestamp
+                    )
+            session.commit()
+
+        # Written outside the writer, so the cached marked-set must be reloaded
+        self.attendance_service.state.invalidate()
+        for record in marked:
+            event_bus.publish(events.ATTENDANCE_MARKED, record)
+        return report
@@ -0,0 +1,305 @@
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Set
+from sqlalchemy import delete, update
+from sqlmodel import Session, select
+from .models import AttendanceSource, AuditLog, Dispute, EvidenceBlob, FaceDetection, FaceEmbedding, UnknownFace
+from .database import engine
+from .app_settings import get_setting, set_setting
+from .evidence_store import EvidenceStore
+from .media_serving import DerivativeService, media_key
+
+RETENTION_SETTING = "retention_policy"
+
+
+@dataclass
+class RetentionPolicy:
+    """Age in days after which each kind of data is deleted; None keeps it forever."""
+    evidence_image_days: Optional[int] = 180
+    evidence_video_days: Optional[int] = 30
+    unknown_crop_days: Optional[int] = 30
+    audit_log_days: Optional[int] = 365
+    # Files on disk with no DB row must be at least this old (covers writes in flight)
+    orphan_grace_hours: float = 6.0
+
+    @classmethod
+    def load(cls) -> "RetentionPolicy":
+        stored = get_setting(RETENTION_SETTING)
+        if not stored:
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in json.loads(stored).items() if k in known})
+
+    def save(self):
+        set_setting(RETENTION_SETTING, json.dumps(asdict(self)))
+
+
+class RetentionEngine:
+    """
+    Deletes expired records and their media in bounded chunks. Each chunk is
+    one short transaction, and the engine pauses between chunks, so the
+    attendance writer never waits long for the SQLite write lock. Rows are
+    deleted before their files. A crash in between leaves orphaned files, which
+    the orphan sweep removes later. It never leaves rows that point at missing
+    files.
+
+    Evidence sources referenced by a dispute are kept. Content-addressed
+    evidence files are removed by the evidence store's GC once no source
+    references them. Legacy (unhashed) files are removed directly.
+    """
+
+    def __init__(
+        self,
+        evidence_store: EvidenceStore,
+        derivatives: DerivativeService,
+        chunk_size: int = 500,
+        pause_seconds: float = 0.05,
+        static_dir: str = "static"
+    ):
+        self.evidence_store = evidence_store
+        self.derivatives = derivatives
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+        self.static_dir = static_dir
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_report: Optional[Dict] = None
+
+    # Scheduling
+
+    def start_schedule(self, interval_seconds: float):
+        """Runs every policy every `interval_seconds` in a background thread (first run after one interval)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._schedule_loop, args=(interval_seconds,), name="retention", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _schedule_loop(self, interval_seconds: float):
+        while not self._stop.wait(interval_seconds):
+            try:
+                self.run()
+            except Exception as e:
+                print(f"Retention run failed: {e}")
+
+    def trigger(self) -> bool:
+        """Starts a full run in the background; False if one is already running."""
+        if self._run_lock.locked():
+            return False
+        threading.Thread(target=self.run, name="retention-manual", daemon=True).start()
+        return True
+
+    def is_running(self) -> bool:
+        return self._run_lock.locked()
+
+    def run(self, policy: Optional[RetentionPolicy] = None) -> Dict:
+        """Applies every policy, then collects unreferenced evidence and sweeps orphans."""
+        if not self._run_lock.acquire(blocking=False):
+            return {"status": "already_running"}
+        try:
+            policy = policy or RetentionPolicy.load()
+            started = datetime.utcnow()
+            report = {"started_at": started.isoformat()}
+            report["unknown_crops"] = self.expire_unknown_crops(policy.unknown_crop_days)
+            report["evidence_images"] = self.expire_sources("image", policy.evidence_image_days)
+            report["evidence_videos"] = self.expire_sources("video", policy.evidence_video_days)
+            report["audit_logs"] = self.expire_audit_logs(policy.audit_log_days)
+            report["evidence_gc"] = self.evidence_store.collect_garbage(on_delete=self.derivatives.remove)
+            report["orphans"] = self.sweep_orphans(policy.orphan_grace_hours)
+            report["seconds"] = round((datetime.utcnow() - started).total_seconds(), 2)
+            self.last_report = report
+            print(f"Retention run finished: {report}")
+            return report
+        finally:
+            self._run_lock.release()
+
+    # Policies
+
+    def _pause(self) -> bool:
+        """Yields the write lock between chunks; True if asked to stop."""
+        return self._stop.wait(self.pause_seconds)
+
+    def _remove_file(self, relative_path: str) -> bool:
+        try:
+            os.remove(os.path.join(self.static_dir, relative_path))
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"Retention: failed to delete {relative_path}: {e}")
+            return False
+
+    def expire_unknown_crops(self, days: Optional[int]) -> Dict:
+        """Deletes UnknownFace rows older than `days` and their crops; detections keep their row, minus the crop."""
+        if days is None:
+            return {"skipped": True}
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        records, files = 0, 0
+        while True:
+            with Session(engine) as session:
+                rows = session.exec(
+                    select(UnknownFace.id, UnknownFace.image_path)
+                    .where(UnknownFace.timestamp < cutoff)
+                    .order_by(UnknownFace.timestamp, UnknownFace.id)
+                    .limit(self.chunk_size)
+                ).all()
+                if not rows:
+                    break
+                paths = [path for _, path in rows if path]
+                session.exec(delete(UnknownFace).where(UnknownFace.id.in_([row_id for row_id, _ in rows])))
+                if paths:
+                    session.exec(update(FaceDetection).where(FaceDetection.crop_path.in_(paths)).values(crop_path=None))
+                session.commit()
+
+            records += len(rows)
+            for path in paths:
+                files += self._remove_file(path)
+                self.derivatives.remove(media_key(None, path))
+            if self._pause():
+                break
+        return {"records_deleted": records, "files_deleted": files}
+
+    def expire_sources(self, media_type: str, days: Optional[int]) -> Dict:
+        """
+        Deletes evidence sources older than `days` with their detections and
+        embeddings (disputed sources are kept).
+        """
+        if days is None:
+            return {"skipped": True}
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        disputed = select(Dispute.attendance_source_id).where(Dispute.attendance_source_id.is_not(None))
+        records, files, last_id = 0, 0, 0
+        while True:
+            with Session(engine) as session:
+                rows = session.exec(
+                    select(AttendanceSource.id, AttendanceSource.file_path, AttendanceSource.content_hash)
+                    .where(
+                        AttendanceSource.media_type == media_type,
+                        AttendanceSource.timestamp < cutoff,
+                        AttendanceSource.id > last_id,
+                        AttendanceSource.id.not_in(disputed)
+                    )
+                    .order_by(AttendanceSource.id)
+                    .limit(self.chunk_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                source_ids = [row[0] for row in rows]
+                detection_ids = select(FaceDetection.id).where(FaceDetection.source_id.in_(source_ids))
+                session.exec(delete(FaceEmbedding).where(FaceEmbedding.detection_id.in_(detection_ids)))
+                session.exec(delete(FaceDetection).where(FaceDetection.source_id.in_(source_ids)))
+                session.exec(delete(AttendanceSource).where(AttendanceSource.id.in_(source_ids)))
+                session.commit()
+
+            records += len(rows)
+            for _, file_path, content_hash in rows:
+                # Stored blobs go through the evidence store's GC (another source may share them)
+                if content_hash is None:
+                    files += self._remove_file(file_path)
+                    self.derivatives.remove(media_key(None, file_path))
+            if self._pause():
+                break
+        return {"records_deleted": records, "legacy_files_deleted": files}
+
+    def expire_audit_logs(self, days: Optional[int]) -> Dict:
+        if days is None:
+            return {"skipped": True}
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        records = 0
+        while True:
+            with Session(engine) as session:
+                ids = session.exec(
+                    select(AuditLog.id).where(AuditLog.timestamp < cutoff)
+                    .order_by(AuditLog.timestamp, AuditLog.id).limit(self.chunk_size)
+                ).all()
+                if not ids:
+                    break
+                session.exec(delete(AuditLog).where(AuditLog.id.in_(ids)))
+                session.commit()
+            records += len(ids)
+            if self._pause():
+                break
+        return {"records_deleted": records}
+
+    # Orphans
+
+    def _old_files(self, directory: str, grace: timedelta) -> Iterator[str]:
+        """Files under static/<directory> older than `grace`, as paths relative to static/."""
+        cutoff = time.time() - grace.total_seconds()
+        root = os.path.join(self.static_dir, directory)
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                full_path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(full_path) >= cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                yield os.path.relpath(full_path, self.static_dir).replace(os.sep, "/")
+
+    def _chunks(self, paths: Iterator[str]) -> Iterator[List[str]]:
+        chunk = []
+        for path in paths:
+            chunk.append(path)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _referenced_evidence(self, session: Session, paths: List[str]) -> Set[str]:
+        return set(session.exec(select(EvidenceBlob.file_path).where(EvidenceBlob.file_path.in_(paths))).all()) | \
+            set(session.exec(select(AttendanceSource.file_path).where(AttendanceSource.file_path.in_(paths))).all())
+
+    def _referenced_crops(self, session: Session, paths: List[str]) -> Set[str]:
+        return set(session.exec(select(UnknownFace.image_path).where(UnknownFace.image_path.in_(paths))).all()) | \
+            set(session.exec(select(FaceDetection.crop_path).where(FaceDetection.crop_path.in_(paths))).all())
+
+    def sweep_orphans(self, grace_hours: float) -> Dict:
+        """
+        Deletes files under static/evidence and static/unknowns that no row
+        references, checked against the DB one chunk at a time. Derivatives are
+        a cache: old ones are kept only for stored blobs, and thumbnails of
+        legacy files and crops are simply re-rendered when requested again.
+        """
+        grace = timedelta(hours=grace_hours)
+        removed = {"evidence": 0, "unknowns": 0, "derivatives": 0}
+
+        checks = {
+            "evidence": self._referenced_evidence,
+            "unknowns": self._referenced_crops,
+        }
+        for directory, referenced in checks.items():
+            for chunk in self._chunks(self._old_files(directory, grace)):
+                with Session(engine) as session:
+                    # Leftover temp files of interrupted writes are never referenced either
+                    keep = referenced(session, chunk)
+                for path in chunk:
+                    if path not in keep and self._remove_file(path):
+                        removed[directory] += 1
+                if self._pause():
+                    return removed
+
+        for chunk in self._chunks(self._old_files(self.derivatives.prefix, grace)):
+            keys = {path: os.path.basename(path).split("-", 1)[0] for path in chunk}
+            with Session(engine) as session:
+                live = set(session.exec(select(EvidenceBlob.content_hash).where(
+                    EvidenceBlob.content_hash.in_(list(set(keys.values())))
+                )).all())
+            for path, key in keys.items():
+                if key not in live and self._remove_file(path):
+                    removed["derivatives"] += 1
+            if self._pause():
+                break
+        return removed
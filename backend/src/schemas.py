@@ -1,6 +1,27 @@
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from .models import UserRole
 
 class MapUserRequest(BaseModel):
     username: str
     face_identity: str
+
+class UpdateRoleRequest(BaseModel):
+    role: UserRole
+
+class ChangePasswordRequest(BaseModel):
+    current_password: str
+    new_password: str
+
+class RetentionPolicyRequest(BaseModel):
+    # Days to keep each kind of data; null keeps it forever
+    evidence_image_days: Optional[int] = Field(default=None, ge=1)
+    evidence_video_days: Optional[int] = Field(default=None, ge=1)
+    unknown_crop_days: Optional[int] = Field(default=None, ge=1)
+    audit_log_days: Optional[int] = Field(default=None, ge=1)
+    orphan_grace_hours: float = Field(default=6.0, ge=1.0)
+
+class ProfilingSettingsRequest(BaseModel):
+    # Share of requests under path_prefix profiled without the opt-in header
+    sample_rate: float = Field(default=0.0, ge=0.0, le=1.0)
+    path_prefix: str = "/recognize"
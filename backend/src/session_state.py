@@ -0,0 +1,82 @@
+import threading
+from typing import Dict, FrozenSet, Optional
+from sqlmodel import Session, select
+from .models import AttendanceRecord, AttendanceSession
+from .database import engine
+
+
+class SessionStateCache:
+    """
+    In-process cache of the active session and the students already marked in it,
+    together with the best (lowest) match distance recorded for each of them.
+
+    The state is loaded lazily from the DB on first use and after every
+    invalidation. All reads and updates go through a single lock, and loads run
+    while holding it, so an invalidation can never be overwritten by a load
+    that started before the change it reflects was committed.
+    Note: the cache is per process; run the API with a single worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._active: Optional[AttendanceSession] = None
+        self._marked: Dict[str, Optional[float]] = {}
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with Session(engine) as session:
+            active = session.exec(select(AttendanceSession).where(AttendanceSession.is_active == True)).first()
+            marked: Dict[str, Optional[float]] = {}
+            if active:
+                marked = dict(session.exec(select(AttendanceRecord.student_name, AttendanceRecord.distance).where(
+                    AttendanceRecord.session_id == active.id
+                )).all())
+        self._active = active
+        self._marked = marked
+        self._loaded = True
+
+    def get_active(self) -> Optional[AttendanceSession]:
+        with self._lock:
+            self._ensure_loaded()
+            return self._active
+
+    def set_active(self, active: Optional[AttendanceSession]):
+        """Primes the cache after a session was started (fresh, nobody marked) or ended."""
+        with self._lock:
+            self._active = active
+            self._marked = {}
+            self._loaded = True
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+            self._active = None
+            self._marked = {}
+
+    def marked_students(self, session_id: int) -> Optional[FrozenSet[str]]:
+        """Returns the marked set if `session_id` is the active session, else None (not cached)."""
+        with self._lock:
+            self._ensure_loaded()
+            if not self._active or self._active.id != session_id:
+                return None
+            return frozenset(self._marked)
+
+    def try_mark(self, session_id: int, student_name: str, distance: Optional[float] = None) -> bool:
+        """
+        Claims `student_name` in the active session.
+        Returns False if the student is already marked there with an equal or
+        better distance, True otherwise (including for sessions other than the
+        active one, which are not cached).
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if not self._active or self._active.id != session_id:
+                return True
+            if student_name in self._marked:
+                best = self._marked[student_name]
+                if distance is None or (best is not None and best <= distance):
+                    return False
+            self._marked[student_name] = distance
+            return True
@@ -0,0 +1,100 @@
+import json
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import case, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from .models import AttendanceRecord, AttendanceSource, SessionSummary, UnknownFace
+
+
+def bump_summary(
+    session: Session,
+    session_id: int,
+    present: int = 0,
+    unknown: int = 0,
+    evidence: int = 0,
+    first_arrival: Optional[datetime] = None,
+    last_arrival: Optional[datetime] = None
+):
+    """Applies counter deltas to a session's summary row in one upsert (creating it if needed)."""
+    stmt = sqlite_insert(SessionSummary).values(
+        session_id=session_id,
+        present_count=present,
+        unknown_count=unknown,
+        evidence_count=evidence,
+        first_arrival=first_arrival,
+        last_arrival=last_arrival,
+        is_final=False
+    )
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SessionSummary.session_id],
+        set_={
+            "present_count": SessionSummary.present_count + excluded.present_count,
+            "unknown_count": SessionSummary.unknown_count + excluded.unknown_count,
+            "evidence_count": SessionSummary.evidence_count + excluded.evidence_count,
+            "first_arrival": case(
+                (SessionSummary.first_arrival.is_(None), excluded.first_arrival),
+                (excluded.first_arrival < SessionSummary.first_arrival, excluded.first_arrival),
+                else_=SessionSummary.first_arrival
+            ),
+            "last_arrival": case(
+                (SessionSummary.last_arrival.is_(None), excluded.last_arrival),
+                (excluded.last_arrival > SessionSummary.last_arrival, excluded.last_arrival),
+                else_=SessionSummary.last_arrival
+            ),
+        }
+    )
+    session.exec(stmt)
+
+
+def finalize_summary(session: Session, session_id: int, all_students: Optional[List[str]] = None) -> SessionSummary:
+    """
+    Recomputes a session's summary from its rows and freezes it.
+    With a roster, the absentee list is snapshotted so reports need no roster diff later.
+    """
+    present = set(session.exec(select(AttendanceRecord.student_name).where(
+        AttendanceRecord.session_id == session_id
+    )).all())
+    first_arrival, last_arrival = session.exec(select(
+        func.min(AttendanceRecord.timestamp), func.max(AttendanceRecord.timestamp)
+    ).where(AttendanceRecord.session_id == session_id)).one()
+    unknown_count = session.exec(select(func.count()).select_from(UnknownFace).where(
+        UnknownFace.session_id == session_id
+    )).one()
+    evidence_count = session.exec(select(func.count()).select_from(AttendanceSource).where(
+        AttendanceSource.session_id == session_id
+    )).one()
+
+    summary = session.get(SessionSummary, session_id) or SessionSummary(session_id=session_id)
+    summary.present_count = len(present)
+    summary.unknown_count = unknown_count
+    summary.evidence_count = evidence_count
+    summary.first_arrival = first_arrival
+    summary.last_arrival = last_arrival
+    if all_students is not None:
+        absent = sorted(set(all_students) - present)
+        summary.absent_count = len(absent)
+        summary.absent_json = json.dumps(absent)
+    summary.is_final = True
+    session.add(summary)
+    return summary
+
+
+def refinalize_if_final(session: Session, session_id: int) -> bool:
+    """
+    Re-finalizes the summary of an ended session after a late write (manual
+    mark, resolved unknown), against the roster snapshotted at session end.
+    Returns False for an open session, whose counters are bumped instead.
+    """
+    summary = session.get(SessionSummary, session_id)
+    if not summary or not summary.is_final:
+        return False
+    roster = None
+    if summary.absent_json is not None:
+        present = set(session.exec(select(AttendanceRecord.student_name).where(
+            AttendanceRecord.session_id == session_id
+        )).all())
+        roster = sorted(present | set(json.loads(summary.absent_json)))
+    finalize_summary(session, session_id, roster)
+    return True
@@ -0,0 +1,235 @@
+import csv
+import io
+import multiprocessing
+import os
+import re
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from sqlmodel import Session, select
+from .models import User, UserRole
+from .database import engine
+from .auth_service import get_password_hash
+from .embedding_loader import DATASET_DIR
+
+IMPORT_COLUMNS = ["username", "full_name", "sap_id", "face_identity", "password", "role"]
+REQUIRED_COLUMNS = ["username"]
+
+
+@dataclass
+class ImportRow:
+    row: int # 1-based line number in the CSV, header included
+    username: str
+    full_name: Optional[str] = None
+    sap_id: Optional[str] = None
+    face_identity: Optional[str] = None
+    password: Optional[str] = None
+    role: UserRole = UserRole.STUDENT
+    link: str = "none" # 'given', 'auto', 'missing' (given but no dataset folder) or 'none'
+    generated_password: bool = False
+
+
+@dataclass
+class ImportResult:
+    created: List[ImportRow] = field(default_factory=list)
+    errors: List[Dict] = field(default_factory=list)
+    dry_run: bool = False
+
+    def to_dict(self, include_passwords: bool = True) -> Dict:
+        return {
+            "dry_run": self.dry_run,
+            "created_count": len(self.created),
+            "error_count": len(self.errors),
+            "created": [
+                {
+                    "row": r.row,
+                    "username": r.username,
+                    "face_identity": r.face_identity,
+                    "link": r.link,
+                    # Generated passwords are only ever shown here, once
+                    "password": r.password if include_passwords and r.generated_password else None,
+                }
+                for r in self.created
+            ],
+            "errors": self.errors,
+        }
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", value.lower()).strip("_")
+
+
+def dataset_folders() -> List[str]:
+    if not os.path.isdir(DATASET_DIR):
+        return []
+    return [d for d in os.listdir(DATASET_DIR) if os.path.isdir(os.path.join(DATASET_DIR, d))]
+
+
+def match_dataset_folder(row: ImportRow, folders: List[str]) -> Optional[str]:
+    """
+    Finds the dataset folder of a student without an explicit face_identity:
+    a folder named like the username, then one with the SAP id as a name part
+    (student_<sap>_...), then one ending in the slugged full name. Ambiguous
+    matches are not linked.
+    """
+    by_slug = {_slug(f): f for f in folders}
+    if _slug(row.username) in by_slug:
+        return by_slug[_slug(row.username)]
+
+    candidates = []
+    if row.sap_id:
+        sap = _slug(row.sap_id)
+        candidates = [f for s, f in by_slug.items() if sap in s.split("_")]
+    if not candidates and row.full_name:
+        name = _slug(row.full_name)
+        candidates = [f for s, f in by_slug.items() if name and (s == name or s.endswith("_" + name))]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def parse_rows(text: str, result: ImportResult) -> List[ImportRow]:
+    """Parses and validates the CSV; invalid rows go to `result.errors`."""
+    reader = csv.DictReader(io.StringIO(text))
+    header = [h.strip().lower() for h in (reader.fieldnames or [])]
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {missing}. Expected: {IMPORT_COLUMNS}")
+    reader.fieldnames = header
+
+    rows, seen = [], set()
+    for line, raw in enumerate(reader, start=2):
+        values = {k: (v or "").strip() for k, v in raw.items() if k}
+        username = values.get("username", "")
+        if not username:
+            result.errors.append({"row": line, "username": None, "error": "username is required"})
+            continue
+        if username in seen:
+            result.errors.append({"row": line, "username": username, "error": "duplicate username in file"})
+            continue
+        try:
+            role = UserRole(values.get("role") or UserRole.STUDENT.value)
+        except ValueError:
+            result.errors.append({"row": line, "username": username, "error": f"invalid role '{values.get('role')}'"})
+            continue
+
+        seen.add(username)
+        rows.append(ImportRow(
+            row=line,
+            username=username,
+            full_name=values.get("full_name") or None,
+            sap_id=values.get("sap_id") or None,
+            face_identity=values.get("face_identity") or None,
+            password=values.get("password") or None,
+            role=role,
+        ))
+    return rows
+
+
+class StudentImporter:
+    """
+    Bulk account creation. Argon2 hashing is spread over a process pool (it is
+    CPU bound and would serialize on one core otherwise) and users are inserted
+    in batched transactions; a failing batch is retried row by row so one bad
+    row only costs itself.
+    """
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = 500):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+
+    def import_csv(self, text: str, dry_run: bool = False) -> ImportResult:
+        result = ImportResult(dry_run=dry_run)
+        rows = parse_rows(text, result)
+        rows = self._drop_existing(rows, result)
+        self._link_identities(rows)
+        if dry_run:
+            result.created = rows
+            return result
+
+        for row in rows:
+            if not row.password:
+                row.password = secrets.token_urlsafe(9)
+                row.generated_password = True
+        hashes = self._hash_passwords([row.password for row in rows])
+        users = [
+            User(
+                username=row.username,
+                password_hash=password_hash,
+                role=row.role,
+                full_name=row.full_name,
+                sap_id=row.sap_id,
+                face_identity=row.face_identity,
+            )
+            for row, password_hash in zip(rows, hashes)
+        ]
+
+        for start in range(0, len(rows), self.batch_size):
+            self._insert_batch(rows[start:start + self.batch_size], users[start:start + self.batch_size], result)
+        return result
+
+    def _drop_existing(self, rows: List[ImportRow], result: ImportResult) -> List[ImportRow]:
+        existing = set()
+        with Session(engine) as session:
+            # Chunked IN lists stay under SQLite's bound-parameter limit
+            for start in range(0, len(rows), 500):
+                names = [r.username for r in rows[start:start + 500]]
+                existing.update(session.exec(select(User.username).where(User.username.in_(names))).all())
+        for row in rows:
+            if row.username in existing:
+                result.errors.append({"row": row.row, "username": row.username, "error": "username already exists"})
+        return [row for row in rows if row.username not in existing]
+
+    def _link_identities(self, rows: List[ImportRow]):
+        folders = dataset_folders()
+        folder_set = set(folders)
+        for row in rows:
+            if row.face_identity:
+                row.link = "given" if row.face_identity in folder_set else "missing"
+                continue
+            folder = match_dataset_folder(row, folders)
+            if folder:
+                row.face_identity = folder
+                row.link = "auto"
+
+    def _hash_passwords(self, passwords: List[str]) -> List[str]:
+        if self.workers <= 1 or len(passwords) < 2 * self.workers:
+            return [get_password_hash(p) for p in passwords]
+        # spawn: forking a server process with live threads is not safe
+        context = multiprocessing.get_context("spawn")
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            return list(pool.map(get_password_hash, passwords, chunksize=chunksize))
+
+    def _insert_batch(self, rows: List[ImportRow], users: List[User], result: ImportResult):
+        try:
+            with Session(engine) as session:
+                session.add_all(users)
+                session.commit()
+            result.created.extend(rows)
+            return
+        except Exception as e:
+            print(f"StudentImporter: batch of {len(rows)} failed ({e}), retrying individually")
+
+        for row, user in zip(rows, users):
+            try:
+                with Session(engine) as session:
+                    # The failed batch may have left the instance attached to a closed session
+                    session.add(User(**user.model_dump(exclude={"id"})))
+                    session.commit()
+                result.created.append(row)
+            except Exception as e:
+                # The DBAPI error without SQLAlchemy's statement dump
+                result.errors.append({"row": row.row, "username": row.username, "error": str(getattr(e, "orig", e))})
+
+
+def format_report_csv(result: ImportResult) -> str:
+    """CSV report of created accounts (with generated passwords) and errors, for the CLI."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["row", "username", "status", "face_identity", "link", "password", "error"])
+    for r in result.created:
+        writer.writerow([r.row, r.username, "created", r.face_identity, r.link,
+                         r.password if r.generated_password else "", ""])
+    for e in result.errors:
+        writer.writerow([e["row"], e["username"], "error", "", "", "", e["error"]])
+    return buffer.getvalue()
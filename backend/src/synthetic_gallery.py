@@ -0,0 +1,177 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy import delete, insert
+from sqlmodel import Session, select
+from .models import GalleryEmbedding
+from .database import engine
+from .embedding_loader import SYNTHETIC_PREFIX
+from .embedding_models import decode_embeddings, encode_embedding
+
+# dlib encodings: photos of one person are typically ~0.4 apart, different people ~0.85 (tolerance 0.6)
+INTRA_DISTANCE = 0.4
+INTER_DISTANCE = 0.85
+# Per-dimension spread of real encodings, for a base when nothing is enrolled yet
+ENCODING_STD = 0.09
+DIMENSIONS = 128
+
+
+@dataclass
+class SyntheticGallery:
+    names: List[str]
+    encodings: np.ndarray  # (identities * per_identity, 128)
+    labels: np.ndarray  # index into `names` per encoding
+    genuine_probes: np.ndarray  # fresh samples of gallery identities
+    genuine_labels: np.ndarray
+    impostor_probes: np.ndarray  # samples of identities that are not enrolled
+
+
+def seed_encodings(model_version: str) -> np.ndarray:
+    """Stored encodings of real enrollment images for `model_version`, to build synthetic identities around."""
+    with Session(engine) as session:
+        blobs = session.exec(select(GalleryEmbedding.embedding).where(
+            GalleryEmbedding.model_version == model_version,
+            GalleryEmbedding.image_path.not_like(f"{SYNTHETIC_PREFIX}%")
+        )).all()
+    return decode_embeddings(list(blobs))
+
+
+def generate(
+    identities: int,
+    per_identity: int = 1,
+    genuine_probes: int = 100,
+    impostor_probes: int = 100,
+    seeds: Optional[np.ndarray] = None,
+    inter_distance: float = INTER_DISTANCE,
+    intra_distance: float = INTRA_DISTANCE,
+    impostor_distance: Optional[float] = None,
+    variability: float = 0.25,
+    random_seed: int = 0
+) -> SyntheticGallery:
+    """
+    Synthetic identities perturbed around real encodings (`seeds`, cycled).
+    With per-dimension Gaussian offsets of spread s, two independent samples
+    are about s * sqrt(2 * 128) apart, so identity centres are spread for
+    `inter_distance` between identities and samples for `intra_distance`
+    between two photos of one identity. Impostors are identities that are
+    not enrolled; a smaller `impostor_distance` makes them look-alikes.
+
+    Real galleries are not uniform: some people look alike and some photo
+    sets vary more. Each identity's spreads are scaled by a log-normal factor
+    (sigma `variability`), which gives the distance distributions the tails
+    that produce false accepts and rejects at scale.
+    """
+    rng = np.random.default_rng(random_seed)
+    if seeds is None or len(seeds) == 0:
+        seeds = rng.normal(0, ENCODING_STD, (1, DIMENSIONS))
+    pair_scale = np.sqrt(2 * DIMENSIONS)
+    between = inter_distance / pair_scale
+    within = intra_distance / pair_scale
+
+    def jitter(count: int) -> np.ndarray:
+        return rng.lognormal(0, variability, (count, 1)) if variability else np.ones((count, 1))
+
+    def centres(count: int, spread: float) -> np.ndarray:
+        offsets = rng.normal(0, spread, (count, DIMENSIONS)) * jitter(count)
+        return seeds[np.arange(count) % len(seeds)] + offsets
+
+    identity_centres = centres(identities, between)
+    identity_within = within * jitter(identities)
+    labels = np.repeat(np.arange(identities), per_identity)
+    encodings = identity_centres[labels] + rng.normal(0, 1, (len(labels), DIMENSIONS)) * identity_within[labels]
+
+    genuine_labels = rng.integers(0, identities, genuine_probes)
+    genuine = identity_centres[genuine_labels] \
+        + rng.normal(0, 1, (genuine_probes, DIMENSIONS)) * identity_within[genuine_labels]
+    impostors = centres(impostor_probes, (impostor_distance or inter_distance) / pair_scale) \
+        + rng.normal(0, 1, (impostor_probes, DIMENSIONS)) * within * jitter(impostor_probes)
+
+    return SyntheticGallery(
+        names=[f"synthetic_{i:06d}" for i in range(identities)],
+        encodings=encodings.astype(np.float32),
+        labels=labels,
+        genuine_probes=genuine.astype(np.float32),
+        genuine_labels=genuine_labels,
+        impostor_probes=impostors.astype(np.float32),
+    )
+
+
+def clear(model_version: Optional[str] = None) -> int:
+    """Deletes stored synthetic identities (of one version, default all)."""
+    statement = delete(GalleryEmbedding).where(GalleryEmbedding.image_path.like(f"{SYNTHETIC_PREFIX}%"))
+    if model_version:
+        statement = statement.where(GalleryEmbedding.model_version == model_version)
+    with Session(engine) as session:
+        result = session.exec(statement)
+        session.commit()
+    return result.rowcount
+
+
+def store(gallery: SyntheticGallery, model_version: str, batch_size: int = 5000) -> int:
+    """
+    Writes the gallery as stored GalleryEmbedding rows of `model_version`,
+    replacing earlier synthetic rows. EmbeddingLoader serves them next to the
+    enrolled students on its next load if SYNTHETIC_GALLERY=1.
+    """
+    clear(model_version)
+    created_at = datetime.utcnow()
+    per_name: Dict[int, int] = {}
+    rows = []
+    for label, encoding in zip(gallery.labels, gallery.encodings):
+        index = per_name[label] = per_name.get(label, -1) + 1
+        name = gallery.names[label]
+        rows.append({
+            "student_name": name,
+            "image_path": f"{SYNTHETIC_PREFIX}{name}/{index}",
+            "model_version": model_version,
+            "embedding": encode_embedding(encoding),
+            "created_at": created_at,
+        })
+    with Session(engine) as session:
+        for start in range(0, len(rows), batch_size):
+            # Core executemany: ORM objects would make 100k identities take minutes
+            session.execute(insert(GalleryEmbedding), rows[start:start + batch_size])
+        session.commit()
+    return len(rows)
+
+
+def evaluate(gallery: SyntheticGallery, tolerance: float = 0.6) -> Dict:
+    """Matches every probe the way recognition does; accuracy and per-probe latency."""
+    from .recognition import match_face
+
+    known = list(gallery.encodings)
+    names = [gallery.names[label] for label in gallery.labels]
+    latencies = []
+
+    def match(probe: np.ndarray) -> str:
+        started = time.perf_counter()
+        name, _ = match_face(known, names, probe, tolerance)
+        latencies.append(time.perf_counter() - started)
+        return name
+
+    accepted = misidentified = 0
+    for probe, label in zip(gallery.genuine_probes, gallery.genuine_labels):
+        name = match(probe)
+        if name == gallery.names[label]:
+            accepted += 1
+        elif name != "Unknown":
+            misidentified += 1
+    false_accepts = sum(match(probe) != "Unknown" for probe in gallery.impostor_probes)
+
+    genuine, impostors = len(gallery.genuine_probes), len(gallery.impostor_probes)
+    ms = sorted(latency * 1000 for latency in latencies)
+    return {
+        "identities": len(gallery.names),
+        "embeddings": len(gallery.encodings),
+        "tolerance": tolerance,
+        "genuine_probes": genuine,
+        "impostor_probes": impostors,
+        "true_accept_rate": round(accepted / genuine, 4) if genuine else None,
+        "misidentification_rate": round(misidentified / genuine, 4) if genuine else None,
+        "false_reject_rate": round((genuine - accepted - misidentified) / genuine, 4) if genuine else None,
+        "false_accept_rate": round(false_accepts / impostors, 4) if impostors else None,
+        "median_ms": round(ms[len(ms) // 2], 3) if ms else None,
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3) if ms else None,
+    }
@@ -1,14 +1,19 @@
 import cv2
 import os
 import collections
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 from .recognition import RecognitionService
 
 class VideoProcessor:
     def __init__(self, recognition_service: RecognitionService):
         self.recognition_service = recognition_service
 
-    def process_video(self, video_path: str, interval: int = 1) -> Dict:
+    def process_video(
+        self,
+        video_path: str,
+        interval: int = 1,
+        on_frame: Optional[Callable[[float, List[Dict]], None]] = None
+    ) -> Dict:
         """
         Processes a video file, extracting frames at a given interval (in seconds),
         and recognizing faces in each frame.
@@ -16,6 +21,8 @@ class VideoProcessor:
         Args:
             video_path: Path to the video file.
             interval: Time interval in seconds between processed frames.
+            on_frame: Called with (video timestamp in seconds, recognition results)
+                for every processed frame, e.g. to measure time to first detection.
             
         Returns:
             Dict containing the consensus identity and detailed frame results.
@@ -47,7 +54,10 @@ class VideoProcessor:
                 
                 # We interpret the numpy array as an image file 
                 # face_recognition can accept a numpy array directly too
-                results = self.recognition_service.recognize_image(rgb_frame)
+                # Encodings ride along in the metadata so the evidence keeps them
+                results = self.recognition_service.recognize_image(rgb_frame, with_encodings=True)
+                if on_frame:
+                    on_frame(frame_count / fps, results)
                 
                 for res in results:
                     name = res['name']
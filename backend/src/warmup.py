@@ -0,0 +1,84 @@
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+# Called with (students done, students total) while the gallery builds
+ProgressCallback = Callable[[int, int], None]
+
+
+class GalleryWarmup:
+    """
+    Loads the recognition models and gallery on a background thread, so the
+    server accepts requests (login, dashboards, /health) within seconds of a
+    restart. Recognition endpoints answer 503 until it is ready; /ready
+    reports the progress for orchestrators and load balancers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self.state = WARMING
+        self.error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._started = 0.0
+        self._finished: Optional[float] = None
+        self._students_done = 0
+        self._students_total: Optional[int] = None
+
+    def start(self, load: Callable[[ProgressCallback], None]):
+        """Runs `load(progress)` once in the background."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = datetime.utcnow()
+            self._started = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, args=(load,), name="gallery-warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self, load: Callable[[ProgressCallback], None]):
+        try:
+            load(self.progress)
+        except Exception as e:
+            with self._lock:
+                self.state, self.error = FAILED, str(e)
+                self.finished_at, self._finished = datetime.utcnow(), time.perf_counter()
+            print(f"Gallery warm-up failed: {e}")
+            return
+        with self._lock:
+            self.state = READY
+            self.finished_at, self._finished = datetime.utcnow(), time.perf_counter()
+        self._ready.set()
+        print(f"Gallery warm-up complete in {self._finished - self._started:.1f}s")
+
+    def progress(self, done: int, total: int):
+        with self._lock:
+            self._students_done, self._students_total = done, total
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def status(self) -> Dict:
+        with self._lock:
+            done, total = self._students_done, self._students_total
+            elapsed = (self._finished or time.perf_counter()) - self._started if self.started_at else 0.0
+            return {
+                "status": self.state,
+                "students_loaded": done,
+                "students_total": total,
+                "progress": round(done / total, 3) if total else (1.0 if self.state == READY else 0.0),
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed_seconds": round(elapsed, 1),
+                "error": self.error,
+            }
@@ -0,0 +1,32 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from src import app_settings, attendance, attendance_writer, database, embedding_loader, evidence_store, migrations, session_state
+from src.models import AttendanceSession
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """A fresh SQLite database per test, swapped in for the modules that import `engine`."""
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'attendance.db'}", connect_args={"check_same_thread": False})
+    for module in (
+        database, app_settings, attendance, attendance_writer, embedding_loader, evidence_store, migrations, session_state
+    ):
+        monkeypatch.setattr(module, "engine", test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+@pytest.fixture
+def tables(engine):
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def session_id(tables):
+    with Session(tables) as session:
+        attendance_session = AttendanceSession(name="Lecture")
+        session.add(attendance_session)
+        session.commit()
+        return attendance_session.id
@@ -0,0 +1,54 @@
+import pytest
+
+from src import admission
+from src.admission import AdmissionController, AdmissionRejected, INTERACTIVE
+from src.models import User, UserRole
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(admission.time, "monotonic", fake)
+    return fake
+
+
+def kiosk(name):
+    return User(username=name, password_hash="", role=UserRole.KIOSK)
+
+
+def admit(controller, user):
+    with controller.admit(INTERACTIVE, user):
+        pass
+
+
+def test_refilled_buckets_are_swept(clock):
+    controller = AdmissionController(buckets={(INTERACTIVE, UserRole.KIOSK): (1.0, 2)})
+    for i in range(100):
+        admit(controller, kiosk(f"kiosk-{i}"))
+    assert len(controller._buckets) == 100
+
+    clock.now += admission.BUCKET_SWEEP_SECONDS
+    admit(controller, kiosk("kiosk-new"))
+    assert list(controller._buckets) == [(INTERACTIVE, "kiosk-new")]
+
+
+def test_sweep_keeps_buckets_still_refilling(clock):
+    controller = AdmissionController(buckets={(INTERACTIVE, UserRole.KIOSK): (1 / 120, 2)})
+    busy = kiosk("busy")
+    admit(controller, busy)
+    admit(controller, busy)
+
+    clock.now += admission.BUCKET_SWEEP_SECONDS
+    admit(controller, kiosk("other"))
+    # Half refilled: dropping the bucket would hand the caller a fresh burst
+    with pytest.raises(AdmissionRejected) as rejected:
+        admit(controller, busy)
+    assert rejected.value.status_code == 429
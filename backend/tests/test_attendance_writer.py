@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, select
+
+from src.attendance_writer import AttendanceWriter, upsert_attendance
+from src.models import AttendanceRecord, SessionSummary
+
+
+def upsert_session(engine):
+    # Rows stay readable after commit, as in the writer
+    return Session(engine, expire_on_commit=False)
+
+
+def marks(engine):
+    with Session(engine) as session:
+        return session.exec(select(AttendanceRecord)).all()
+
+
+def test_first_sighting_inserts(tables, session_id):
+    seen = datetime(2024, 1, 1, 9, 0)
+    with upsert_session(tables) as session:
+        row, inserted = upsert_attendance(session, "alice", session_id, distance=0.4, timestamp=seen)
+        session.commit()
+    assert inserted
+    assert (row.student_name, row.distance, row.timestamp) == ("alice", 0.4, seen)
+
+
+def test_better_distance_updates_and_keeps_first_arrival(tables, session_id):
+    first = datetime(2024, 1, 1, 9, 0)
+    with upsert_session(tables) as session:
+        upsert_attendance(session, "alice", session_id, distance=0.5, timestamp=first)
+        row, inserted = upsert_attendance(session, "alice", session_id, distance=0.3, timestamp=first + timedelta(minutes=5))
+        session.commit()
+    assert not inserted
+    assert row.distance == 0.3
+    assert row.timestamp == first
+    assert len(marks(tables)) == 1
+
+
+def test_worse_distance_leaves_mark_untouched(tables, session_id):
+    with upsert_session(tables) as session:
+        upsert_attendance(session, "alice", session_id, distance=0.3)
+        row, inserted = upsert_attendance(session, "alice", session_id, distance=0.5)
+        session.commit()
+    assert (row, inserted) == (None, False)
+    assert [m.distance for m in marks(tables)] == [0.3]
+
+
+def test_any_distance_replaces_unknown_distance(tables, session_id):
+    with upsert_session(tables) as session:
+        upsert_attendance(session, "alice", session_id)
+        row, inserted = upsert_attendance(session, "alice", session_id, distance=0.6)
+        session.commit()
+    assert not inserted
+    assert row.distance == 0.6
+
+
+def test_batch_coalesces_repeat_sightings(tables, session_id):
+    # A long flush interval puts every submit in the same transaction
+    writer = AttendanceWriter(max_batch_size=64, flush_interval=1.0)
+    futures = [writer.submit_attendance("alice", session_id, distance=d) for d in (0.5, 0.4, 0.45, 0.2)]
+    futures.append(writer.submit_attendance("bob", session_id, distance=0.35))
+    writer.stop()
+
+    results = [f.result(timeout=5) for f in futures]
+    # Only the inserting op of each student resolves to a row
+    assert [r.student_name if r else None for r in results] == ["alice", None, None, None, "bob"]
+    assert {m.student_name: m.distance for m in marks(tables)} == {"alice": 0.2, "bob": 0.35}
+    with Session(tables) as session:
+        assert session.get(SessionSummary, session_id).present_count == 2
+
+
+def test_failed_op_does_not_fail_its_batch(tables, session_id):
+    writer = AttendanceWriter(max_batch_size=64, flush_interval=1.0)
+    good = writer.submit_attendance("alice", session_id, distance=0.4)
+    bad = writer._submit("unsupported", {"session_id": session_id})
+    writer.stop()
+
+    assert good.result(timeout=5).student_name == "alice"
+    assert isinstance(bad.exception(timeout=5), ValueError)
+    assert [m.student_name for m in marks(tables)] == ["alice"]
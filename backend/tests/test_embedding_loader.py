@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pytest
+from sqlmodel import Session, select
+
+from src import embedding_loader
+from src.embedding_loader import EmbeddingLoader
+from src.embedding_models import encode_embedding
+from src.models import GalleryEmbedding
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    root = tmp_path / "dataset"
+    monkeypatch.setattr(embedding_loader, "DATASET_DIR", str(root))
+    return root
+
+
+@pytest.fixture
+def encoded(monkeypatch):
+    """Stands in for face_recognition: the encoding is the image's first byte, repeated."""
+    calls = []
+
+    def encode(self, student_name, image_path, model):
+        calls.append(image_path)
+        with open(os.path.join(embedding_loader.DATASET_DIR, image_path), "rb") as f:
+            return np.full(128, f.read(1)[0], dtype=np.float64)
+
+    monkeypatch.setattr(EmbeddingLoader, "encode_enrollment_image", encode)
+    return calls
+
+
+def enroll(dataset, student_name, filename, content: bytes):
+    (dataset / student_name).mkdir(parents=True, exist_ok=True)
+    (dataset / student_name / filename).write_bytes(content)
+
+
+def stored_paths(engine):
+    with Session(engine) as session:
+        return sorted(row.image_path for row in session.exec(select(GalleryEmbedding)).all())
+
+
+def test_restart_reuses_stored_encodings(tables, dataset, encoded):
+    enroll(dataset, "alice", "a.jpg", b"\x01alice")
+    EmbeddingLoader()
+    loader = EmbeddingLoader()
+    assert encoded == ["alice/a.jpg"]
+    assert loader.student_embeddings["alice"][0][0] == 1
+
+
+def test_replaced_image_is_reencoded(tables, dataset, encoded):
+    enroll(dataset, "alice", "a.jpg", b"\x01alice")
+    EmbeddingLoader()
+    enroll(dataset, "alice", "a.jpg", b"\x02replaced photo")
+
+    loader = EmbeddingLoader()
+    assert encoded == ["alice/a.jpg", "alice/a.jpg"]
+    assert loader.student_embeddings["alice"][0][0] == 2
+    assert stored_paths(tables) == ["alice/a.jpg"]
+
+
+def test_touched_but_identical_image_is_not_reencoded(tables, dataset, encoded):
+    enroll(dataset, "alice", "a.jpg", b"\x01alice")
+    EmbeddingLoader()
+    path = dataset / "alice" / "a.jpg"
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+
+    EmbeddingLoader()
+    EmbeddingLoader()
+    assert encoded == ["alice/a.jpg"]
+
+
+def test_rows_of_deleted_images_are_dropped(tables, dataset, encoded):
+    enroll(dataset, "alice", "a.jpg", b"\x01alice")
+    enroll(dataset, "bob", "b.jpg", b"\x03bob")
+    EmbeddingLoader()
+    (dataset / "bob" / "b.jpg").unlink()
+
+    loader = EmbeddingLoader()
+    assert set(loader.student_embeddings) == {"alice"}
+    assert stored_paths(tables) == ["alice/a.jpg"]
+
+
+def test_synthetic_identities_only_when_enabled(tables, dataset, encoded, monkeypatch):
+    enroll(dataset, "alice", "a.jpg", b"\x01alice")
+    loader = EmbeddingLoader()
+    with Session(tables) as session:
+        session.add(GalleryEmbedding(
+            student_name="synthetic_1", image_path="synthetic/synthetic_1/0",
+            model_version=loader.model_version, embedding=encode_embedding(loader.student_embeddings["alice"][0])
+        ))
+        session.commit()
+
+    assert set(EmbeddingLoader().student_embeddings) == {"alice"}
+    monkeypatch.setattr(embedding_loader, "SYNTHETIC_GALLERY", True)
+    assert set(EmbeddingLoader().student_embeddings) == {"alice", "synthetic_1"}
+    assert stored_paths(tables) == ["alice/a.jpg", "synthetic/synthetic_1/0"]
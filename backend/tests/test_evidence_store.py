@@ -0,0 +1,75 @@
+import os
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session
+
+from src.attendance_writer import AttendanceWriter
+from src.evidence_store import EvidenceStore
+from src.models import EvidenceBlob
+
+LONG_AGO = datetime(2020, 1, 1)
+
+
+@pytest.fixture
+def store(tmp_path, tables):
+    return EvidenceStore(root=str(tmp_path / "static"))
+
+
+def put(engine, store, data):
+    """Stores `data` as the MediaWriter would, with a grace period that ran out long ago."""
+    stored = store.reserve(data, ".jpg")
+    path = store.absolute(stored.file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    store.register(stored, len(data))
+    with Session(engine) as session:
+        blob = session.get(EvidenceBlob, stored.content_hash)
+        blob.last_stored_at = LONG_AGO
+        session.add(blob)
+        session.commit()
+    return stored
+
+
+def blob(engine, content_hash):
+    with Session(engine) as session:
+        return session.get(EvidenceBlob, content_hash)
+
+
+def test_deduplicating_lookup_writes_nothing(tables, store):
+    first = put(tables, store, b"frame")
+    again = store.reserve(b"frame", ".jpg")
+    assert again.deduplicated
+    assert again.file_path == first.file_path
+    assert blob(tables, first.content_hash).last_stored_at == LONG_AGO
+
+
+def test_claimed_blob_survives_gc(tables, store):
+    claimed = put(tables, store, b"claimed")
+    idle = put(tables, store, b"idle")
+    # Only the lookup below counts, not the ones that stored the blobs
+    store._claimed.clear()
+    store.reserve(b"claimed", ".jpg")
+
+    assert store.collect_garbage(grace_seconds=60)["deleted_blobs"] == 1
+    assert blob(tables, claimed.content_hash)
+    assert blob(tables, idle.content_hash) is None
+    assert not os.path.exists(store.absolute(idle.file_path))
+
+
+def test_writer_restarts_grace_period_of_referenced_blob(tables, store, session_id):
+    stored = put(tables, store, b"frame")
+    writer = AttendanceWriter(flush_interval=0.01)
+    writer.submit_source(session_id, stored.file_path, "image", content_hash=stored.content_hash).result(timeout=5)
+    writer.stop()
+    assert blob(tables, stored.content_hash).last_stored_at > LONG_AGO
+
+
+def test_row_without_file_is_rewritten(tables, store):
+    stored = put(tables, store, b"frame")
+    os.remove(store.absolute(stored.file_path))
+    again = store.reserve(b"frame", ".png")
+    assert not again.deduplicated
+    store.register(again, len(b"frame"))
+    assert blob(tables, stored.content_hash).file_path == again.file_path
@@ -0,0 +1,35 @@
+import pytest
+
+from src.media_writer import MediaWriter
+
+
+def test_failed_callback_keeps_the_written_file(tmp_path):
+    path = tmp_path / "evidence" / "blob.jpg"
+    path.parent.mkdir()
+    path.write_bytes(b"shared")
+
+    def register():
+        raise RuntimeError("database is locked")
+
+    writer = MediaWriter(workers=1)
+    future = writer.submit(str(path), b"shared", on_written=register)
+    with pytest.raises(RuntimeError):
+        future.result(timeout=5)
+    writer.stop()
+
+    assert path.read_bytes() == b"shared"
+    assert [p.name for p in path.parent.iterdir()] == ["blob.jpg"]
+    assert writer.metrics()["failed"] == 1
+
+
+def test_failed_payload_leaves_no_temp_file(tmp_path):
+    def encode():
+        raise ValueError("cannot encode")
+
+    writer = MediaWriter(workers=1)
+    future = writer.submit(str(tmp_path / "crop.jpg"), encode)
+    with pytest.raises(ValueError):
+        future.result(timeout=5)
+    writer.stop()
+
+    assert list(tmp_path.iterdir()) == []
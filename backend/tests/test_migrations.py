@@ -0,0 +1,69 @@
+from sqlalchemy import text
+
+from src.migrations import _migrate_attendance_unique_marks
+
+LEGACY_SCHEMA = """
+    CREATE TABLE attendancerecord (
+        id INTEGER PRIMARY KEY,
+        student_name VARCHAR NOT NULL,
+        timestamp DATETIME NOT NULL,
+        session_id INTEGER,
+        metadata_json VARCHAR
+    )
+"""
+
+
+def legacy_marks(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(text(LEGACY_SCHEMA))
+        conn.execute(text(
+            "INSERT INTO attendancerecord (id, student_name, timestamp, session_id, metadata_json) "
+            "VALUES (:id, :student_name, :timestamp, :session_id, :metadata_json)"
+        ), rows)
+
+
+def migrated(engine):
+    with engine.begin() as conn:
+        _migrate_attendance_unique_marks(conn)
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT id, student_name, timestamp, session_id, distance FROM attendancerecord ORDER BY id"
+        )).all()
+
+
+def test_duplicates_collapse_to_best_distance_at_first_arrival(engine):
+    legacy_marks(engine, [
+        {"id": 1, "student_name": "alice", "timestamp": "2024-01-01 09:00:00", "session_id": 1, "metadata_json": '{"distance": 0.5}'},
+        {"id": 2, "student_name": "alice", "timestamp": "2024-01-01 09:05:00", "session_id": 1, "metadata_json": '{"distance": 0.3}'},
+        {"id": 3, "student_name": "alice", "timestamp": "2024-01-01 09:10:00", "session_id": 1, "metadata_json": None},
+        {"id": 4, "student_name": "bob", "timestamp": "2024-01-01 09:02:00", "session_id": 1, "metadata_json": '{"distance": 0.4}'},
+        {"id": 5, "student_name": "alice", "timestamp": "2024-01-02 09:00:00", "session_id": 2, "metadata_json": '{"source": "manual_resolution"}'},
+    ])
+
+    assert migrated(engine) == [
+        (2, "alice", "2024-01-01 09:00:00", 1, 0.3),
+        (4, "bob", "2024-01-01 09:02:00", 1, 0.4),
+        (5, "alice", "2024-01-02 09:00:00", 2, 0.0),
+    ]
+
+
+def test_unknown_distances_keep_lowest_id(engine):
+    legacy_marks(engine, [
+        {"id": 7, "student_name": "alice", "timestamp": "2024-01-01 09:05:00", "session_id": 1, "metadata_json": None},
+        {"id": 8, "student_name": "alice", "timestamp": "2024-01-01 09:00:00", "session_id": 1, "metadata_json": "not json"},
+    ])
+
+    assert migrated(engine) == [(7, "alice", "2024-01-01 09:00:00", 1, None)]
+
+
+def test_migration_is_idempotent_and_enforces_uniqueness(engine):
+    legacy_marks(engine, [
+        {"id": 1, "student_name": "alice", "timestamp": "2024-01-01 09:00:00", "session_id": 1, "metadata_json": '{"distance": 0.5}'},
+        {"id": 2, "student_name": "alice", "timestamp": "2024-01-01 09:05:00", "session_id": 1, "metadata_json": '{"distance": 0.3}'},
+    ])
+    first = migrated(engine)
+    assert migrated(engine) == first
+
+    with engine.connect() as conn:
+        indexes = {row[1]: row[2] for row in conn.execute(text("PRAGMA index_list(attendancerecord)"))}
+    assert indexes["ux_attendancerecord_session_student"] == 1
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from src.models import AttendanceRecord
+from src.pagination import PageRequest, decode_cursor, encode_cursor, keyset_page
+
+START = datetime(2024, 1, 1, 9, 0)
+
+
+def add_marks(engine, session_id, count, start=START):
+    # Pairs of marks share a timestamp, so the id has to break ties
+    with Session(engine) as session:
+        for i in range(count):
+            session.add(AttendanceRecord(
+                student_name=f"student_{start:%H%M}_{i}", session_id=session_id, timestamp=start + timedelta(minutes=i // 2)
+            ))
+        session.commit()
+
+
+def walk(engine, page_size, id_only=False, **filters):
+    """Follows next cursors from the first page to the last, returning (timestamp, id) keys."""
+    keys, cursor = [], None
+    while True:
+        with Session(engine) as session:
+            ts_col = None if id_only else AttendanceRecord.timestamp
+            rows, cursor = keyset_page(
+                session, select(AttendanceRecord), PageRequest(limit=page_size, cursor=cursor, **filters),
+                AttendanceRecord.id, ts_col
+            )
+        assert len(rows) <= page_size
+        keys.extend((row.timestamp, row.id) for row in rows)
+        if cursor is None:
+            return keys
+
+
+def newest_first(engine):
+    with Session(engine) as session:
+        rows = session.exec(select(AttendanceRecord)).all()
+    return sorted(((row.timestamp, row.id) for row in rows), reverse=True)
+
+
+@pytest.mark.parametrize("page_size", [1, 3, 4, 11, 12])
+def test_pages_cover_every_row_once_in_order(tables, session_id, page_size):
+    add_marks(tables, session_id, 11)
+    assert walk(tables, page_size) == newest_first(tables)
+
+
+def test_rows_added_while_paging_do_not_shift_pages(tables, session_id):
+    add_marks(tables, session_id, 6)
+    with Session(tables) as session:
+        first, cursor = keyset_page(
+            session, select(AttendanceRecord), PageRequest(limit=2), AttendanceRecord.id, AttendanceRecord.timestamp
+        )
+    add_marks(tables, session_id, 4, start=START + timedelta(hours=1))
+
+    with Session(tables) as session:
+        rest, _ = keyset_page(
+            session, select(AttendanceRecord), PageRequest(limit=10, cursor=cursor),
+            AttendanceRecord.id, AttendanceRecord.timestamp
+        )
+    older = [key for key in newest_first(tables) if key[0] < START + timedelta(hours=1)]
+    assert [(r.timestamp, r.id) for r in first + rest] == older
+
+
+def test_time_window_filters_before_paging(tables, session_id):
+    add_marks(tables, session_id, 10)
+    since, until = START + timedelta(minutes=1), START + timedelta(minutes=4)
+    keys = walk(tables, 2, since=since, until=until)
+    assert keys == [key for key in newest_first(tables) if since <= key[0] < until]
+
+
+def test_id_only_keyset(tables, session_id):
+    add_marks(tables, session_id, 7)
+    assert [row_id for _, row_id in walk(tables, 3, id_only=True)] == [7, 6, 5, 4, 3, 2, 1]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(START, 42)) == (START, 42)
+    assert decode_cursor(encode_cursor(None, 42)) == (None, 42)
+
+
+def test_invalid_cursor_is_a_client_error():
+    with pytest.raises(HTTPException) as error:
+        decode_cursor("not-a-cursor")
+    assert error.value.status_code == 400
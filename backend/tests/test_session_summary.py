@@ -0,0 +1,62 @@
+import json
+
+import pytest
+from sqlmodel import Session
+
+from src.attendance import AttendanceService
+from src.models import SessionSummary
+
+ROSTER = ["alice", "bob", "carol"]
+
+
+@pytest.fixture
+def service(tables):
+    service = AttendanceService()
+    yield service
+    service.writer.stop()
+
+
+@pytest.fixture
+def ended_session(service):
+    session_id = service.create_session("Lecture").id
+    service.mark_attendance("alice", distance=0.4)
+    service.end_active_session(ROSTER)
+    return session_id
+
+
+def summary(engine, session_id):
+    with Session(engine) as session:
+        return session.get(SessionSummary, session_id)
+
+
+def test_end_snapshots_absentees(tables, service, ended_session):
+    final = summary(tables, ended_session)
+    assert final.is_final
+    assert (final.present_count, final.absent_count) == (1, 2)
+    assert json.loads(final.absent_json) == ["bob", "carol"]
+
+
+def test_late_manual_mark_refinalizes(tables, service, ended_session):
+    assert service.mark_attendance("bob", distance=0.0, session_id=ended_session) is not None
+
+    assert service.get_session_report(ended_session, ROSTER) == {"present": ["alice", "bob"], "absent": ["carol"]}
+    final = summary(tables, ended_session)
+    assert (final.present_count, final.absent_count, final.is_final) == (2, 1, True)
+
+
+def test_late_resolved_unknown_refinalizes(tables, service, ended_session):
+    unknown = service.register_unknown(ended_session, "unknowns/late.jpg")
+    service.resolve_unknown(unknown.id, "carol")
+
+    assert service.get_session_report(ended_session, ROSTER) == {"present": ["alice", "carol"], "absent": ["bob"]}
+    final = summary(tables, ended_session)
+    assert (final.present_count, final.absent_count, final.unknown_count) == (2, 1, 1)
+
+
+def test_open_session_only_bumps_counters(tables, service):
+    session_id = service.create_session("Lecture").id
+    service.mark_attendance("alice", distance=0.4)
+    service.mark_attendance("bob", distance=0.3)
+
+    open_summary = summary(tables, session_id)
+    assert (open_summary.present_count, open_summary.is_final, open_summary.absent_json) == (2, False, None)
@@ -12,6 +12,37 @@ function getAuthHeaders(contentType = 'application/json') {
     return headers;
 }
 
+// List endpoints are keyset-paginated, newest first: a page holds at most `limit` rows
+// and the X-Next-Cursor response header points at the next one. Views load the first
+// page and fetch more on demand with the returned `nextCursor` (null on the last page).
+const PAGE_SIZE = 100;
+export const EMPTY_PAGE = { items: [], nextCursor: null };
+
+async function fetchPage(path, errorMessage, { cursor = null, ...filters } = {}) {
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    if (cursor) params.set('cursor', cursor);
+    Object.entries(filters).forEach(([key, value]) => {
+        if (value != null) params.set(key, value);
+    });
+    const response = await fetch(`${API_URL}${path}?${params}`, {
+        headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error(errorMessage);
+    return { items: await response.json(), nextCursor: response.headers.get('X-Next-Cursor') };
+}
+
+// Only for lists bounded by their filters (e.g. `since` the oldest row on screen)
+async function fetchAllPages(path, errorMessage, filters = {}) {
+    const items = [];
+    let cursor = null;
+    do {
+        const page = await fetchPage(path, errorMessage, { ...filters, cursor });
+        items.push(...page.items);
+        cursor = page.nextCursor;
+    } while (cursor);
+    return items;
+}
+
 export async function loginUser(username, password) {
     const formData = new URLSearchParams();
     formData.append('username', username);
@@ -47,6 +78,33 @@ export async function registerUser(username, password, fullName, faceIdentity) {
     return await response.json();
 }
 
+// Live session events (Server-Sent Events)
+// One EventSource is shared by every subscribed component. The browser reconnects
+// on its own and resumes with Last-Event-ID, so only a 'reset' needs a full refetch.
+let eventSource = null;
+const eventHandlers = new Set();
+
+export function subscribeToSessionEvents(handler) {
+    eventHandlers.add(handler);
+
+    if (!eventSource) {
+        const token = localStorage.getItem('token');
+        eventSource = new EventSource(`${API_URL}/events?token=${encodeURIComponent(token || '')}`);
+        eventSource.onmessage = (message) => {
+            const event = JSON.parse(message.data);
+            eventHandlers.forEach(h => h(event));
+        };
+    }
+
+    return () => {
+        eventHandlers.delete(handler);
+        if (eventHandlers.size === 0 && eventSource) {
+            eventSource.close();
+            eventSource = null;
+        }
+    };
+}
+
 export async function getAttendance() {
     try {
         const response = await fetch(`${API_URL}/attendance`, {
@@ -104,15 +162,11 @@ export async function endSession() {
     return await response.json();
 }
 
-export async function getSessionHistory() {
+export async function getSessionHistory(cursor = null) {
     try {
-        const response = await fetch(`${API_URL}/sessions`, {
-            headers: getAuthHeaders()
-        });
-        if (!response.ok) throw new Error('Failed to fetch history');
-        return await response.json();
+        return await fetchPage('/sessions', 'Failed to fetch history', { cursor });
     } catch {
-        return [];
+        return EMPTY_PAGE;
     }
 }
 
@@ -146,6 +200,30 @@ export async function checkHealth() {
     }
 }
 
+// <img>/<video> tags cannot send the Authorization header, so media URLs carry the token
+function mediaToken() {
+    return `token=${encodeURIComponent(localStorage.getItem('token') || '')}`;
+}
+
+// Cacheable evidence URLs: 'thumb' and 'preview' are small derivatives (poster frame for videos),
+// 'original' is the stored file (face coordinates refer to its pixels)
+export function sourceMediaUrl(source, variant = 'thumb') {
+    return `${API_URL}/sources/${source.id}/media/${variant}?${mediaToken()}`;
+}
+
+export function unknownThumbUrl(unknown) {
+    return `${API_URL}/unknowns/${unknown.id}/thumb?${mediaToken()}`;
+}
+
+// Admission control answers 503 (server busy) or 429 (caller over budget) with Retry-After
+function recognitionError(response, fallback) {
+    if (response.status === 503 || response.status === 429) {
+        const retryAfter = response.headers.get('Retry-After');
+        return new Error(`Server busy, try again in ${retryAfter || 'a few'} seconds`);
+    }
+    return new Error(fallback);
+}
+
 export async function recognizeImage(file) {
     const formData = new FormData();
     formData.append('file', file);
@@ -160,7 +238,7 @@ export async function recognizeImage(file) {
     });
 
     if (!response.ok) {
-        throw new Error('Image recognition failed');
+        throw recognitionError(response, 'Image recognition failed');
     }
     return await response.json();
 }
@@ -192,7 +270,7 @@ export async function recognizeVideo(file) {
     });
 
     if (!response.ok) {
-        throw new Error('Video recognition failed');
+        throw recognitionError(response, 'Video recognition failed');
     }
     return await response.json();
 }
@@ -219,15 +297,24 @@ export async function resolveUnknown(unknownId, studentName) {
 }
 
 // Student & Dispute APIs
-export async function getMyAttendance() {
+// Marks since `since` (e.g. the oldest session on screen): at most one per session
+export async function getMyAttendance(since = null) {
     try {
-        const response = await fetch(`${API_URL}/attendance/my`, {
+        return await fetchAllPages('/attendance/my', 'Failed to fetch attendance', { since });
+    } catch {
+        return [];
+    }
+}
+
+export async function getMyAnalytics() {
+    try {
+        const response = await fetch(`${API_URL}/analytics/my`, {
             headers: getAuthHeaders()
         });
-        if (!response.ok) throw new Error('Failed to fetch attendance');
+        if (!response.ok) throw new Error('Failed to fetch analytics');
         return await response.json();
     } catch {
-        return [];
+        return null;
     }
 }
 
@@ -246,38 +333,36 @@ export async function createDispute(sessionId, description, attendanceSourceId =
     return await response.json();
 }
 
-export async function getSessionEvidence(sessionId) {
+export async function getSessionEvidence(sessionId, cursor = null) {
     try {
-        const response = await fetch(`${API_URL}/sessions/${sessionId}/evidence`, {
-            headers: getAuthHeaders()
-        });
-        if (!response.ok) throw new Error('Failed to fetch evidence');
-        return await response.json();
+        return await fetchPage(`/sessions/${sessionId}/evidence`, 'Failed to fetch evidence', { cursor });
     } catch {
-        return [];
+        return EMPTY_PAGE;
     }
 }
 
-export async function getMyDisputes() {
+// Disputes filed since `since` (e.g. the oldest session on screen)
+export async function getMyDisputes(since = null) {
     try {
-        const response = await fetch(`${API_URL}/disputes/my`, {
-            headers: getAuthHeaders()
-        });
-        if (!response.ok) throw new Error('Failed to fetch disputes');
-        return await response.json();
+        return await fetchAllPages('/disputes/my', 'Failed to fetch disputes', { since });
     } catch {
         return [];
     }
 }
 
 // Admin API
-export async function getAllDisputes() {
+export async function getAllDisputes(cursor = null) {
     try {
-        const response = await fetch(`${API_URL}/disputes`, {
-            headers: getAuthHeaders()
-        });
-        if (!response.ok) throw new Error('Failed to fetch disputes');
-        return await response.json();
+        return await fetchPage('/disputes', 'Failed to fetch disputes', { cursor });
+    } catch {
+        return EMPTY_PAGE;
+    }
+}
+
+// The open work queue, listed in full ahead of the paged dispute history
+export async function getPendingDisputes() {
+    try {
+        return await fetchAllPages('/disputes', 'Failed to fetch disputes', { status: 'pending' });
     } catch {
         return [];
     }
@@ -292,15 +377,11 @@ export async function resolveDispute(disputeId, status) {
     return await response.json();
 }
 
-export async function getAllUsers() {
+export async function getAllUsers(cursor = null) {
     try {
-        const response = await fetch(`${API_URL}/admin/users`, {
-            headers: getAuthHeaders()
-        });
-        if (!response.ok) throw new Error('Failed to fetch users');
-        return await response.json();
+        return await fetchPage('/admin/users', 'Failed to fetch users', { cursor });
     } catch {
-        return [];
+        return EMPTY_PAGE;
     }
 }
 
@@ -314,14 +395,10 @@ export async function mapUserIdentity(username, faceIdentity) {
     return await response.json();
 }
 
-export async function getAuditLogs() {
+export async function getAuditLogs(cursor = null) {
     try {
-        const response = await fetch(`${API_URL}/admin/audit-logs`, {
-            headers: getAuthHeaders()
-        });
-        if (!response.ok) throw new Error('Failed to fetch logs');
-        return await response.json();
+        return await fetchPage('/admin/audit-logs', 'Failed to fetch logs', { cursor });
     } catch {
-        return [];
+        return EMPTY_PAGE;
     }
 }
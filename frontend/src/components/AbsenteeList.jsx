@@ -1,29 +1,37 @@
-import { useEffect, useState } from 'react';
-import { getAbsentees, manualMark, getActiveSession } from '../api';
+import { useEffect, useRef, useState } from 'react';
+import { getAbsentees, manualMark, getActiveSession, subscribeToSessionEvents } from '../api';
 
 export default function AbsenteeList() {
     const [absentees, setAbsentees] = useState([]);
     const [session, setSession] = useState(null);
+    const sessionIdRef = useRef(null);
 
     const fetchData = async () => {
         const data = await getAbsentees();
         setAbsentees(data);
         const sess = await getActiveSession();
+        sessionIdRef.current = sess ? sess.id : null;
         setSession(sess);
     };
 
     useEffect(() => {
         fetchData();
-        const interval = setInterval(fetchData, 3000);
-        return () => clearInterval(interval);
+        return subscribeToSessionEvents((event) => {
+            if (event.type === 'attendance_marked') {
+                if (event.data.session_id !== sessionIdRef.current) return;
+                setAbsentees(prev => prev.filter(name => name !== event.data.student_name));
+            } else if (event.type === 'session_started' || event.type === 'session_ended' || event.type === 'reset') {
+                fetchData();
+            }
+        });
     }, []);
 
     const handleMark = async (name) => {
         if (!session) return;
         try {
             await manualMark(name, session.id);
-            // Refresh immediately
-            fetchData();
+            // Remove immediately; the pushed event for an already-marked student never comes
+            setAbsentees(prev => prev.filter(n => n !== name));
         } catch (e) {
             alert("Failed to mark present");
         }
@@ -1,19 +1,30 @@
-import { useEffect, useState } from 'react';
-import { getAttendance } from '../api';
+import { useEffect, useRef, useState } from 'react';
+import { getAttendance, getActiveSession, subscribeToSessionEvents } from '../api';
 
 export default function AttendanceTable() {
     const [logs, setLogs] = useState([]);
+    const sessionIdRef = useRef(null);
 
     useEffect(() => {
         const fetchLogs = async () => {
+            const sess = await getActiveSession();
+            sessionIdRef.current = sess ? sess.id : null;
             const data = await getAttendance();
             setLogs(data);
         };
 
         fetchLogs();
-        const interval = setInterval(fetchLogs, 3000); // Poll every 3 seconds
 
-        return () => clearInterval(interval);
+        // Server pushes deltas; only a session change or a missed-event reset refetches
+        return subscribeToSessionEvents((event) => {
+            if (event.type === 'attendance_marked') {
+                const record = event.data;
+                if (record.session_id !== sessionIdRef.current) return;
+                setLogs(prev => [record, ...prev.filter(l => l.id !== record.id)].slice(0, 50));
+            } else if (event.type === 'session_started' || event.type === 'session_ended' || event.type === 'reset') {
+                fetchLogs();
+            }
+        });
     }, []);
 
     return (
@@ -4,7 +4,7 @@ import RecognitionPanel from './RecognitionPanel';
 import AbsenteeList from './AbsenteeList';
 import SessionHistory from './SessionHistory';
 import LiveCorrectionPanel from './LiveCorrectionPanel';
-import { createSession, getActiveSession, endSession } from '../api';
+import { createSession, getActiveSession, endSession, subscribeToSessionEvents } from '../api';
 import { useNavigate } from 'react-router-dom';
 
 function Dashboard() {
@@ -22,8 +22,15 @@ function Dashboard() {
 
     useEffect(() => {
         fetchSession();
-        const i = setInterval(fetchSession, 5000);
-        return () => clearInterval(i);
+        return subscribeToSessionEvents((event) => {
+            if (event.type === 'session_started') {
+                setSession(event.data);
+            } else if (event.type === 'session_ended') {
+                setSession(null);
+            } else if (event.type === 'reset') {
+                fetchSession();
+            }
+        });
     }, []);
 
     useEffect(() => {
@@ -1,15 +1,28 @@
 import { useState, useEffect } from 'react';
-import { getAllDisputes, resolveDispute } from '../api';
+import { getAllDisputes, getPendingDisputes, resolveDispute, sourceMediaUrl } from '../api';
+import LoadMoreButton from './LoadMoreButton';
 
 export default function DisputeList() {
-    const [disputes, setDisputes] = useState([]);
+    const [pending, setPending] = useState([]);
+    const [history, setHistory] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(false);
     const [viewingEvidence, setViewingEvidence] = useState(null);
 
     const loadDisputes = async () => {
         setLoading(true);
-        const data = await getAllDisputes();
-        setDisputes(data);
+        const [open, page] = await Promise.all([getPendingDisputes(), getAllDisputes()]);
+        setPending(open);
+        setHistory(page.items);
+        setNextCursor(page.nextCursor);
+        setLoading(false);
+    }
+
+    const loadMore = async () => {
+        setLoading(true);
+        const page = await getAllDisputes(nextCursor);
+        setHistory(prev => [...prev, ...page.items]);
+        setNextCursor(page.nextCursor);
         setLoading(false);
     }
 
@@ -31,6 +44,10 @@ export default function DisputeList() {
         setViewingEvidence(dispute);
     }
 
+    // Every pending dispute, then the paged history (which repeats the pending ones)
+    const pendingIds = new Set(pending.map(d => d.id));
+    const disputes = [...pending, ...history.filter(d => !pendingIds.has(d.id))];
+
     // Filter to show pending first
     const sortedDisputes = [...disputes].sort((a, b) => {
         if (a.status === 'pending' && b.status !== 'pending') return -1;
@@ -115,6 +132,7 @@ export default function DisputeList() {
                         </tbody>
                     </table>
                 </div>
+                <LoadMoreButton nextCursor={nextCursor} loading={loading} onLoadMore={loadMore} />
             </div>
 
             {/* Evidence Viewer Modal */}
@@ -131,40 +149,34 @@ export default function DisputeList() {
 function EvidenceModal({ dispute, onClose }) {
     const [evidenceSource, setEvidenceSource] = useState(null);
     const [userInfo, setUserInfo] = useState(null);
+    const [imageSize, setImageSize] = useState(null);
 
     useEffect(() => {
         async function loadEvidence() {
             try {
                 console.log('Loading evidence for dispute:', dispute);
 
-                // Fetch evidence source details
-                const response = await fetch(`http://localhost:8000/sessions/${dispute.session_id}/evidence`, {
+                // Disputed frame plus its detected faces in one lookup
+                const response = await fetch(`http://localhost:8000/disputes/${dispute.id}/evidence`, {
                     headers: {
                         'Authorization': `Bearer ${localStorage.getItem('token')}`
                     }
                 });
 
                 if (!response.ok) {
-                    console.error('Failed to fetch evidence sources:', response.status);
+                    console.error('Failed to fetch dispute evidence:', response.status);
                     return;
                 }
 
-                const sources = await response.json();
-                console.log('Evidence sources:', sources);
-                console.log('Dispute Source ID:', dispute.attendance_source_id, 'Type:', typeof dispute.attendance_source_id);
-                if (sources.length > 0) {
-                    console.log('First Source ID:', sources[0].id, 'Type:', typeof sources[0].id);
-                }
-
-                const source = sources.find(s => s.id == dispute.attendance_source_id);
-                console.log('Found evidence source:', source);
+                const evidence = await response.json();
+                console.log('Dispute evidence:', evidence);
 
-                if (!source) {
-                    console.warn(`Source with ID ${dispute.attendance_source_id} not found in session evidence.`);
+                if (!evidence.source) {
+                    console.warn(`Source with ID ${dispute.attendance_source_id} not found.`);
                     // Mock a source if missing to allow UI to show error instead of loading indefinitely
                     setEvidenceSource({ file_path: 'MISSING_FILE', id: -1 });
                 } else {
-                    setEvidenceSource(source);
+                    setEvidenceSource(evidence.source);
                 }
 
                 // Fetch user info to get face_identity
@@ -192,15 +204,10 @@ function EvidenceModal({ dispute, onClose }) {
         loadEvidence();
     }, [dispute]);
 
-    // Parse selected face coords
-    let faceCoords = null;
-    try {
-        if (dispute.selected_face_coords) {
-            faceCoords = JSON.parse(dispute.selected_face_coords.replace(/'/g, '"'));
-        }
-    } catch (e) {
-        console.error("Failed to parse coords", e);
-    }
+    // Selected face box, in image pixels
+    const faceCoords = dispute.face_top != null
+        ? [dispute.face_top, dispute.face_right, dispute.face_bottom, dispute.face_left]
+        : null;
 
     return (
         <div className="fixed inset-0 bg-black/90 flex items-center justify-center p-4 z-50" onClick={onClose}>
@@ -217,23 +224,24 @@ function EvidenceModal({ dispute, onClose }) {
                         {evidenceSource ? (
                             <div className="relative border-2 border-robocop-500 rounded overflow-hidden">
                                 <img
-                                    src={`http://localhost:8000/static/${evidenceSource.file_path}`}
+                                    src={sourceMediaUrl(evidenceSource, 'original')}
                                     alt="Session evidence"
                                     className="w-full h-auto"
+                                    onLoad={(e) => setImageSize({ width: e.target.naturalWidth, height: e.target.naturalHeight })}
                                     onError={(e) => {
                                         console.error('Failed to load evidence image:', e.target.src);
                                         e.target.style.display = 'none';
                                         e.target.parentElement.innerHTML = '<div class="bg-robocop-900 p-8 text-center text-red-400">Failed to load image. Path: ' + evidenceSource.file_path + '</div>';
                                     }}
                                 />
-                                {faceCoords && faceCoords.length === 4 && (
+                                {faceCoords && imageSize && (
                                     <div
                                         className="absolute border-4 border-yellow-400 pointer-events-none"
                                         style={{
-                                            top: `${faceCoords[0]}px`,
-                                            left: `${faceCoords[3]}px`,
-                                            width: `${faceCoords[1] - faceCoords[3]}px`,
-                                            height: `${faceCoords[2] - faceCoords[0]}px`
+                                            top: `${faceCoords[0] / imageSize.height * 100}%`,
+                                            left: `${faceCoords[3] / imageSize.width * 100}%`,
+                                            width: `${(faceCoords[1] - faceCoords[3]) / imageSize.width * 100}%`,
+                                            height: `${(faceCoords[2] - faceCoords[0]) / imageSize.height * 100}%`
                                         }}
                                     >
                                         <div className="absolute -top-6 left-0 bg-yellow-400 text-black text-xs px-2 py-1 font-bold">
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { getUnknowns, resolveUnknown, getAbsentees } from '../api';
+import { getUnknowns, resolveUnknown, getAbsentees, subscribeToSessionEvents, unknownThumbUrl } from '../api';
 
 export default function LiveCorrectionPanel() {
     const [unknowns, setUnknowns] = useState([]);
@@ -18,8 +18,26 @@ export default function LiveCorrectionPanel() {
 
     useEffect(() => {
         fetchData();
-        const interval = setInterval(fetchData, 5000);
-        return () => clearInterval(interval);
+        return subscribeToSessionEvents((event) => {
+            switch (event.type) {
+                case 'unknown_registered':
+                    setUnknowns(prev => [event.data, ...prev.filter(u => u.id !== event.data.id)]);
+                    break;
+                case 'unknown_resolved':
+                    setUnknowns(prev => prev.filter(u => u.id !== event.data.unknown_id));
+                    break;
+                case 'attendance_marked':
+                    setStudents(prev => prev.filter(s => s !== event.data.student_name));
+                    break;
+                case 'session_started':
+                case 'session_ended':
+                case 'reset':
+                    fetchData();
+                    break;
+                default:
+                    break;
+            }
+        });
     }, []);
 
     const handleAssign = async (unknownId) => {
@@ -54,7 +72,7 @@ export default function LiveCorrectionPanel() {
                 {unknowns.map(unknown => (
                     <div key={unknown.id} className="bg-robocop-900 border border-robocop-700 p-3 rounded-lg flex gap-3">
                         <img
-                            src={`http://localhost:8000/static/${unknown.image_path}`}
+                            src={unknownThumbUrl(unknown)}
                             alt="Unknown Face"
                             className="w-16 h-16 rounded object-cover border border-robocop-600"
                         />
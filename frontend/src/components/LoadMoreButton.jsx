@@ -0,0 +1,15 @@
+// Fetches the next keyset page of a list; hidden once the last page is loaded
+export default function LoadMoreButton({ nextCursor, loading, onLoadMore }) {
+    if (!nextCursor) return null;
+    return (
+        <div className="p-3 text-center">
+            <button
+                onClick={onLoadMore}
+                disabled={loading}
+                className="text-sm text-robocop-400 hover:text-white disabled:opacity-50"
+            >
+                {loading ? 'Loading...' : 'Load more'}
+            </button>
+        </div>
+    );
+}
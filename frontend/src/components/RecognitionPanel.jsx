@@ -140,7 +140,7 @@ export default function RecognitionPanel() {
             }
         } catch (error) {
             console.error(error);
-            setMessage({ type: 'error', text: 'Recognition failed.' });
+            setMessage({ type: 'error', text: error.message || 'Recognition failed.' });
         } finally {
             setLoading(false);
         }
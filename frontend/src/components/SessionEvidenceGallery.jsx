@@ -1,9 +1,12 @@
 import { useState, useEffect } from 'react';
-import { getSessionEvidence } from '../api';
+import { getSessionEvidence, sourceMediaUrl } from '../api';
+import LoadMoreButton from './LoadMoreButton';
 
 export default function SessionEvidenceGallery({ sessionId, onSelectEvidence }) {
     const [evidence, setEvidence] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(false);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [selectedImage, setSelectedImage] = useState(null);
 
     useEffect(() => {
@@ -11,8 +14,9 @@ export default function SessionEvidenceGallery({ sessionId, onSelectEvidence })
         async function load() {
             setLoading(true);
             try {
-                const data = await getSessionEvidence(sessionId);
-                setEvidence(data);
+                const page = await getSessionEvidence(sessionId);
+                setEvidence(page.items);
+                setNextCursor(page.nextCursor);
             } catch (e) {
                 console.error(e);
             } finally {
@@ -22,12 +26,22 @@ export default function SessionEvidenceGallery({ sessionId, onSelectEvidence })
         load();
     }, [sessionId]);
 
+    const loadMore = async () => {
+        setLoadingMore(true);
+        const page = await getSessionEvidence(sessionId, nextCursor);
+        setEvidence(prev => [...prev, ...page.items]);
+        setNextCursor(page.nextCursor);
+        setLoadingMore(false);
+    };
+
     const handleImageClick = (e, sourceId) => {
         if (selectedImage?.id === sourceId) {
             // If already selecting on this image, capture click coords
             const rect = e.target.getBoundingClientRect();
-            const x = Math.round(e.clientX - rect.left);
-            const y = Math.round(e.clientY - rect.top);
+            // Scale to image pixels so the box lines up with the stored face detections
+            const scale = e.target.naturalWidth / rect.width;
+            const x = Math.round((e.clientX - rect.left) * scale);
+            const y = Math.round((e.clientY - rect.top) * scale);
 
             // Normalize to image dimensions?
             // Easiest is to send relative pixels or percentage.
@@ -54,7 +68,7 @@ export default function SessionEvidenceGallery({ sessionId, onSelectEvidence })
                 </button>
                 <div className="relative border-2 border-robocop-500 rounded overflow-hidden group cursor-crosshair">
                     <img
-                        src={`${import.meta.env.VITE_API_URL}/static/${selectedImage.file_path}`}
+                        src={sourceMediaUrl(selectedImage, 'original')}
                         className="w-full h-auto"
                         onClick={(e) => handleImageClick(e, selectedImage.id)}
                     />
@@ -67,20 +81,20 @@ export default function SessionEvidenceGallery({ sessionId, onSelectEvidence })
     }
 
     return (
-        <div className="grid grid-cols-3 gap-2 max-h-[300px] overflow-y-auto">
-            {evidence.map(item => (
-                <div
-                    key={item.id}
-                    onClick={() => setSelectedImage(item)}
-                    className="aspect-square bg-black rounded overflow-hidden cursor-pointer hover:border-2 hover:border-robocop-400"
-                >
-                    {item.media_type === 'video' ? (
-                        <video src={`${import.meta.env.VITE_API_URL}/static/${item.file_path}`} className="w-full h-full object-cover" />
-                    ) : (
-                        <img src={`${import.meta.env.VITE_API_URL}/static/${item.file_path}`} className="w-full h-full object-cover" />
-                    )}
-                </div>
-            ))}
+        <div className="max-h-[300px] overflow-y-auto">
+            <div className="grid grid-cols-3 gap-2">
+                {evidence.map(item => (
+                    <div
+                        key={item.id}
+                        onClick={() => setSelectedImage(item)}
+                        className="aspect-square bg-black rounded overflow-hidden cursor-pointer hover:border-2 hover:border-robocop-400"
+                    >
+                        {/* Thumbnails only; videos show their poster frame */}
+                        <img src={sourceMediaUrl(item, 'thumb')} loading="lazy" className="w-full h-full object-cover" />
+                    </div>
+                ))}
+            </div>
+            <LoadMoreButton nextCursor={nextCursor} loading={loadingMore} onLoadMore={loadMore} />
         </div>
     );
 }
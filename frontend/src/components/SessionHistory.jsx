@@ -1,20 +1,36 @@
 import { useEffect, useState } from 'react';
-import { getSessionHistory, getSessionReport } from '../api';
+import { getSessionHistory, getSessionReport, subscribeToSessionEvents } from '../api';
+import LoadMoreButton from './LoadMoreButton';
 
 export default function SessionHistory() {
     const [history, setHistory] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [selectedSession, setSelectedSession] = useState(null);
     const [report, setReport] = useState(null);
 
     const fetchHistory = async () => {
-        const data = await getSessionHistory();
-        setHistory(data);
+        const page = await getSessionHistory();
+        setHistory(page.items);
+        setNextCursor(page.nextCursor);
+    };
+
+    const loadMore = async () => {
+        setLoadingMore(true);
+        const page = await getSessionHistory(nextCursor);
+        setHistory(prev => [...prev, ...page.items]);
+        setNextCursor(page.nextCursor);
+        setLoadingMore(false);
     };
 
     useEffect(() => {
         fetchHistory();
-        const interval = setInterval(fetchHistory, 10000);
-        return () => clearInterval(interval);
+        // History only changes when a session ends
+        return subscribeToSessionEvents((event) => {
+            if (event.type === 'session_ended' || event.type === 'reset') {
+                fetchHistory();
+            }
+        });
     }, []);
 
     const handleRowClick = async (session) => {
@@ -52,6 +68,7 @@ export default function SessionHistory() {
                             <th className="pb-3 pl-2 font-medium">SESSION NAME</th>
                             <th className="pb-3 font-medium">STARTED</th>
                             <th className="pb-3 font-medium">ENDED</th>
+                            <th className="pb-3 font-medium">PRESENT</th>
                             <th className="pb-3 font-medium text-right pr-2">DURATION</th>
                         </tr>
                     </thead>
@@ -71,6 +88,12 @@ export default function SessionHistory() {
                                 <td className="py-3 text-sm text-slate-400">
                                     {formatDate(session.end_time)}
                                 </td>
+                                <td className="py-3 text-sm font-mono text-green-400">
+                                    {session.present_count}
+                                    {session.absent_count != null && (
+                                        <span className="text-slate-500"> / {session.present_count + session.absent_count}</span>
+                                    )}
+                                </td>
                                 <td className="py-3 text-right pr-2 text-sm font-mono text-robocop-300">
                                     {getDuration(session.created_at, session.end_time)}
                                 </td>
@@ -78,6 +101,7 @@ export default function SessionHistory() {
                         ))}
                     </tbody>
                 </table>
+                <LoadMoreButton nextCursor={nextCursor} loading={loadingMore} onLoadMore={loadMore} />
             </div>
 
             {/* Modal */}
@@ -1,30 +1,59 @@
 import { useState, useEffect } from 'react';
-import { getSessionHistory, getMyAttendance, createDispute, getMyDisputes } from '../api';
+import { getSessionHistory, getMyAttendance, getMyAnalytics, createDispute, getMyDisputes } from '../api';
 import { useNavigate } from 'react-router-dom';
 
 import SessionEvidenceGallery from './SessionEvidenceGallery';
+import LoadMoreButton from './LoadMoreButton';
 
 export default function StudentDashboard() {
     const [sessions, setSessions] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [myAttendance, setMyAttendance] = useState([]);
     const [myDisputes, setMyDisputes] = useState([]);
+    const [myStats, setMyStats] = useState(null);
     const [selectedSessionId, setSelectedSessionId] = useState(null);
     const [disputeReason, setDisputeReason] = useState("");
     const [showGallery, setShowGallery] = useState(false);
     const [evidenceData, setEvidenceData] = useState({ sourceId: null, coords: null });
     const navigate = useNavigate();
 
+    // Marks and disputes are only needed for the sessions on screen: none predates the oldest
+    const oldestSession = (loaded) => loaded.length ? loaded[loaded.length - 1].created_at : null;
+
+    const loadStatuses = async (loaded) => {
+        if (loaded.length === 0) return;
+        const [att, d] = await Promise.all([
+            getMyAttendance(oldestSession(loaded)),
+            getMyDisputes(oldestSession(loaded))
+        ]);
+        setMyAttendance(att);
+        setMyDisputes(d);
+    }
+
+    const loadMoreSessions = async () => {
+        setLoadingMore(true);
+        try {
+            const page = await getSessionHistory(nextCursor);
+            const loaded = [...sessions, ...page.items];
+            await loadStatuses(loaded);
+            setSessions(loaded);
+            setNextCursor(page.nextCursor);
+        } finally {
+            setLoadingMore(false);
+        }
+    }
+
     useEffect(() => {
         async function loadData() {
             try {
-                const s = await getSessionHistory();
-                setSessions(s);
-
-                const att = await getMyAttendance();
-                setMyAttendance(att);
+                const page = await getSessionHistory();
+                await loadStatuses(page.items);
+                setSessions(page.items);
+                setNextCursor(page.nextCursor);
 
-                const d = await getMyDisputes();
-                setMyDisputes(d);
+                const stats = await getMyAnalytics();
+                setMyStats(stats);
             } catch (e) {
                 console.error("Failed to load data", e);
             }
@@ -70,7 +99,7 @@ export default function StudentDashboard() {
             setDisputeReason("");
             setEvidenceData({ sourceId: null, coords: null });
             // Reload disputes
-            const d = await getMyDisputes();
+            const d = await getMyDisputes(oldestSession(sessions));
             setMyDisputes(d);
         } catch (e) {
             alert("Failed to sumbit dispute");
@@ -96,6 +125,24 @@ export default function StudentDashboard() {
                 <button onClick={handleLogout} className="text-slate-400 hover:text-white">Logout</button>
             </header>
 
+            {myStats && myStats.session_count > 0 && (
+                <div className="grid grid-cols-3 gap-4 mb-8">
+                    <div className="bg-robocop-800 rounded-xl border border-robocop-700 p-4">
+                        <div className="text-robocop-400 uppercase text-xs">Attendance Rate</div>
+                        <div className="text-2xl font-bold text-white">{Math.round(myStats.rate * 100)}%</div>
+                        <div className="text-xs text-slate-400">{myStats.attended} of {myStats.session_count} sessions</div>
+                    </div>
+                    <div className="bg-robocop-800 rounded-xl border border-robocop-700 p-4">
+                        <div className="text-robocop-400 uppercase text-xs">Current Streak</div>
+                        <div className="text-2xl font-bold text-green-400">{myStats.current_streak}</div>
+                    </div>
+                    <div className="bg-robocop-800 rounded-xl border border-robocop-700 p-4">
+                        <div className="text-robocop-400 uppercase text-xs">Longest Absence</div>
+                        <div className="text-2xl font-bold text-red-400">{myStats.longest_absence_streak}</div>
+                    </div>
+                </div>
+            )}
+
             <div className="bg-robocop-800 rounded-xl border border-robocop-700 overflow-hidden">
                 <table className="w-full text-left">
                     <thead className="bg-robocop-900/50 text-robocop-400 uppercase text-xs">
@@ -129,6 +176,7 @@ export default function StudentDashboard() {
                         })}
                     </tbody>
                 </table>
+                <LoadMoreButton nextCursor={nextCursor} loading={loadingMore} onLoadMore={loadMoreSessions} />
             </div>
 
             {/* Dispute Modal */}
@@ -1,16 +1,27 @@
 import { useState, useEffect } from 'react';
 import { getAllUsers, mapUserIdentity } from '../api';
+import LoadMoreButton from './LoadMoreButton';
 
 export default function UserMapper() {
     const [users, setUsers] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(false);
     const [editingUser, setEditingUser] = useState(null);
     const [identityInput, setIdentityInput] = useState("");
 
     const loadUsers = async () => {
         setLoading(true);
-        const data = await getAllUsers();
-        setUsers(data);
+        const page = await getAllUsers();
+        setUsers(page.items);
+        setNextCursor(page.nextCursor);
+        setLoading(false);
+    }
+
+    const loadMore = async () => {
+        setLoading(true);
+        const page = await getAllUsers(nextCursor);
+        setUsers(prev => [...prev, ...page.items]);
+        setNextCursor(page.nextCursor);
         setLoading(false);
     }
 
@@ -89,6 +100,7 @@ export default function UserMapper() {
                     ))}
                 </tbody>
             </table>
+            <LoadMoreButton nextCursor={nextCursor} loading={loading} onLoadMore={loadMore} />
         </div>
     );
 }